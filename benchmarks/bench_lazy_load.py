@@ -0,0 +1,119 @@
+"""Compare wall time and peak RSS of the default and the --lazy loading mode.
+
+Every measurement runs in a fresh interpreter so that the peak RSS of one mode
+does not leak into the other::
+
+    python benchmarks/bench_lazy_load.py --glyphs 30000
+    python benchmarks/bench_lazy_load.py --font NotoSansCJK-Regular.otf -f vert
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+
+def _peakRss() -> int:
+    import resource
+
+    # On Linux, ru_maxrss survives exec() and would include the peak of the
+    # parent process that built the synthetic font, so prefer VmHWM.
+    status = Path("/proc/self/status")
+    if status.exists():
+        for line in status.read_text().splitlines():
+            if line.startswith("VmHWM:"):
+                return int(line.split()[1]) * 1024
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS.
+    return rss if sys.platform == "darwin" else rss * 1024
+
+
+def _child(inpath: str, outpath: str, features: str, lazy: bool) -> None:
+    import opentype_feature_freezer
+    from opentype_feature_freezer.cli import parseOptions
+
+    args = ["-f", features, "-S", inpath, outpath]
+    if lazy:
+        args.insert(0, "--lazy")
+    options = parseOptions(args)
+    start = time.perf_counter()
+    remapper = opentype_feature_freezer.RemapByOTL(options)
+    remapper.run()
+    wall = time.perf_counter() - start
+    json.dump({"wall": wall, "peak_rss": _peakRss()}, sys.stdout)
+
+
+def measure(inpath: str, features: str, lazy: bool, repeat: int) -> dict:
+    runs = []
+    with tempfile.TemporaryDirectory() as tmp:
+        outpath = str(Path(tmp) / "out")
+        for _ in range(repeat):
+            output = subprocess.run(
+                [sys.executable, __file__, "--child", inpath, outpath, features]
+                + (["--lazy"] if lazy else []),
+                check=True,
+                capture_output=True,
+                text=True,
+            ).stdout
+            runs.append(json.loads(output))
+    return {
+        "mode": "lazy" if lazy else "default",
+        "wall": min(run["wall"] for run in runs),
+        "peak_rss": min(run["peak_rss"] for run in runs),
+    }
+
+
+def main(args: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--font", help="font to benchmark (default: synthetic)")
+    parser.add_argument("--glyphs", type=int, default=30000)
+    parser.add_argument("--cff", action="store_true", help="synthesize a CFF font")
+    parser.add_argument("-f", "--features", default="smcp,ss01")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--json", action="store_true", help="print JSON results")
+    parser.add_argument("--child", nargs=3, help=argparse.SUPPRESS)
+    parser.add_argument("--lazy", action="store_true", help=argparse.SUPPRESS)
+    options = parser.parse_args(args)
+
+    if options.child:
+        _child(*options.child, lazy=options.lazy)
+        return 0
+
+    with tempfile.TemporaryDirectory() as tmp:
+        inpath = options.font
+        if not inpath:
+            from synthetic import buildSyntheticFont
+
+            inpath = str(
+                Path(tmp) / ("Synthetic.otf" if options.cff else "Synthetic.ttf")
+            )
+            buildSyntheticFont(inpath, options.glyphs, numLookups=8, cff=options.cff)
+        results = [
+            measure(inpath, options.features, lazy, options.repeat)
+            for lazy in (False, True)
+        ]
+
+    if options.json:
+        json.dump(results, sys.stdout, indent=2)
+        print()
+    else:
+        default = results[0]
+        for result in results:
+            print(
+                f"{result['mode']:>8}: {result['wall']:8.3f} s "
+                f"({result['wall'] / default['wall']:5.1%}), "
+                f"peak RSS {result['peak_rss'] / 2**20:8.1f} MiB "
+                f"({result['peak_rss'] / default['peak_rss']:5.1%})"
+            )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,268 @@
+"""Time the stages of the freeze pipeline on synthetic fonts of growing size.
+
+Every font size runs in a fresh interpreter, so that peak memory is measured per
+size. Results can be written as JSON and compared against an earlier run::
+
+    python benchmarks/run.py --json results-1.33.json
+    python benchmarks/run.py --sizes 1000,65000 --compare results-1.33.json
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+STAGES = (
+    "openFont",
+    "initSubs",
+    "filterFeatureIndex",
+    "filterLookupList",
+    "composeSubstitutions",
+    "applySubstitutions",
+    "remapCmaps",
+    "renameFont",
+    "saveFont",
+)
+DEFAULT_SIZES = "1000,4000,16000,65000"
+
+
+def _peakRss() -> int:
+    import resource
+
+    # On Linux, ru_maxrss survives exec() and would include the peak of the
+    # parent process, so prefer VmHWM.
+    status = Path("/proc/self/status")
+    if status.exists():
+        for line in status.read_text().splitlines():
+            if line.startswith("VmHWM:"):
+                return int(line.split()[1]) * 1024
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS.
+    return rss if sys.platform == "darwin" else rss * 1024
+
+
+def runStages(inpath: str, outpath: str, args: list[str], trace: bool) -> dict:
+    import opentype_feature_freezer
+    from opentype_feature_freezer.cli import parseOptions
+
+    options = parseOptions([*args, inpath, outpath])
+    remapper = opentype_feature_freezer.RemapByOTL(options)
+    stages = {}
+    for stage in STAGES:
+        if trace:
+            tracemalloc.start()
+        start = time.perf_counter()
+        getattr(remapper, stage)()
+        wall = time.perf_counter() - start
+        stages[stage] = {"wall": wall}
+        if trace:
+            stages[stage]["peak_alloc"] = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+        if not remapper.success:
+            raise RuntimeError(f"{stage} failed")
+    remapper.closeFont()
+    counters = remapper.stats.asDict()
+    return {
+        "stages": stages,
+        "counters": {
+            name: counters[name]
+            for name in (
+                "lookups_visited",
+                "subtables_skipped",
+                "mappings_applied",
+                "cmap_entries_rewritten",
+                "name_records_touched",
+            )
+        },
+        "total": sum(stage["wall"] for stage in stages.values()),
+        "peak_rss": _peakRss(),
+    }
+
+
+def _child(options: argparse.Namespace) -> None:
+    from synthetic import buildSyntheticFont
+
+    with tempfile.TemporaryDirectory() as tmp:
+        inpath = str(Path(tmp) / ("in.otf" if options.cff else "in.ttf"))
+        buildSyntheticFont(
+            inpath,
+            options.child,
+            numLookups=options.lookups,
+            cff=options.cff,
+            supplementary=True,
+            variationSequences=min(1000, options.child // 10),
+        )
+        # Building the font allocates a lot; start the measurements afresh in
+        # a process that has only freezing to do.
+        command = [sys.executable, __file__, "--measure", inpath]
+        if options.tracemalloc:
+            command.append("--tracemalloc")
+        output = subprocess.run(
+            [*command, "--", *options.freeze_args],
+            check=True,
+            capture_output=True,
+            text=True,
+        ).stdout
+    sys.stdout.write(output)
+
+
+def _measure(inpath: str, args: list[str], trace: bool) -> None:
+    outpath = str(Path(inpath).with_name("out" + Path(inpath).suffix))
+    json.dump(runStages(inpath, outpath, args, trace), sys.stdout)
+
+
+def runSize(size: int, options: argparse.Namespace) -> dict:
+    runs = []
+    for _ in range(options.repeat):
+        command = [
+            sys.executable,
+            __file__,
+            "--child",
+            str(size),
+            "--lookups",
+            str(options.lookups),
+        ]
+        if options.cff:
+            command.append("--cff")
+        if options.tracemalloc:
+            command.append("--tracemalloc")
+        command += ["--", *options.freeze_args]
+        output = subprocess.run(
+            command, check=True, capture_output=True, text=True
+        ).stdout
+        runs.append(json.loads(output))
+    # Keep the fastest run per stage; the minimum is the most stable estimate.
+    result = min(runs, key=lambda run: run["total"])
+    for stage in STAGES:
+        result["stages"][stage]["wall"] = min(
+            run["stages"][stage]["wall"] for run in runs
+        )
+    result["glyphs"] = size
+    return result
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> list[str]:
+    regressions = []
+    old_sizes = {run["glyphs"]: run for run in baseline["runs"]}
+    for run in results["runs"]:
+        old = old_sizes.get(run["glyphs"])
+        if old is None:
+            continue
+        for stage in (*STAGES, "total"):
+            new_wall = (
+                run["total"] if stage == "total" else run["stages"][stage]["wall"]
+            )
+            old_wall = (
+                old["total"] if stage == "total" else old["stages"][stage]["wall"]
+            )
+            # Ignore noise in stages that take next to no time.
+            if old_wall < 0.005:
+                continue
+            ratio = new_wall / old_wall
+            marker = ""
+            if ratio > 1 + threshold:
+                marker = "  REGRESSION"
+                regressions.append(f"{run['glyphs']} glyphs {stage}")
+            print(
+                f"{run['glyphs']:>6} {stage:<20} {old_wall:9.4f} s -> "
+                f"{new_wall:9.4f} s ({ratio:6.1%}){marker}"
+            )
+        ratio = run["peak_rss"] / old["peak_rss"]
+        print(f"{run['glyphs']:>6} {'peak RSS':<20} ({ratio:6.1%})")
+        if ratio > 1 + threshold:
+            regressions.append(f"{run['glyphs']} glyphs peak RSS")
+    return regressions
+
+
+def printResults(results: dict) -> None:
+    header = "".join(f"{stage[:10]:>11}" for stage in STAGES)
+    print(f"{'glyphs':>6}{header}{'total':>9}{'RSS MiB':>9}")
+    for run in results["runs"]:
+        stages = "".join(f"{run['stages'][s]['wall']:11.4f}" for s in STAGES)
+        print(
+            f"{run['glyphs']:>6}{stages}{run['total']:9.3f}"
+            f"{run['peak_rss'] / 2**20:9.1f}"
+        )
+
+
+def main(args: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--sizes",
+        default=DEFAULT_SIZES,
+        help="comma-separated glyph counts (default: %(default)s)",
+    )
+    parser.add_argument("--lookups", type=int, default=24, help="number of features")
+    parser.add_argument("--cff", action="store_true", help="build CFF fonts")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument(
+        "--tracemalloc",
+        action="store_true",
+        help="also record the peak Python allocations of every stage (slower)",
+    )
+    parser.add_argument("--json", metavar="FILE", help="write the results as JSON")
+    parser.add_argument("--compare", metavar="FILE", help="compare with a JSON file")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.2,
+        help="relative slowdown reported as regression (default: %(default)s)",
+    )
+    parser.add_argument(
+        "freeze_args",
+        nargs="*",
+        default=["-f", "smcp,ss01,ss02,ss03", "-S"],
+        help="pyftfeatfreeze options, after '--' (default: -f smcp,ss01,ss02,ss03 -S)",
+    )
+    parser.add_argument("--child", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--measure", help=argparse.SUPPRESS)
+    options = parser.parse_args(args)
+
+    if options.measure:
+        _measure(options.measure, options.freeze_args, options.tracemalloc)
+        return 0
+    if options.child:
+        _child(options)
+        return 0
+
+    import fontTools
+
+    import opentype_feature_freezer
+
+    results = {
+        "version": opentype_feature_freezer.__version__,
+        "fonttools": fontTools.version,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cff": options.cff,
+        "lookups": options.lookups,
+        "freeze_args": options.freeze_args,
+        "runs": [
+            runSize(int(size), options)
+            for size in options.sizes.split(",")
+            if size.strip()
+        ],
+    }
+    printResults(results)
+    if options.json:
+        Path(options.json).write_text(json.dumps(results, indent=2) + "\n")
+    if options.compare:
+        baseline = json.loads(Path(options.compare).read_text())
+        regressions = compare(results, baseline, options.threshold)
+        if regressions:
+            print("Regressions: " + ", ".join(regressions))
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
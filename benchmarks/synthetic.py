@@ -0,0 +1,102 @@
+"""Synthetic test fonts of configurable size for the benchmarks."""
+
+from __future__ import annotations
+
+from typing import TYPE_CHECKING
+
+from fontTools.feaLib.builder import addOpenTypeFeaturesFromString
+from fontTools.fontBuilder import FontBuilder
+from fontTools.pens.t2CharStringPen import T2CharStringPen
+from fontTools.pens.ttGlyphPen import TTGlyphPen
+
+if TYPE_CHECKING:
+    import os
+
+# Start of the CJK Unified Ideographs block, which is large enough to give every
+# base glyph its own BMP codepoint.
+FIRST_CODEPOINT = 0x4E00
+# CJK Unified Ideographs Extension B, for the supplementary (format 12) mappings.
+FIRST_SUPPLEMENTARY_CODEPOINT = 0x20000
+VARIATION_SELECTOR = 0xE0100
+
+
+def _drawBox(pen, i: int) -> None:
+    # A few contours per glyph, so that glyf/CFF have a realistic size.
+    for j in range(3):
+        x, y = 50 + j * 150, 50 + (i % 7) * 10
+        pen.moveTo((x, y))
+        pen.lineTo((x + 100, y))
+        pen.lineTo((x + 100, y + 600))
+        pen.lineTo((x, y + 600))
+        pen.closePath()
+
+
+def buildSyntheticFont(
+    path: str | os.PathLike,
+    numGlyphs: int = 1000,
+    numLookups: int = 4,
+    cff: bool = False,
+    supplementary: bool = False,
+    variationSequences: int = 0,
+) -> None:
+    """Build a font with ``numGlyphs`` glyphs and ``numLookups`` features.
+
+    Half of the glyphs are encoded base glyphs, the other half are alternates.
+    Feature ``ss01``..``ssNN`` (and ``smcp`` for the first one) each substitute
+    a different slice of the base glyphs with their alternates.
+
+    With ``supplementary``, every base glyph is also mapped from a codepoint
+    beyond the BMP, which adds format 12 subtables next to the format 4 ones.
+    ``variationSequences`` adds a format 14 subtable mapping that many base
+    glyphs plus a variation selector to their alternates.
+    """
+    numBase = max(1, (numGlyphs - 1) // 2)
+    base = [f"uni{FIRST_CODEPOINT + i:04X}" for i in range(numBase)]
+    alts = [f"{name}.alt" for name in base]
+    glyphOrder = [".notdef", *base, *alts]
+
+    fb = FontBuilder(1000, isTTF=not cff)
+    fb.setupGlyphOrder(glyphOrder)
+    mapping = {FIRST_CODEPOINT + i: name for i, name in enumerate(base)}
+    if supplementary:
+        mapping.update(
+            {FIRST_SUPPLEMENTARY_CODEPOINT + i: name for i, name in enumerate(base)}
+        )
+    uvs = [
+        (FIRST_CODEPOINT + i, VARIATION_SELECTOR, alts[i])
+        for i in range(min(variationSequences, numBase))
+    ]
+    fb.setupCharacterMap(mapping, uvs=uvs or None)
+    if cff:
+        charStrings = {}
+        for i, name in enumerate(glyphOrder):
+            pen = T2CharStringPen(500, None)
+            _drawBox(pen, i)
+            charStrings[name] = pen.getCharString()
+        fb.setupCFF("Synthetic-Regular", {"FullName": "Synthetic"}, charStrings, {})
+    else:
+        glyphs = {}
+        for i, name in enumerate(glyphOrder):
+            pen = TTGlyphPen(None)
+            _drawBox(pen, i)
+            glyphs[name] = pen.glyph()
+        fb.setupGlyf(glyphs)
+    fb.setupHorizontalMetrics(dict.fromkeys(glyphOrder, (500, 0)))
+    fb.setupHorizontalHeader()
+    fb.setupNameTable({"familyName": "Synthetic", "styleName": "Regular"})
+    fb.setupOS2()
+    fb.setupPost()
+
+    features = []
+    sliceSize = max(1, numBase // max(1, numLookups))
+    for n in range(numLookups):
+        start = (n * sliceSize) % numBase
+        sources = base[start : start + sliceSize]
+        targets = alts[start : start + sliceSize]
+        tag = "smcp" if n == 0 else f"ss{n % 100:02d}"
+        features.append(
+            f"feature {tag} {{ sub [{' '.join(sources)}] by [{' '.join(targets)}]; }} "
+            f"{tag};"
+        )
+    addOpenTypeFeaturesFromString(fb.font, "\n".join(features))
+    fb.save(path)
@@ -1,86 +1,380 @@
 from __future__ import annotations
 
+import contextlib
 import logging
 import os
+import struct
+import sys
+from argparse import Namespace
 from collections.abc import Mapping, MutableMapping
+from pathlib import Path
 from types import SimpleNamespace
-from typing import TYPE_CHECKING, List, Optional, Set
+from typing import TYPE_CHECKING, Any, BinaryIO, List, Optional, Set
 
-import fontTools.ttLib as ttLib
+import fontTools.ttLib
+from fontTools.misc.fixedTools import floatToFixedToFloat
+from fontTools.ttLib.tables.DefaultTable import DefaultTable
+from fontTools.varLib.models import normalizeLocation, piecewiseLinearMap
+
+from opentype_feature_freezer import (
+    cffnames,
+    mapped,
+    remapping,
+    reporting,
+    substitutions,
+    writer,
+)
+from opentype_feature_freezer.cache import DEFAULT_MAX_SIZE as DEFAULT_CACHE_SIZE
+from opentype_feature_freezer.cache import PlanCache
+from opentype_feature_freezer.layout import LayoutIndex
+from opentype_feature_freezer.state import FreezeState, glyphIdArray
+from opentype_feature_freezer.stats import FreezeStats
 
 if TYPE_CHECKING:
-    from argparse import Namespace
+    from collections.abc import Iterator, Sequence
+
+    from opentype_feature_freezer.stats import StatsHook
 
 __version__ = "1.32.2"
 
 
 logger = logging.getLogger(__name__)
 
+FLAVOR_SIGNATURES = {b"wOFF": "woff", b"wOF2": "woff2"}
+FLAVOR_EXTENSIONS = {None: ".otf", "woff": ".woff", "woff2": ".woff2"}
+
+
+def _readSignature(path: str | os.PathLike | BinaryIO) -> bytes:
+    if hasattr(path, "read"):
+        # A file object, e.g. io.BytesIO: peek without moving.
+        position = path.tell()
+        signature = path.read(4)
+        path.seek(position)
+        return signature
+    with Path(path).open("rb") as f:
+        return f.read(4)
+
+
+def detectFlavor(path: str | os.PathLike | BinaryIO) -> str | None:
+    try:
+        return FLAVOR_SIGNATURES.get(_readSignature(path))
+    except OSError:
+        return None
+
+
+def outputFlavor(
+    inpath: str | os.PathLike | BinaryIO, flavor: str | None
+) -> str | None:
+    # An explicit --flavor wins ('sfnt' meaning plain OpenType), otherwise the
+    # output keeps the flavor of the input font.
+    if flavor:
+        return None if flavor == "sfnt" else flavor
+    return detectFlavor(inpath)
+
+
+def isCollectionFile(path: str | os.PathLike | BinaryIO) -> bool:
+    try:
+        return _readSignature(path) == b"ttcf"
+    except OSError:
+        return False
+
+
+def outputSuffix(inpath: str | os.PathLike | BinaryIO, flavor: str | None) -> str:
+    # The extension of default output paths: collections keep theirs, other
+    # fonts get the one of their output flavor.
+    if isCollectionFile(inpath):
+        return Path(inpath).suffix or ".ttc"  # type: ignore[arg-type]
+    return FLAVOR_EXTENSIONS[outputFlavor(inpath, flavor)]
+
+
+def displayPath(path: str | os.PathLike | BinaryIO) -> str:
+    if isinstance(path, (str, os.PathLike)):
+        return os.fspath(path)
+    return f"<{type(path).__name__}>"
+
+
+def parseLocation(spec: str) -> dict[str, float]:
+    """Parse a design-space location like ``'wght=700,wdth=87.5'``.
+
+    Raises ValueError for malformed locations.
+    """
+    location: dict[str, float] = {}
+    for item in spec.split(","):
+        if not item.strip():
+            continue
+        tag, sep, value = item.partition("=")
+        if not sep or not tag.strip():
+            raise ValueError(f"invalid axis setting '{item}', expected TAG=VALUE")
+        location[tag.strip()] = float(value)
+    return location
+
+
+def _stateAttribute(name: str) -> property:
+    return property(
+        lambda self: getattr(self.state, name),
+        lambda self, value: setattr(self.state, name, value),
+    )
+
 
 class RemapByOTL:
-    def __init__(self, options: Namespace):
-        self.inpath: os.PathLike = options.inpath
-        self.outpath: os.PathLike = options.outpath
+    FeatureIndex = _stateAttribute("FeatureIndex")
+    LookupList = _stateAttribute("LookupList")
+    filterByFeatures = _stateAttribute("filterByFeatures")
+    filterByLangSys = _stateAttribute("filterByLangSys")
+    filterByLocation = _stateAttribute("filterByLocation")
+    filterByScript = _stateAttribute("filterByScript")
+
+    def __init__(self, options: Namespace, statsHooks: Sequence[StatsHook] = ()):
+        # inpath and outpath can also be binary file objects, see freeze_bytes().
+        self.inpath: os.PathLike | BinaryIO = options.inpath
+        self.outpath: os.PathLike | BinaryIO = options.outpath
+        self.flavor: str | None = outputFlavor(
+            self.inpath, getattr(options, "flavor", None)
+        )
         if not self.outpath:
-            self.outpath = os.fspath(self.inpath) + ".featfreeze.otf"
-        self.FeatureIndex: list[int] | None = None
-        self.filterByFeatures: list[str] | None = None
-        self.filterByLangSys: str | None = None
-        self.filterByScript: str | None = None
-        self.LookupList: list[int] | None = None
-        self.names: list[str] = []
+            suffix = outputSuffix(self.inpath, getattr(options, "flavor", None))
+            self.outpath = os.fspath(self.inpath) + ".featfreeze" + suffix
+        self.state: FreezeState = FreezeState()
+        # Raw data of tables patched without decompiling them, by id of the
+        # font and by tag.
+        self._patchedTables: dict[int, dict[str, bytes]] = {}
+        # LayoutIndex of each GSUB table, by table id.
+        self._layoutIndexCache: dict[int, LayoutIndex] = {}
+        # Decoded lookups (and the lookups decoded only in part) by GSUB
+        # table, glyph order and alternate chooser, reused by variants and by
+        # collection members that share the table.
+        self._lookupMappingCache: dict[
+            tuple, tuple[dict[int, dict[int, int]], set[int]]
+        ] = {}
+        # Picks the glyph of alternate substitutions; overrides --alternate.
+        self.chooseAlternate: substitutions.AlternateChooser | None = None
+        self.modifiedTables: set[str] = set()
         self.options: SimpleNamespace = options
-        self.reportFeature: list[str] = []
-        self.reportLangSys: list[str] = []
-        self.subs0: list[str] = []
-        self.subs1: list[str] = []
-        self.substitution_mapping: MutableMapping[str, str] = {}
+        self.report: dict | None = None
+        self.stats: FreezeStats = FreezeStats()
+        # Called as hook(stage, stats) after every stage and with "run" at the
+        # end, e.g. to forward the timings to a job scheduler.
+        self.statsHooks: list[StatsHook] = list(statsHooks)
         self.success: bool = True
+        self._mappedFile: mapped.MemoryReader | None = None
         self.ttx: fontTools.ttLib.TTFont | None = None
+        self.ttc: fontTools.ttLib.TTCollection | None = None
         logger.info("[RemapByOTL] Running with options: %s", self.options)
 
+    @property
+    def names(self) -> list[str]:
+        return self.state.names()
+
+    @property
+    def substitution_mapping(self) -> dict[str, str]:
+        # Only the glyphs that change, by name.
+        return self.state.substitutionMapping()
+
+    @contextlib.contextmanager
+    def _stage(self, name: str) -> Iterator[None]:
+        with self.stats.measure(name):
+            yield
+        for hook in self.statsHooks:
+            hook(name, self.stats)
+
+    def _startStats(self) -> None:
+        self.stats = FreezeStats(
+            inpath=displayPath(self.inpath), outpath=displayPath(self.outpath)
+        )
+
+    def _finishStats(self, success: bool | None = None) -> FreezeStats:
+        self.stats.success = self.success if success is None else success
+        for hook in self.statsHooks:
+            hook("run", self.stats)
+        return self.stats
+
     def openFont(self) -> None:
         self.success = True
+        self._lookupMappingCache.clear()
+        self._layoutIndexCache.clear()
+        self._patchedTables.clear()
         self._openFontTTX()
         if not self.ttx:
             self.success = False
         if self.success:
             logger.info(f"[openFont] Opened font: {self.inpath}")
 
+    def isLazy(self) -> bool:
+        # Reading through mmap only pays off if the tables are loaded lazily.
+        return bool(
+            getattr(self.options, "lazy", False) or getattr(self.options, "mmap", False)
+        )
+
+    def _inputFile(self) -> os.PathLike | BinaryIO:
+        if getattr(self.options, "mmap", False) and isinstance(
+            self.inpath, (str, os.PathLike)
+        ):
+            self._mappedFile = mapped.openMapped(self.inpath)
+            logger.info("[_inputFile] Mapped %s into memory", self.inpath)
+            return self._mappedFile
+        return self.inpath
+
+    def _closeInputFile(self) -> None:
+        if self._mappedFile is not None:
+            self._mappedFile.close()
+            self._mappedFile = None
+
     def _openFontTTX(self) -> None:
         self.success = True
         if self.inpath:
             try:
-                self.ttx = fontTools.ttLib.TTFont(self.inpath, 0, recalcBBoxes=False)
+                self.ttx = fontTools.ttLib.TTFont(
+                    self._inputFile(),
+                    0,
+                    recalcBBoxes=False,
+                    lazy=True if self.isLazy() else None,
+                )
             except Exception as e:
                 logger.warning("[_openFontTTX] TTX cannot open %s: %s", self.inpath, e)
+                self._closeInputFile()
                 self.success = False
                 self.ttx = None
+                return
+            # fontTools decompresses WOFF/WOFF2 input on the fly and compresses
+            # the output according to the font's flavor.
+            if self.ttx.flavor != self.flavor:
+                logger.info(
+                    "[_openFontTTX] Converting flavor %s to %s",
+                    self.ttx.flavor or "sfnt",
+                    self.flavor or "sfnt",
+                )
+                self.ttx.flavor = self.flavor
+                if self.flavor is None:
+                    self.ttx.flavorData = None
 
     def saveFont(self) -> None:
-        if self.options.report:
-            self._reportFont()
-        else:
-            if self.options.zapnames:
-                assert self.ttx is not None
-                self.ttx["post"].formatType = 3.0
-            self._saveFontTTX()
-            if self.success:
-                logger.info(f"[saveFont] Saved font: {self.outpath}")
+        if self.options.zapnames:
+            assert self.ttx is not None
+            self.ttx["post"].formatType = 3.0
+            self.modifiedTables.add("post")
+        with self._instanceLoaded():
+            if not self.success:
+                return
+            assert self.ttx is not None
+            released = {}
+            passThrough = writer.canPassThrough(self.ttx, self.outpath)
+            if self.isLazy() and not passThrough:
+                released = self._releaseUnmodifiedTables()
+            self._compileCmaps([self.ttx])
+            with contextlib.ExitStack() as stack:
+                stack.enter_context(self._patchedTablesLoaded([self.ttx]))
+                if self._mappedFile is not None:
+                    # Copy the unmodified tables from the mapped file to the
+                    # output without first copying them into memory of our own.
+                    stack.enter_context(self._mappedFile.views(passThrough))
+                self._saveFontTTX(passThrough)
+            # Keep the parsed tables around for further variants of this font.
+            self.ttx.tables.update(released)
+        if self.success:
+            logger.info(f"[saveFont] Saved font: {self.outpath}")
 
-    def _reportFont(self) -> None:
-        self.success = True
-        print(
-            "# Scripts and languages:\n{}".format("\n".join(sorted(self.reportLangSys)))
+    @contextlib.contextmanager
+    def _instanceLoaded(self) -> Iterator[None]:
+        # With --instance, the instance of the variable font at --location is
+        # saved instead of the font, which stays as it is for further variants.
+        if not getattr(self.options, "instance", False):
+            yield
+            return
+        variable = self.ttx
+        assert variable is not None
+        if "fvar" not in variable:
+            logger.warning(
+                "[_instanceLoaded] %s is not a variable font, saving it as it is",
+                displayPath(self.inpath),
+            )
+            yield
+            return
+        from fontTools.varLib import instancer
+
+        location = parseLocation(getattr(self.options, "location", None) or "")
+        # Axes without a coordinate are pinned at their default, which is
+        # where variationLocation() put them.
+        limits = {
+            axis.axisTag: location.get(axis.axisTag) for axis in variable["fvar"].axes
+        }
+        try:
+            instance = instancer.instantiateVariableFont(
+                variable, limits, inplace=False
+            )
+        except Exception as e:
+            logger.warning("[_instanceLoaded] Cannot instantiate the font: %s", e)
+            self.success = False
+            yield
+            return
+        logger.info("[_instanceLoaded] Instantiated the font at %s", limits)
+        modified = set(self.modifiedTables)
+        # The instancer changes any table, but not cmap or CFF.
+        self.modifiedTables.update(
+            tag for tag in instance.tables if tag != "GlyphOrder"
         )
-        print("# Features:\n-f {}".format(",".join(sorted(self.reportFeature))))
+        patched = self._patchedTables.get(id(variable))
+        if patched:
+            self._patchedTables[id(instance)] = patched
+        self.ttx = instance
+        try:
+            yield
+        finally:
+            self._patchedTables.pop(id(instance), None)
+            self.ttx = variable
+            self.modifiedTables = modified
 
-    def _saveFontTTX(self) -> None:
+    def reportFont(self) -> None:
+        self.success = True
+        tables = ["GSUB"]
+        if getattr(self.options, "report_gpos", False):
+            tables.append("GPOS")
+        try:
+            self.report = reporting.readLayoutReport(self.inpath, tables)
+        except Exception as e:
+            logger.warning("[reportFont] Cannot read %s: %s", self.inpath, e)
+            self.success = False
+            return
+        if getattr(self.options, "report_format", "text") == "json":
+            output = reporting.formatReportJson(self.report)
+        else:
+            output = reporting.formatReportText(self.report)
+        # One write per font, so that reports of parallel batch workers sharing
+        # stdout don't interleave.
+        sys.stdout.write(output + "\n")
+        sys.stdout.flush()
+
+    def _releaseUnmodifiedTables(self) -> dict:
+        # Tables that were only read (GSUB, post and CFF for the glyph order,
+        # maxp, ...) are taken out of the font, so that fontTools copies their
+        # original bytes from the input file instead of recompiling them. 'head'
+        # stays loaded so that its modification timestamp is still updated.
+        assert self.ttx is not None
+        released: dict = {}
+        reader = self.ttx.reader
+        if reader is None:
+            return released
+        for tag in list(self.ttx.tables):
+            if tag in self.modifiedTables or tag == "head" or tag not in reader:
+                continue
+            released[tag] = self.ttx.tables.pop(tag)
+            logger.info("[_releaseUnmodifiedTables] Passing through '%s' table", tag)
+        return released
+
+    def _saveFontTTX(self, passThrough: bool = False) -> None:
         self.success = True
         outpath = self.outpath
         try:
             assert self.ttx is not None
-            self.ttx.save(outpath)
+            if passThrough:
+                # Only the modified tables are compiled; the others are copied
+                # from the input with their checksums.
+                writer.writeFont(self.ttx, outpath, self.modifiedTables)
+                logger.info(
+                    "[_saveFontTTX] Compiled %s, passed the other tables through",
+                    ", ".join(sorted(self.modifiedTables | {"head"})),
+                )
+            else:
+                self.ttx.save(outpath)
         except Exception as e:
             logger.warning(f"[_saveFontTTX] TTX cannot save {outpath}: {e}")
             self.success = False
@@ -92,12 +386,42 @@ class RemapByOTL:
     def _closeFontTTX(self) -> None:
         self.success = True
         if self.ttx:
+            self._detachCallerFile(self.ttx)
             self.ttx.close()
+        self._closeInputFile()
+
+    def _detachCallerFile(self, font: fontTools.ttLib.TTFont) -> None:
+        # TTFont.close() closes the file it reads from; leave file objects that
+        # were passed in as inpath (e.g. by freeze_into()) open.
+        if font.reader is not None and font.reader.file is self.inpath:
+            font.reader = None
 
     def initSubs(self) -> None:
         self.success = True
-        self.subs0 = list(self.ttx.getGlyphOrder())
-        self.subs1 = list(self.ttx.getGlyphOrder())
+        assert self.ttx is not None
+        glyph_order = self.ttx.getGlyphOrder()
+        self.state.glyphOrder = glyph_order
+        self.state.changed = {}
+        self.state.nameIds = glyphIdArray(len(glyph_order))
+
+    def layoutIndex(self) -> LayoutIndex:
+        """Return the ``LayoutIndex`` of the font's GSUB table.
+
+        It's built once per table, also for variants and for collection
+        members that share the table.
+        """
+        assert self.ttx is not None
+        table = self.ttx["GSUB"]
+        index = self._layoutIndexCache.get(id(table))
+        if index is None:
+            reader = self.ttx.reader
+            if reader is not None and "GSUB" in reader:
+                data = reader["GSUB"]
+            else:
+                data = table.compile(self.ttx)
+            index = LayoutIndex.fromData(data)
+            self._layoutIndexCache[id(table)] = index
+        return index
 
     def filterFeatureIndex(self) -> None:
         self.success = True
@@ -109,27 +433,10 @@ class RemapByOTL:
             self.success = True
             return
 
-        gsub = self.ttx["GSUB"].table
-        feature_index_set: set[int] = set()
-        for ScriptRecord in gsub.ScriptList.ScriptRecord:
-            if self.options.report:
-                self.reportLangSys.append(f"-s '{ScriptRecord.ScriptTag}'")
-                for LangSysRecord in ScriptRecord.Script.LangSysRecord:
-                    self.reportLangSys.append(
-                        f"-s '{ScriptRecord.ScriptTag}' -l '{LangSysRecord.LangSysTag}'"
-                    )
-            if (
-                ScriptRecord.ScriptTag == self.filterByScript
-            ) or not self.filterByScript:
-                if self.filterByLangSys:
-                    for LangSysRecord in ScriptRecord.Script.LangSysRecord:
-                        if LangSysRecord.LangSysTag == self.filterByLangSys:
-                            feature_index_set.update(LangSysRecord.LangSys.FeatureIndex)
-                else:
-                    feature_index_set.update(
-                        ScriptRecord.Script.DefaultLangSys.FeatureIndex
-                    )
-            self.FeatureIndex = sorted(feature_index_set)
+        index = self.layoutIndex()
+        self.FeatureIndex = index.featureIndices(
+            self.filterByScript or None, self.filterByLangSys or None
+        )
         logger.info(f"[filterFeatureIndex] FeatureIndex: {self.FeatureIndex}")
 
     def filterLookupList(self) -> None:
@@ -141,26 +448,125 @@ class RemapByOTL:
             self.success = True
             return
 
-        gsub = self.ttx["GSUB"].table
-        lookup_list_set: set[int] = set()
-        if self.options.report:
-            for FeatureRecord in gsub.FeatureList.FeatureRecord:
-                self.reportFeature.append(FeatureRecord.FeatureTag)
-
-        assert self.FeatureIndex is not None
-        for fi in self.FeatureIndex:
-            if gsub.FeatureList.FeatureRecord[fi].FeatureTag in self.filterByFeatures:
-                lookup_list_set.update(
-                    gsub.FeatureList.FeatureRecord[fi].Feature.LookupListIndex
-                )
-        self.LookupList = sorted(lookup_list_set)
+        index = self.layoutIndex()
+        self.LookupList = index.lookups(
+            self.filterByFeatures,
+            self.filterByScript or None,
+            self.filterByLangSys or None,
+            self.variationLocation(),
+        )
         logger.info(f"[filterLookupList] Lookups: {self.LookupList}")
 
-    def applySubstitutions(self) -> None:
+    def variationLocation(self) -> list[float]:
+        """Return the normalized coordinates of ``--location`` in fvar axis order.
+
+        FeatureVariations are evaluated at this location; axes that aren't
+        given, and all axes without ``--location``, are at their default.
+        Returns an empty list for fonts that aren't variable.
+        """
+        assert self.ttx is not None
+        if self.filterByLocation is not None:
+            return self.filterByLocation
+        self.filterByLocation = []
+        spec = getattr(self.options, "location", None)
+        if "fvar" not in self.ttx:
+            if spec:
+                logger.warning(
+                    "[variationLocation] %s is not a variable font, ignoring "
+                    "the location",
+                    displayPath(self.inpath),
+                )
+            return self.filterByLocation
+        axes = self.ttx["fvar"].axes
+        location = parseLocation(spec) if spec else {}
+        unknown = set(location) - {axis.axisTag for axis in axes}
+        if unknown:
+            logger.warning(
+                "[variationLocation] Ignoring axes not in the font: %s",
+                ", ".join(sorted(unknown)),
+            )
+        normalized = normalizeLocation(
+            location,
+            {
+                axis.axisTag: (axis.minValue, axis.defaultValue, axis.maxValue)
+                for axis in axes
+            },
+        )
+        if "avar" in self.ttx:
+            segments = self.ttx["avar"].segments
+            normalized = {
+                tag: piecewiseLinearMap(value, segments[tag])
+                if segments.get(tag)
+                else value
+                for tag, value in normalized.items()
+            }
+        # FeatureVariations conditions are F2Dot14 values.
+        self.filterByLocation = [
+            floatToFixedToFloat(normalized.get(axis.axisTag, 0), 14) for axis in axes
+        ]
+        logger.info("[variationLocation] Location: %s", self.filterByLocation)
+        return self.filterByLocation
+
+    def composeSubstitutions(self) -> None:
         self.success = True
         assert self.ttx is not None
         if "GSUB" not in self.ttx:
-            self.success = True
+            self.state.changed = {}
+            return
+
+        glyph_ids = self.ttx.getReverseGlyphMap()
+        gsub = self.ttx["GSUB"].table
+        choose_alternate = self.chooseAlternate or substitutions.alternateByIndex(
+            int(getattr(self.options, "alternate", 0) or 0)
+        )
+        skipped: dict[int, int] = {}
+
+        def skipSubtable(lookup_type: int) -> None:
+            self.stats.skipSubtable(lookup_type)
+            skipped[lookup_type] = skipped.get(lookup_type, 0) + 1
+
+        cache, partial = self._lookupMappingCache.setdefault(
+            (id(gsub), id(glyph_ids), choose_alternate), ({}, set())
+        )
+        decoder = substitutions.LookupDecoder(
+            gsub.LookupList.Lookup,
+            glyph_ids,
+            choose_alternate,
+            skipSubtable,
+            cache,
+            partial,
+        )
+        assert self.LookupList is not None
+        mappings = []
+        for LookupID in self.LookupList:
+            self.stats.lookups_visited += 1
+            if LookupID in cache:
+                self.stats.lookup_cache_hits += 1
+            mappings.append((LookupID, decoder.lookupMapping(LookupID) or {}))
+
+        for lookup_type, count in sorted(skipped.items()):
+            logger.warning(
+                "[composeSubstitutions] Skipped %d subtable(s) of lookup type %d "
+                "(%s), which cannot be frozen",
+                count,
+                lookup_type,
+                substitutions.LOOKUP_TYPE_NAMES.get(lookup_type, "unknown"),
+            )
+
+        self.state.changed, cycles = substitutions.composeMappings(mappings)
+        glyph_order = self.state.glyphOrder
+        for gid, LookupID in cycles:
+            self.stats.substitution_cycles += 1
+            logger.warning(
+                "[composeSubstitutions] Lookup %d substitutes '%s' back to itself",
+                LookupID,
+                glyph_order[gid],
+            )
+
+    def applySubstitutions(self) -> None:
+        self.success = True
+        assert self.ttx is not None
+        if not self.state.changed:
             return
 
         glyphs_with_unicode_value: set[str] = {
@@ -168,73 +574,56 @@ class RemapByOTL:
             for cmap_table in self.ttx["cmap"].tables
             for glyph_name in cmap_table.cmap.values()
         }
+        glyph_order = self.state.glyphOrder
+        for gid_in, gid_out in self.state.changed.items():
+            self.stats.mappings_applied += 1
+            sub_in, sub_out = glyph_order[gid_in], glyph_order[gid_out]
+            if (
+                sub_in not in glyphs_with_unicode_value
+                and sub_out not in glyphs_with_unicode_value
+            ):
+                logger.warning(
+                    f"[applySubstitutions] Cannot remap '{sub_in}' -> '{sub_out}' "
+                    "because neither has a Unicode value assigned in any of the "
+                    "cmap tables."
+                )
+                continue
 
-        gsub = self.ttx["GSUB"].table
-        assert self.LookupList is not None
-        for LookupID in self.LookupList:
-            Lookup = gsub.LookupList.Lookup[LookupID]
-            for Subtable in Lookup.SubTable:
-                if Subtable.LookupType not in {1, 3, 7}:
-                    continue
-
-                mapping: Mapping[str, str] = {}
-                alternates: Mapping[str, list[str]] = {}
-
-                if Subtable.LookupType == 1:
-                    mapping = Subtable.mapping
-                elif Subtable.LookupType == 3:
-                    alternates = Subtable.alternates
-                elif Subtable.LookupType == 7:
-                    ExtSubTable = Subtable.ExtSubTable
-                    if ExtSubTable.LookupType == 1:
-                        mapping = ExtSubTable.mapping
-                    elif ExtSubTable.LookupType == 3:
-                        alternates = ExtSubTable.alternates
-
-                for sub_in, sub_out in mapping.items():
-                    for i, current_glyph in enumerate(self.subs1):
-                        if current_glyph == sub_in:
-                            self.subs1[i] = sub_out
-
-                for sub_in, sub_out_glyph_list in alternates.items():
-                    if sub_out_glyph_list:
-                        sub_out_first = sub_out_glyph_list[0]
-                        for i, current_glyph in enumerate(self.subs1):
-                            if current_glyph == sub_in:
-                                self.subs1[i] = sub_out_first
-
-        if len(self.subs0) != len(self.subs1):
-            raise RuntimeError("Internal error: Substitution mapping out of sync.")
-
-        for sub_in, sub_out in zip(self.subs0, self.subs1):
-            self.substitution_mapping[sub_in] = sub_out
-            if sub_in != sub_out:
-                if (
-                    sub_in not in glyphs_with_unicode_value
-                    and sub_out not in glyphs_with_unicode_value
-                ):
-                    logger.warning(
-                        f"[applySubstitutions] Cannot remap '{sub_in}' -> '{sub_out}' "
-                        "because neither has a Unicode value assigned in any of the "
-                        "cmap tables."
-                    )
-                    continue
-
-                if self.options.names:
-                    self.names.append(sub_out)
+            if self.options.names:
+                self.state.nameIds.append(gid_out)
 
-                logger.info("[applySubstitutions] Remap: '%s' -> '%s'", sub_in, sub_out)
+            logger.info("[applySubstitutions] Remap: '%s' -> '%s'", sub_in, sub_out)
 
-    def remapCmaps(self) -> None:
+    def remapCmaps(self, remapped: set[int] | None = None) -> None:
         self.success = True
         assert self.ttx is not None
         cmap = self.ttx["cmap"]
+        self.modifiedTables.add("cmap")
+        # fontTools shares one dict between subtables that point at the same
+        # data (and between collection members sharing a cmap table); remapping
+        # it twice would apply the substitutions twice.
+        if remapped is None:
+            remapped = set()
+        cmaps: list[MutableMapping[int, str]] = []
+        uvs_dicts: list[remapping.UvsDict] = []
         for cmaptable in cmap.tables:
-            current_cmap: MutableMapping[int, str] = cmaptable.cmap
-            for u_code, glyph_name in list(current_cmap.items()):
-                current_cmap[u_code] = self.substitution_mapping.get(
-                    glyph_name, glyph_name
-                )
+            if cmaptable.format == 14:
+                if id(cmaptable.uvsDict) not in remapped:
+                    remapped.add(id(cmaptable.uvsDict))
+                    uvs_dicts.append(cmaptable.uvsDict)
+            elif id(cmaptable.cmap) not in remapped:
+                remapped.add(id(cmaptable.cmap))
+                cmaps.append(cmaptable.cmap)
+        self.stats.cmap_entries_rewritten += remapping.remapCmaps(
+            cmaps,
+            self.substitution_mapping,
+            self.ttx.getGlyphOrder(),
+            self.ttx.getReverseGlyphMap(),
+            useNumpy=getattr(self.options, "cmap_engine", None) == "numpy",
+        )
+        self.stats.cmap_entries_rewritten += remapping.remapUvs(
+            uvs_dicts, self.substitution_mapping
+        )
 
     def renameFont(self) -> bool:
         self.success = True
@@ -243,6 +632,7 @@ class RemapByOTL:
             return self.success
 
         name_table: fontTools.ttLib.tables._n_a_m_e.table__n_a_m_e = self.ttx["name"]
+        self.modifiedTables.add("name")
 
         name_record_16 = name_table.getName(16, 3, 1)
         name_record_1 = name_table.getName(1, 3, 1)
@@ -290,6 +680,7 @@ class RemapByOTL:
 
         for record in name_table.names:
             record_str = record.toStr()
+            string_old = record.string
             if record.nameID in {
                 1,
                 4,
@@ -309,6 +700,8 @@ class RemapByOTL:
                 record.string = record_str.replace(
                     family_name_no_space_old, family_name_new_no_space
                 )
+            if record.string != string_old:
+                self.stats.name_records_touched += 1
 
         full_name_new_obj = name_table.getName(4, 3, 1)
         postscript_name_new_obj = name_table.getName(6, 3, 1)
@@ -323,6 +716,10 @@ class RemapByOTL:
         )
 
         if "CFF " in self.ttx:
+            self.modifiedTables.add("CFF ")
+        if "CFF " in self.ttx and not self._patchCFFNames(
+            postscript_name_new, family_name_new, full_name_new
+        ):
             cff_table = self.ttx["CFF "].cff
             if len(cff_table.fontNames) > 1:
                 logger.warning(
@@ -340,49 +737,506 @@ class RemapByOTL:
 
         return self.success
 
+    def _patchCFFNames(self, fontName: str, familyName: str, fullName: str) -> bool:
+        # Renames the CFF font in the raw table data, so that the CFF table is
+        # neither fully decompiled nor recompiled; the patched data is saved
+        # instead of the table (see _patchedTablesLoaded()).
+        assert self.ttx is not None
+        reader = self.ttx.reader
+        if reader is None or "CFF " not in reader:
+            return False
+        try:
+            data = cffnames.renameCFF(reader["CFF "], fontName, familyName, fullName)
+        except (cffnames.CFFPatchError, struct.error) as e:
+            logger.info("[_patchCFFNames] Recompiling the CFF table: %s", e)
+            return False
+        self._patchedTables.setdefault(id(self.ttx), {})["CFF "] = data
+        return True
+
+    def _compileCmaps(self, fonts: Sequence[fontTools.ttLib.TTFont]) -> None:
+        # Compiles the remapped cmap tables with remapping.compileCmap(), which
+        # compiles each distinct subtable once, and saves them as raw data (see
+        # _patchedTablesLoaded()). Fonts sharing a cmap table and glyph order
+        # share the data.
+        if "cmap" not in self.modifiedTables:
+            return
+        compiled: dict[tuple[int, int], bytes] = {}
+        for font in fonts:
+            if "cmap" not in font or not font.isLoaded("cmap"):
+                continue
+            table = font["cmap"]
+            key = (id(table), id(font.getGlyphOrder()))
+            if key not in compiled:
+                try:
+                    compiled[key] = remapping.compileCmap(table, font)
+                except Exception as e:
+                    # Left to fontTools, which reports the error when saving.
+                    logger.info("[_compileCmaps] Cannot compile cmap: %s", e)
+                    continue
+            self._patchedTables.setdefault(id(font), {})["cmap"] = compiled[key]
+
+    @contextlib.contextmanager
+    def _patchedTablesLoaded(
+        self, fonts: Sequence[fontTools.ttLib.TTFont]
+    ) -> Iterator[None]:
+        # Saves the tables patched as raw data from that data.
+        replaced = []
+        for font in fonts:
+            for tag, data in self._patchedTables.get(id(font), {}).items():
+                table = DefaultTable(tag)
+                table.data = data
+                replaced.append((font, tag, font.tables.get(tag)))
+                font.tables[tag] = table
+        try:
+            yield
+        finally:
+            for font, tag, table in reversed(replaced):
+                if table is None:
+                    del font.tables[tag]
+                else:
+                    font.tables[tag] = table
+
+    def _planCacheEntry(self) -> tuple[PlanCache | None, str | None]:
+        cache_dir = getattr(self.options, "cache", None)
+        if not cache_dir:
+            return None, None
+        cache_size = getattr(self.options, "cache_size", None)
+        cache = PlanCache.forDirectory(
+            cache_dir,
+            DEFAULT_CACHE_SIZE if cache_size is None else cache_size * 2**20,
+        )
+        assert self.ttx is not None
+        reader = self.ttx.reader
+        # A chooser set from Python has no stable identity to key the plan by.
+        if reader is None or self.chooseAlternate is not None:
+            return cache, None
+        tables = {tag: reader[tag] for tag in ("GSUB", "cmap") if tag in reader}
+        options = {
+            "features": sorted(set(self.options.features.split(","))),
+            "script": self.options.script,
+            "lang": self.options.lang,
+            "names": bool(self.options.names),
+            "alternate": int(getattr(self.options, "alternate", 0) or 0),
+            "location": self.variationLocation(),
+        }
+        return cache, PlanCache.makeKey(tables, options)
+
+    def _makePlan(self) -> dict:
+        assert self.ttx is not None
+        plan: dict = {
+            "FeatureIndex": self.FeatureIndex,
+            "LookupList": self.LookupList,
+            "changed": [list(pair) for pair in self.state.changed.items()],
+            "names": self.state.nameIds.tolist(),
+        }
+        return plan
+
+    def _applyPlan(self, plan: dict) -> None:
+        assert self.ttx is not None
+        glyph_order = self.ttx.getGlyphOrder()
+        self.state.glyphOrder = glyph_order
+        self.filterByScript = self.options.script
+        self.filterByLangSys = self.options.lang
+        self.filterByFeatures = self.options.features.split(",")
+        self.variationLocation()
+        self.FeatureIndex = plan["FeatureIndex"]
+        self.LookupList = plan["LookupList"]
+        self.state.changed = dict(map(tuple, plan["changed"]))
+        self.stats.mappings_applied += len(plan["changed"])
+        self.state.nameIds = glyphIdArray(len(glyph_order), plan["names"])
+        logger.info("[remapByOTL] Reusing cached plan, lookups: %s", self.LookupList)
+
+    def computeSubstitutions(self) -> None:
+        self.success = True
+        cache, key = self._planCacheEntry()
+        plan = cache.get(key) if cache is not None and key is not None else None
+        if plan is not None:
+            self.stats.plan_cache_hits += 1
+            with self._stage("applyPlan"):
+                self._applyPlan(plan)
+        else:
+            with self._stage("initSubs"):
+                self.initSubs()
+            if not self.success:
+                return
+
+            with self._stage("filterFeatureIndex"):
+                self.filterFeatureIndex()
+            if not self.success:
+                return
+
+            with self._stage("filterLookupList"):
+                self.filterLookupList()
+            if not self.success:
+                return
+
+            with self._stage("composeSubstitutions"):
+                self.composeSubstitutions()
+            if not self.success:
+                return
+
+            with self._stage("applySubstitutions"):
+                self.applySubstitutions()
+            if not self.success:
+                return
+
+            if cache is not None and key is not None:
+                cache.put(key, self._makePlan())
+        if cache is not None:
+            logger.info(
+                "[remapByOTL] Plan cache: %d hits, %d misses", cache.hits, cache.misses
+            )
+
     def remapByOTL(self) -> None:
         self.success = True
-        self.initSubs()
+        self.computeSubstitutions()
         if not self.success:
             return
 
-        self.filterFeatureIndex()
+        with self._stage("remapCmaps"):
+            self.remapCmaps()
         if not self.success:
             return
 
-        self.filterLookupList()
+        if self.options.names:
+            print(" ".join(self.names or []))
+
+    def _snapshotVariantTables(self) -> list:
+        # Everything that remapCmaps(), renameFont() and saveFont() change, so
+        # that every variant starts from the tables of the input font.
+        assert self.ttx is not None
+        snapshot: list = []
+        seen: set[int] = set()
+        for cmaptable in self.ttx["cmap"].tables:
+            if hasattr(cmaptable, "cmap") and id(cmaptable.cmap) not in seen:
+                seen.add(id(cmaptable.cmap))
+                snapshot.append((cmaptable.cmap, dict(cmaptable.cmap)))
+            # remapUvs() replaces the entry lists, so a shallow copy will do.
+            uvs_dict = getattr(cmaptable, "uvsDict", None)
+            if uvs_dict is not None and id(uvs_dict) not in seen:
+                seen.add(id(uvs_dict))
+                snapshot.append((uvs_dict, dict(uvs_dict)))
+        if "name" in self.ttx:
+            for record in self.ttx["name"].names:
+                snapshot.append((record, "string", record.string))
+        if "post" in self.ttx and self.ttx.isLoaded("post"):
+            post = self.ttx["post"]
+            snapshot.append((post, "formatType", post.formatType))
+        if "CFF " in self.ttx and self.ttx.isLoaded("CFF "):
+            cff_table = self.ttx["CFF "].cff
+            snapshot.append((cff_table.fontNames, list(cff_table.fontNames)))
+            snapshot.append((cff_table[0].rawDict, dict(cff_table[0].rawDict)))
+        return snapshot
+
+    @staticmethod
+    def _restoreVariantTables(snapshot: list) -> None:
+        for entry in snapshot:
+            if len(entry) == 3:
+                setattr(*entry)
+            elif isinstance(entry[0], list):
+                entry[0][:] = entry[1]
+            else:
+                entry[0].clear()
+                entry[0].update(entry[1])
+
+    def _resetFontState(self, options: Namespace, outpath: os.PathLike) -> None:
+        self.options = options
+        self.outpath = outpath
+        self.state = FreezeState()
+
+    def variantOptions(self, variants: Sequence[Mapping]) -> list[Namespace]:
+        return [Namespace(**{**vars(self.options), **variant}) for variant in variants]
+
+    def variantOutpath(self, variant: Mapping, options: Namespace) -> os.PathLike:
+        if variant.get("outpath"):
+            return variant["outpath"]
+        label = options.usesuffix or options.features.replace(",", "-")
+        # Collections keep their suffix, like the default output path.
+        suffix = outputSuffix(self.inpath, getattr(options, "flavor", None))
+        return f"{os.fspath(self.inpath)}.{label}.featfreeze{suffix}"
+
+    def prepareVariants(self, renaming: bool = True) -> list:
+        """Snapshot the tables of the open font that freezing a variant changes.
+
+        Pass the snapshot to ``freezeVariant()`` to freeze any number of
+        variants of the font without parsing it again.
+        """
+        assert self.ttx is not None
+        # Load the CFF table before taking the snapshot if any variant renames
+        # the font; otherwise it is never decompiled.
+        if renaming and "CFF " in self.ttx:
+            self.ttx["CFF "]
+        return self._snapshotVariantTables()
+
+    def freezeVariant(
+        self,
+        snapshot: list,
+        options: Namespace,
+        outpath: os.PathLike | BinaryIO,
+    ) -> bool:
+        # outpath can also be a binary file object, e.g. io.BytesIO.
+        self._restoreVariantTables(snapshot)
+        self._patchedTables.clear()
+        self._resetFontState(options, outpath)
+        self.remapByOTL()
+        if self.success:
+            with self._stage("renameFont"):
+                self.renameFont()
+        if self.success:
+            with self._stage("saveFont"):
+                self.saveFont()
+        return self.success
+
+    def runVariants(self, variants: Sequence[Mapping]) -> list[bool]:
+        """Freeze several variants of the font, parsing the input font only once.
+
+        Each variant is a mapping of option overrides (e.g. ``features``,
+        ``script``, ``lang``, ``usesuffix``, ``outpath``) on top of the options
+        passed to the constructor. Returns the success of each variant.
+        Collections are read again for every variant.
+        """
+        results: list[bool] = []
+        self._startStats()
+        if self.isCollection():
+            results = self._runCollectionVariants(variants)
+            self._finishStats()
+            return results
+        with self._stage("openFont"):
+            self.openFont()
         if not self.success:
+            logger.error("Failed to open font. Aborting.")
+            self._finishStats()
+            return [False] * len(variants)
+
+        base_options, base_outpath = self.options, self.outpath
+        variant_options = self.variantOptions(variants)
+        snapshot = self.prepareVariants(
+            any(options.suffix or options.replacenames for options in variant_options)
+        )
+
+        for n, (variant, options) in enumerate(zip(variants, variant_options), 1):
+            logger.info("[runVariants] Variant %d: %s", n, dict(variant))
+            if not self.freezeVariant(
+                snapshot, options, self.variantOutpath(variant, options)
+            ):
+                logger.error("Failed to freeze variant %d (%s).", n, self.outpath)
+            results.append(self.success)
+
+        self._restoreVariantTables(snapshot)
+        self._resetFontState(base_options, base_outpath)
+        with self._stage("closeFont"):
+            self.closeFont()
+        self.success = all(results)
+        self._finishStats()
+        return results
+
+    def _runCollectionVariants(self, variants: Sequence[Mapping]) -> list[bool]:
+        # Freezing a collection changes its shared tables in place, so every
+        # variant reads the collection again.
+        results: list[bool] = []
+        base_options, base_outpath = self.options, self.outpath
+        for n, (variant, options) in enumerate(
+            zip(variants, self.variantOptions(variants)), 1
+        ):
+            logger.info("[runVariants] Variant %d: %s", n, dict(variant))
+            self._resetFontState(options, self.variantOutpath(variant, options))
+            self.runCollection()
+            if not self.success:
+                logger.error("Failed to freeze variant %d (%s).", n, self.outpath)
+            results.append(self.success)
+        self._resetFontState(base_options, base_outpath)
+        self.success = all(results)
+        return results
+
+    def isCollection(self) -> bool:
+        return isCollectionFile(self.inpath)
+
+    def openCollection(self) -> None:
+        self.success = True
+        self._lookupMappingCache.clear()
+        self._layoutIndexCache.clear()
+        self._patchedTables.clear()
+        try:
+            # Tables with identical data are loaded once and shared between the
+            # members, which is what lets us process shared tables only once.
+            self.ttc = fontTools.ttLib.TTCollection(
+                self._inputFile(),
+                shareTables=True,
+                recalcBBoxes=False,
+                lazy=True if self.isLazy() else None,
+            )
+        except Exception as e:
+            logger.warning("[openCollection] TTX cannot open %s: %s", self.inpath, e)
+            self._closeInputFile()
+            self.success = False
+            self.ttc = None
             return
+        logger.info(
+            "[openCollection] Opened collection with %d fonts: %s",
+            len(self.ttc.fonts),
+            self.inpath,
+        )
+
+    def _collectionMembers(self) -> list[int]:
+        assert self.ttc is not None
+        members = getattr(self.options, "members", None)
+        if not members:
+            return list(range(len(self.ttc.fonts)))
+        indices = [int(member) for member in members.split(",") if member.strip()]
+        for index in indices:
+            if not 0 <= index < len(self.ttc.fonts):
+                raise RuntimeError(
+                    f"Collection member {index} does not exist, the collection has "
+                    f"{len(self.ttc.fonts)} fonts."
+                )
+        return indices
 
-        self.applySubstitutions()
+    def runCollection(self) -> None:
+        with self._stage("openCollection"):
+            self.openCollection()
         if not self.success:
+            logger.error("Failed to open font collection. Aborting.")
             return
+        assert self.ttc is not None
+        base_outpath = self.outpath
+        # Substitutions are computed once per distinct (shared) GSUB table, and
+        # shared cmap dicts and name tables are only changed once.
+        mappings: dict[int | None, tuple[list[str], FreezeState]] = {}
+        remapped_cmaps: set[int] = set()
+        renamed: set[int] = set()
+        glyph_orders: dict[int, list[str]] = {}
+        for index in self._collectionMembers():
+            self.ttx = self.ttc.fonts[index]
+            self._resetFontState(self.options, base_outpath)
+            logger.info("[runCollection] Processing font %d", index)
+            # fontTools hands out a table that is shared with an earlier member
+            # without registering it as loaded in this member, so it would be
+            # saved from the original bytes. Register the tables we change.
+            for tag in ("GSUB", "cmap", "name", "post", "CFF "):
+                if tag in self.ttx:
+                    self.ttx.tables[tag] = self.ttx[tag]
+
+            gsub_key = id(self.ttx["GSUB"]) if "GSUB" in self.ttx else None
+            glyph_order = self._memberGlyphOrder(glyph_orders)
+            shared = mappings.get(gsub_key)
+            if shared is not None and shared[0] == glyph_order:
+                logger.info("[runCollection] Reusing substitutions of shared GSUB")
+                self.state = shared[1]
+            else:
+                self.computeSubstitutions()
+                if not self.success:
+                    logger.error("Failed during OpenType Layout remapping. Aborting.")
+                    return
+                mappings[gsub_key] = (glyph_order, self.state)
+
+            with self._stage("remapCmaps"):
+                self.remapCmaps(remapped_cmaps)
+            if self.options.names:
+                print(" ".join(self.names or []))
 
-        self.remapCmaps()
+            if "name" in self.ttx and id(self.ttx["name"]) not in renamed:
+                renamed.add(id(self.ttx["name"]))
+                with self._stage("renameFont"):
+                    self.renameFont()
+                if not self.success:
+                    logger.error("Failed during font renaming. Aborting.")
+                    return
+
+            if self.options.zapnames:
+                self.ttx["post"].formatType = 3.0
+                self.modifiedTables.add("post")
+
+        with self._stage("saveCollection"):
+            self._saveCollection()
         if not self.success:
-            return
+            logger.error("Failed to save font collection.")
+        for font in self.ttc.fonts:
+            self._detachCallerFile(font)
+        self.ttc.close()
+        self._closeInputFile()
 
-        if self.options.names:
-            print(" ".join(self.names or []))
+    def _memberGlyphOrder(self, glyph_orders: dict[int, list[str]]) -> list[str]:
+        # A shared 'post' table can only hand out its glyph order once, so
+        # members sharing it get the glyph order of the first one.
+        assert self.ttx is not None
+        source = next((tag for tag in ("CFF ", "post") if tag in self.ttx), None)
+        if source is None:
+            return self.ttx.getGlyphOrder()
+        key = id(self.ttx[source])
+        if key in glyph_orders:
+            self.ttx.setGlyphOrder(glyph_orders[key])
+        glyph_orders[key] = self.ttx.getGlyphOrder()
+        return glyph_orders[key]
 
-    def run(self) -> None:
-        self.openFont()
+    def _saveCollection(self) -> None:
+        self.success = True
+        assert self.ttc is not None
+        released = []
+        if self.isLazy():
+            for font in self.ttc.fonts:
+                self.ttx = font
+                released.append((font, self._releaseUnmodifiedTables()))
+        try:
+            self._compileCmaps(self.ttc.fonts)
+            with self._patchedTablesLoaded(self.ttc.fonts):
+                self.ttc.save(self.outpath, shareTables=True)
+        except Exception as e:
+            logger.warning(f"[_saveCollection] TTX cannot save {self.outpath}: {e}")
+            self.success = False
+        for font, tables in released:
+            font.tables.update(tables)
+        if self.success:
+            logger.info(f"[_saveCollection] Saved font collection: {self.outpath}")
+
+    def run(self) -> FreezeStats:
+        self._startStats()
+        if self.options.report:
+            # Reporting only needs the layout table headers, not a built font.
+            with self._stage("reportFont"):
+                self.reportFont()
+            return self._finishStats()
+
+        if self.isCollection():
+            self.runCollection()
+            self.stats.outpath = displayPath(self.outpath)
+            return self._finishStats()
+
+        with self._stage("openFont"):
+            self.openFont()
         if not self.success:
             logger.error("Failed to open font. Aborting.")
-            return
+            return self._finishStats()
 
         self.remapByOTL()
         if not self.success:
             logger.error("Failed during OpenType Layout remapping. Aborting.")
-            return
+            return self._finishStats()
 
-        self.renameFont()
+        with self._stage("renameFont"):
+            self.renameFont()
         if not self.success:
             logger.error("Failed during font renaming. Aborting.")
-            return
+            return self._finishStats()
 
-        self.saveFont()
+        with self._stage("saveFont"):
+            self.saveFont()
         if not self.success:
             logger.error("Failed to save font.")
+        saved = self.success
+
+        with self._stage("closeFont"):
+            self.closeFont()
+        return self._finishStats(saved)
+
+
+# Re-exported from the api module, which is only imported when one of them is
+# first used.
+_API_NAMES = ("FreezeError", "FreezeOptions", "freeze_bytes", "freeze_into")
+
+
+def __getattr__(name: str) -> Any:
+    if name in _API_NAMES:
+        from opentype_feature_freezer import api
 
-        self.closeFont()
+        return getattr(api, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,198 @@
+from __future__ import annotations
+
+import asyncio
+import dataclasses
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Union
+
+from opentype_feature_freezer.api import FreezeError, FreezeOptions, freeze_bytes
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable
+    from concurrent.futures import Future
+
+    from opentype_feature_freezer.stats import FreezeStats
+
+logger = logging.getLogger(__name__)
+
+PathLike = Union[str, "os.PathLike[str]"]
+
+
+def _initWorker(verbose: bool) -> None:
+    logging.basicConfig(format="%(levelname)s: %(message)s")
+    if verbose:
+        logging.getLogger().setLevel(logging.INFO)
+
+
+def _freezeFile(
+    inpath: PathLike, outpath: PathLike | None, options: FreezeOptions
+) -> FreezeStats:
+    from opentype_feature_freezer import RemapByOTL
+
+    if outpath is not None:
+        Path(outpath).parent.mkdir(parents=True, exist_ok=True)
+    stats = RemapByOTL(options.toNamespace(inpath, outpath)).run()
+    if not stats.success:
+        raise FreezeError(
+            f"Cannot freeze {os.fspath(inpath)}, see the log for details."
+        )
+    return stats
+
+
+def _terminate(executor: ProcessPoolExecutor) -> None:
+    # A job that is already running can't be cancelled, only its process can
+    # be stopped. ProcessPoolExecutor has no public API for that before
+    # Python 3.14.
+    terminate = getattr(executor, "terminate_workers", None)
+    if terminate is not None:
+        terminate()
+        return
+    processes = list((getattr(executor, "_processes", None) or {}).values())
+    executor.shutdown(wait=False, cancel_futures=True)
+    for process in processes:
+        process.terminate()
+
+
+class AsyncFreezer:
+    """Freezes fonts from asyncio code on a pool of worker processes.
+
+    At most ``workers`` jobs run at a time; further jobs wait for a free
+    worker, so callers that submit faster than the pool freezes are slowed
+    down instead of queueing unbounded work. A job that times out or whose
+    task is cancelled stops its worker process, which is replaced, so one huge
+    font cannot block a worker forever. Fonts given by path are read and
+    written by the workers, not by the event loop.
+
+    Use it as an async context manager, or call ``close()`` when done::
+
+        async with AsyncFreezer(workers=4, timeout=60) as freezer:
+            frozen = await freezer.freezeBytes(data, features=["smcp"])
+    """
+
+    def __init__(
+        self,
+        workers: int | None = None,
+        timeout: float | None = None,
+        verbose: bool = False,
+    ):
+        self.workers = max(1, workers or os.cpu_count() or 1)
+        self.timeout = timeout
+        self.verbose = verbose
+        self._executors: list[ProcessPoolExecutor] = []
+        self._idle: asyncio.Queue[int] | None = None
+
+    def _makeExecutor(self) -> ProcessPoolExecutor:
+        return ProcessPoolExecutor(
+            max_workers=1, initializer=_initWorker, initargs=(self.verbose,)
+        )
+
+    def _replaceExecutor(self, index: int) -> None:
+        _terminate(self._executors[index])
+        self._executors[index] = self._makeExecutor()
+
+    async def _run(self, timeout: float | None, function: Any, *args: Any) -> Any:
+        if self._idle is None:
+            # Created here so that the queue belongs to the running loop.
+            self._idle = asyncio.Queue()
+            self._executors = [self._makeExecutor() for _ in range(self.workers)]
+            for index in range(self.workers):
+                self._idle.put_nowait(index)
+        idle = self._idle
+        index = await idle.get()
+        future: Future | None = None
+        try:
+            future = self._executors[index].submit(function, *args)
+            return await asyncio.wait_for(
+                asyncio.wrap_future(future),
+                self.timeout if timeout is None else timeout,
+            )
+        except (asyncio.TimeoutError, asyncio.CancelledError):
+            if future is not None and not future.done():
+                logger.info("[AsyncFreezer] Stopping worker %d", index)
+                self._replaceExecutor(index)
+            raise
+        except BrokenProcessPool:
+            self._replaceExecutor(index)
+            raise
+        finally:
+            idle.put_nowait(index)
+
+    @staticmethod
+    def _options(options: FreezeOptions | None, overrides: dict) -> FreezeOptions:
+        options = options or FreezeOptions()
+        return dataclasses.replace(options, **overrides) if overrides else options
+
+    async def freezeBytes(
+        self,
+        data: bytes | bytearray | memoryview,
+        options: FreezeOptions | None = None,
+        timeout: float | None = None,
+        **overrides: Any,
+    ) -> bytes:
+        """Return the font in ``data`` with its features frozen.
+
+        ``options`` and ``overrides`` are as for ``freeze_bytes()``. Raises
+        ``FreezeError`` on failure and ``asyncio.TimeoutError`` if the job
+        takes longer than ``timeout`` (default: the freezer's timeout).
+        """
+        if isinstance(data, memoryview):
+            data = data.tobytes()
+        return await self._run(
+            timeout, freeze_bytes, data, self._options(options, overrides)
+        )
+
+    async def freezeFile(
+        self,
+        inpath: PathLike,
+        outpath: PathLike | None = None,
+        options: FreezeOptions | None = None,
+        timeout: float | None = None,
+        **overrides: Any,
+    ) -> FreezeStats:
+        """Freeze the font file ``inpath`` into ``outpath`` and return the stats.
+
+        Without ``outpath``, the output is saved next to the input, as by
+        ``pyftfeatfreeze``.
+        """
+        return await self._run(
+            timeout, _freezeFile, inpath, outpath, self._options(options, overrides)
+        )
+
+    async def freezeFiles(
+        self,
+        paths: Iterable[tuple[PathLike, PathLike | None]],
+        options: FreezeOptions | None = None,
+        timeout: float | None = None,
+        **overrides: Any,
+    ) -> list[FreezeStats | BaseException]:
+        """Freeze several font files concurrently.
+
+        ``paths`` holds ``(inpath, outpath)`` pairs. Returns the stats of each
+        font, or the exception its job raised; a failing or timed out font
+        doesn't stop the others. ``timeout`` applies to each font.
+        """
+        options = self._options(options, overrides)
+        return await asyncio.gather(
+            *(
+                self.freezeFile(inpath, outpath, options, timeout)
+                for inpath, outpath in paths
+            ),
+            return_exceptions=True,
+        )
+
+    async def close(self) -> None:
+        executors, self._executors = self._executors, []
+        self._idle = None
+        loop = asyncio.get_running_loop()
+        for executor in executors:
+            await loop.run_in_executor(None, executor.shutdown)
+
+    async def __aenter__(self) -> AsyncFreezer:
+        return self
+
+    async def __aexit__(self, *exc_info: object) -> None:
+        await self.close()
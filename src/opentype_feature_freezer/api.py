@@ -0,0 +1,156 @@
+from __future__ import annotations
+
+import io
+from argparse import Namespace
+from dataclasses import asdict, dataclass, replace
+from functools import lru_cache
+from typing import TYPE_CHECKING, Any, BinaryIO, Union
+
+from opentype_feature_freezer.mapped import MemoryReader
+
+if TYPE_CHECKING:
+    import os
+    from collections.abc import Mapping, Sequence
+
+    from opentype_feature_freezer.stats import FreezeStats
+
+FontData = Union[bytes, bytearray, memoryview, BinaryIO]
+
+
+class FreezeError(Exception):
+    """Raised by ``freeze_bytes()`` and ``freeze_into()`` when freezing fails."""
+
+    def __init__(self, message: str, stats: FreezeStats | None = None):
+        super().__init__(message)
+        self.stats = stats
+
+
+@dataclass
+class FreezeOptions:
+    """The options of ``pyftfeatfreeze``, for use from Python.
+
+    The fields correspond to the command-line options of the same names;
+    ``features`` is a sequence of feature tags rather than a comma-separated
+    string, and ``location`` can also be a mapping of axis tags to user
+    coordinates, e.g. ``{"wght": 700}``. ``lazy`` is on by default, so that
+    tables the freezing doesn't change are copied from the input without being
+    parsed or copied first.
+    """
+
+    features: Sequence[str] = ()
+    script: str | None = None
+    lang: str | None = None
+    alternate: int = 0
+    location: str | Mapping[str, float] | None = None
+    instance: bool = False
+    zapnames: bool = False
+    members: str | None = None
+    flavor: str | None = None
+    lazy: bool = True
+    cmap_engine: str = "python"
+    cache: str | None = None
+    cache_size: int = 256
+    suffix: bool = False
+    usesuffix: str = ""
+    replacenames: str = ""
+    info: bool = False
+    names: bool = False
+
+    def __post_init__(self) -> None:
+        if isinstance(self.features, str):
+            self.features = tuple(
+                tag.strip() for tag in self.features.split(",") if tag.strip()
+            )
+        if self.location is not None and not isinstance(self.location, str):
+            self.location = ",".join(
+                f"{tag}={value}" for tag, value in self.location.items()
+            )
+        if self.usesuffix:
+            self.suffix = True
+
+    def toNamespace(
+        self,
+        inpath: str | os.PathLike | BinaryIO,
+        outpath: str | os.PathLike | BinaryIO | None = None,
+    ) -> Namespace:
+        """Return the options as the ``Namespace`` that ``RemapByOTL`` takes."""
+        values = asdict(self)
+        values["features"] = ",".join(self.features)
+        return Namespace(
+            **{**_defaultOptions(), **values, "inpath": inpath, "outpath": outpath}
+        )
+
+
+@lru_cache(maxsize=None)
+def _defaultOptions() -> dict[str, Any]:
+    from opentype_feature_freezer.cli import parseOptions
+
+    return vars(parseOptions(["-"]))
+
+
+class _CountingWriter:
+    # fontTools writes the whole font with a single write() call.
+    def __init__(self, out: BinaryIO | bytearray):
+        self.out = out
+        self.written = 0
+
+    def write(self, data: bytes) -> int:
+        if isinstance(self.out, bytearray):
+            self.out += data
+        else:
+            self.out.write(data)
+        self.written += len(data)
+        return len(data)
+
+
+def _inputFile(data: FontData) -> BinaryIO:
+    if hasattr(data, "read"):
+        return data  # type: ignore[return-value]
+    if isinstance(data, bytes):
+        # BytesIO shares the memory of a bytes object until it is written to.
+        return io.BytesIO(data)
+    if isinstance(data, (bytearray, memoryview)):
+        return MemoryReader(data)  # type: ignore[return-value]
+    raise TypeError(f"Cannot read a font from {type(data).__name__}")
+
+
+def _options(options: FreezeOptions | None, overrides: dict[str, Any]) -> FreezeOptions:
+    options = options or FreezeOptions()
+    return replace(options, **overrides) if overrides else options
+
+
+def freeze_into(
+    data: FontData,
+    out: BinaryIO | bytearray,
+    options: FreezeOptions | None = None,
+    **overrides: Any,
+) -> int:
+    """Freeze features of the font in ``data`` and write the result to ``out``.
+
+    ``data`` is the font as ``bytes``, ``bytearray``, ``memoryview`` or a
+    seekable binary file object; ``out`` is a writable binary file object or a
+    ``bytearray`` to append to. Keyword arguments override fields of
+    ``options``, e.g. ``freeze_into(data, out, features=["smcp"])``. Returns
+    the number of bytes written, and raises ``FreezeError`` on failure.
+    """
+    from opentype_feature_freezer import RemapByOTL
+
+    options = _options(options, overrides)
+    outfile = _CountingWriter(out)
+    remapper = RemapByOTL(options.toNamespace(_inputFile(data), outfile))
+    stats = remapper.run()
+    if not stats.success:
+        raise FreezeError("Cannot freeze the font, see the log for details.", stats)
+    return outfile.written
+
+
+def freeze_bytes(
+    data: FontData, options: FreezeOptions | None = None, **overrides: Any
+) -> bytes:
+    """Return the font in ``data`` with its features frozen, see ``freeze_into()``.
+
+    For example, ``freeze_bytes(data, features=["smcp", "c2sc"], usesuffix="SC")``.
+    """
+    out = io.BytesIO()
+    freeze_into(data, out, options, **overrides)
+    return out.getvalue()
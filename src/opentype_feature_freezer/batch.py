@@ -0,0 +1,324 @@
+from __future__ import annotations
+
+import glob
+import logging
+import os
+import sys
+from argparse import ArgumentParser, Namespace
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+from typing import TYPE_CHECKING, NamedTuple
+
+import opentype_feature_freezer
+from opentype_feature_freezer.cli import addProcessingArguments
+from opentype_feature_freezer.incremental import FreezeManifests
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable, Sequence
+    from typing import Any, TextIO
+
+    from opentype_feature_freezer.stats import FreezeStats
+
+DEFAULT_TEMPLATE = "{name}.featfreeze{flavorsuffix}"
+
+
+class BatchResult(NamedTuple):
+    inpath: str
+    outpath: str
+    success: bool
+    error: str
+    stats: FreezeStats | None = None
+    skipped: bool = False
+    note: str = ""
+
+
+def parseBatchOptions(args: Sequence[str] | None = None) -> Namespace:
+    parser = ArgumentParser(
+        description=(
+            "With %(prog)s you can freeze OpenType features into many fonts in one "
+            "run. The fonts are processed in parallel by a pool of worker "
+            "processes, and a failing font does not stop the others."
+        ),
+        epilog=(
+            "Examples: "
+            "%(prog)s -f 'c2sc,smcp' -S -U SC -j 8 -o out/ fonts/*.ttf "
+            "%(prog)s -f onum -g 'src/**/*.otf' -t '{stem}-OSF{suffix}' -o out/"
+        ),
+    )
+
+    parser.add_argument("inpaths", nargs="*", help="input .otf or .ttf font files")
+
+    group_batch = parser.add_argument_group("options to control batch processing")
+    group_batch.add_argument(
+        "-g",
+        "--glob",
+        action="append",
+        dest="globs",
+        default=[],
+        help="glob pattern of input fonts, '**' matches subfolders (repeatable)",
+    )
+    group_batch.add_argument(
+        "-m",
+        "--manifest",
+        action="append",
+        dest="manifests",
+        default=[],
+        help=(
+            "text file with one input font per line, optionally followed by a tab "
+            "and an explicit output path (repeatable)"
+        ),
+    )
+    group_batch.add_argument(
+        "-o",
+        "--outdir",
+        action="store",
+        dest="outdir",
+        default=None,
+        help="folder for the output fonts (default: next to each input font)",
+    )
+    group_batch.add_argument(
+        "-t",
+        "--template",
+        action="store",
+        dest="template",
+        default=DEFAULT_TEMPLATE,
+        help=(
+            "output file name template; can use {name}, {stem}, {suffix}, "
+            "{features} and {flavorsuffix} (.otf, .woff or .woff2, following "
+            "--flavor; the input's suffix for .ttc/.otc collections) "
+            "(default: '%(default)s')"
+        ),
+    )
+    group_batch.add_argument(
+        "-j",
+        "--jobs",
+        action="store",
+        dest="jobs",
+        type=int,
+        default=os.cpu_count() or 1,
+        help="number of worker processes (default: %(default)s)",
+    )
+    addProcessingArguments(parser)
+
+    return parser.parse_args(args)
+
+
+def readManifest(manifest: str | os.PathLike) -> list[tuple[str, str | None]]:
+    base = Path(manifest).parent
+    entries: list[tuple[str, str | None]] = []
+    with Path(manifest).open(encoding="utf-8") as f:
+        for line in f:
+            line = line.rstrip("\r\n")
+            if not line.strip() or line.lstrip().startswith("#"):
+                continue
+            inpath, _, outpath = line.partition("\t")
+            entries.append(
+                (
+                    os.fspath(base / inpath.strip()),
+                    os.fspath(base / outpath.strip()) if outpath.strip() else None,
+                )
+            )
+    return entries
+
+
+def collectInputs(options: Namespace) -> list[tuple[str, str | None]]:
+    entries: list[tuple[str, str | None]] = [(p, None) for p in options.inpaths]
+    for pattern in options.globs:
+        matches = sorted(glob.glob(pattern, recursive=True))  # noqa: PTH207
+        entries.extend((p, None) for p in matches)
+    for manifest in options.manifests:
+        entries.extend(readManifest(manifest))
+
+    seen: set[str] = set()
+    unique: list[tuple[str, str | None]] = []
+    for inpath, outpath in entries:
+        if inpath in seen:
+            continue
+        seen.add(inpath)
+        unique.append((inpath, outpath))
+    return unique
+
+
+def makeOutpath(inpath: str, options: Namespace) -> str:
+    path = Path(inpath)
+    name = options.template.format(
+        name=path.name,
+        stem=path.stem,
+        suffix=path.suffix,
+        features=options.features.replace(",", "-"),
+        flavorsuffix=opentype_feature_freezer.outputSuffix(inpath, options.flavor),
+    )
+    outdir = Path(options.outdir) if options.outdir else path.parent
+    return os.fspath(outdir / name)
+
+
+def makeJobs(options: Namespace) -> list[Namespace]:
+    jobs = []
+    for inpath, outpath in collectInputs(options):
+        job = Namespace(**vars(options))
+        job.inpath = inpath
+        job.outpath = outpath or makeOutpath(inpath, options)
+        jobs.append(job)
+    return jobs
+
+
+def findOutputCollisions(jobs: Sequence[Namespace]) -> dict[str, list[str]]:
+    """Return the inputs of every output path that several jobs would write.
+
+    E.g. inputs with the same file name in different folders get the same
+    default output name in one ``--outdir``.
+    """
+    inputs: dict[str, list[str]] = {}
+    for job in jobs:
+        outpath = os.path.normcase(Path(job.outpath).resolve())
+        inputs.setdefault(outpath, []).append(os.fspath(job.inpath))
+    return {outpath: paths for outpath, paths in inputs.items() if len(paths) > 1}
+
+
+def freezeOne(options: Namespace) -> BatchResult:
+    inpath, outpath = os.fspath(options.inpath), os.fspath(options.outpath)
+    if not Path(inpath).exists():
+        return BatchResult(inpath, outpath, False, "Input file does not exist.")
+    try:
+        Path(outpath).parent.mkdir(parents=True, exist_ok=True)
+        p = opentype_feature_freezer.RemapByOTL(options)
+        stats = p.run()
+    except Exception as e:
+        return BatchResult(inpath, outpath, False, f"{type(e).__name__}: {e}")
+    if not stats.success:
+        return BatchResult(inpath, outpath, False, "Errors during processing.", stats)
+    return BatchResult(inpath, outpath, True, "", stats)
+
+
+def _initWorker(verbose: bool) -> None:
+    logging.basicConfig(format="%(levelname)s: %(message)s")
+    if verbose:
+        logging.getLogger().setLevel(logging.INFO)
+
+
+def runBatch(jobs: Iterable[Namespace], workers: int = 1) -> list[BatchResult]:
+    jobs = list(jobs)
+    if workers <= 1 or len(jobs) <= 1:
+        return [freezeOne(job) for job in jobs]
+
+    results: dict[int, BatchResult] = {}
+    verbose = any(job.verbose for job in jobs)
+    with ProcessPoolExecutor(
+        max_workers=min(workers, len(jobs)),
+        initializer=_initWorker,
+        initargs=(verbose,),
+    ) as executor:
+        futures = {executor.submit(freezeOne, job): i for i, job in enumerate(jobs)}
+        for future in as_completed(futures):
+            i = futures[future]
+            try:
+                results[i] = future.result()
+            except Exception as e:
+                # The worker process itself died (e.g. it ran out of memory).
+                job = jobs[i]
+                results[i] = BatchResult(
+                    os.fspath(job.inpath),
+                    os.fspath(job.outpath),
+                    False,
+                    f"{type(e).__name__}: {e}",
+                )
+    return [results[i] for i in range(len(jobs))]
+
+
+def printSummary(results: Sequence[BatchResult], file: TextIO | None = None) -> None:
+    for result in results:
+        note = f" ({result.note})" if result.note else ""
+        if result.skipped:
+            print(f"SKIPPED {result.inpath} -> {result.outpath}{note}", file=file)
+        elif result.success:
+            print(f"OK      {result.inpath} -> {result.outpath}{note}", file=file)
+        else:
+            print(f"FAILED  {result.inpath}: {result.error}", file=file)
+    failed = sum(1 for result in results if not result.success)
+    skipped = sum(1 for result in results if result.skipped)
+    summary = f"# {len(results) - failed - skipped} succeeded, {failed} failed"
+    if skipped:
+        summary += f", {skipped} up to date"
+    print(summary, file=file)
+
+
+def runIncremental(
+    jobs: Sequence[Namespace], workers: int, manifests: FreezeManifests
+) -> list[BatchResult]:
+    # The manifests are only read and written here in the main process, so
+    # that the workers never race on them.
+    results: dict[int, BatchResult] = {}
+    stale: list[int] = []
+    reasons: dict[int, str] = {}
+    for i, job in enumerate(jobs):
+        inpath, outpath = os.fspath(job.inpath), os.fspath(job.outpath)
+        up_to_date, reasons[i] = manifests.check(inpath, outpath, job)
+        if up_to_date:
+            results[i] = BatchResult(
+                inpath, outpath, True, "", skipped=True, note=reasons[i]
+            )
+        else:
+            stale.append(i)
+
+    # Hash the inputs before they are frozen: if one changes in the meantime,
+    # its outputs are recorded as built from the old content.
+    fingerprints: dict[int, dict[str, Any] | None] = {}
+    for i in stale:
+        try:
+            fingerprints[i] = manifests.fingerprint(jobs[i].inpath, jobs[i].outpath)
+        except OSError:
+            fingerprints[i] = None
+
+    for i, result in zip(stale, runBatch([jobs[i] for i in stale], workers)):
+        results[i] = result._replace(note=reasons[i])
+        manifests.record(
+            result.inpath, result.outpath, jobs[i], fingerprints[i], result.success
+        )
+    manifests.save()
+    return [results[i] for i in range(len(jobs))]
+
+
+def main(args: list[str] | None = None) -> int:
+    logging.basicConfig(format="%(levelname)s: %(message)s")
+    options = parseBatchOptions(args)
+    if options.verbose:
+        logging.getLogger().setLevel(logging.INFO)
+
+    jobs = makeJobs(options)
+    if not jobs:
+        logging.error("No input fonts given.")
+        return 1
+    collisions = findOutputCollisions(jobs)
+    if collisions:
+        # Later fonts would silently overwrite earlier ones.
+        for outpath, inpaths in collisions.items():
+            logging.error(
+                "Several input fonts would be saved as %s: %s",
+                outpath,
+                ", ".join(inpaths),
+            )
+        logging.error(
+            "Give the fonts different output names, e.g. with -t/--template or "
+            "with output paths in a -m/--manifest file."
+        )
+        return 1
+    if options.incremental and not options.report:
+        results = runIncremental(
+            jobs, options.jobs, FreezeManifests(force=options.force)
+        )
+    else:
+        results = runBatch(jobs, options.jobs)
+    # With --report, stdout carries the reports (e.g. NDJSON), so the summary
+    # goes to stderr.
+    printSummary(results, sys.stderr if options.report else None)
+    if options.stats:
+        for result in results:
+            if result.stats is not None:
+                sys.stderr.write(result.stats.format(options.stats) + "\n")
+    if all(result.success for result in results):
+        return 0
+    return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,115 @@
+from __future__ import annotations
+
+import contextlib
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import zlib
+from pathlib import Path
+from typing import Any
+
+logger = logging.getLogger(__name__)
+
+PLAN_SUFFIX = ".plan"
+PLAN_FORMAT = 6
+DEFAULT_MAX_SIZE = 256 * 2**20
+
+_caches: dict[tuple[str, int], PlanCache] = {}
+
+
+class PlanCache:
+    """Size-bounded on-disk LRU cache of substitution plans.
+
+    A plan holds everything that ``RemapByOTL`` derives from the GSUB and cmap
+    tables for a given set of options: the feature and lookup indices, the
+    glyph ID pairs that change and the glyphs to list for ``--names``.
+    Entries are stored as zlib-compressed JSON, one file per key; the file
+    modification time is bumped on every hit and the least recently used
+    files are deleted once the directory grows beyond ``maxSize`` bytes.
+    """
+
+    def __init__(self, directory: str | os.PathLike, maxSize: int = DEFAULT_MAX_SIZE):
+        self.directory = Path(directory)
+        self.maxSize = maxSize
+        self.hits = 0
+        self.misses = 0
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+    @classmethod
+    def forDirectory(
+        cls, directory: str | os.PathLike, maxSize: int = DEFAULT_MAX_SIZE
+    ) -> PlanCache:
+        # Share one instance per directory within a process, so that the hit
+        # and miss counts add up over all fonts of a batch worker.
+        key = (os.fspath(Path(directory).resolve()), maxSize)
+        if key not in _caches:
+            _caches[key] = cls(directory, maxSize)
+        return _caches[key]
+
+    @staticmethod
+    def makeKey(tables: dict[str, bytes], options: dict[str, Any]) -> str:
+        from opentype_feature_freezer import __version__
+
+        h = hashlib.sha256()
+        h.update(f"{PLAN_FORMAT}:{__version__}".encode())
+        for tag in sorted(tables):
+            data = tables[tag]
+            h.update(tag.encode("latin-1") + len(data).to_bytes(8, "big"))
+            h.update(data)
+        h.update(json.dumps(options, sort_keys=True).encode())
+        return h.hexdigest()
+
+    def _path(self, key: str) -> Path:
+        return self.directory / (key + PLAN_SUFFIX)
+
+    def get(self, key: str) -> dict[str, Any] | None:
+        path = self._path(key)
+        try:
+            plan = json.loads(zlib.decompress(path.read_bytes()))
+        except (OSError, ValueError, zlib.error):
+            self.misses += 1
+            logger.info("[PlanCache] Miss: %s", key)
+            return None
+        with contextlib.suppress(OSError):
+            os.utime(path)
+        self.hits += 1
+        logger.info("[PlanCache] Hit: %s", key)
+        return plan
+
+    def put(self, key: str, plan: dict[str, Any]) -> None:
+        if self.maxSize <= 0:
+            # A cache without room only serves the plans already in it.
+            return
+        data = zlib.compress(json.dumps(plan, separators=(",", ":")).encode(), 9)
+        # Write to a temporary file first, so that concurrent workers never see
+        # a partially written plan.
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            Path(tmp).replace(self._path(key))
+        except OSError as e:
+            logger.warning("[PlanCache] Cannot write %s: %s", self._path(key), e)
+            Path(tmp).unlink(missing_ok=True)
+            return
+        self.evict()
+
+    def evict(self) -> None:
+        entries = []
+        total = 0
+        for path in self.directory.glob("*" + PLAN_SUFFIX):
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+            total += stat.st_size
+        entries.sort()
+        for _, size, path in entries:
+            if total <= self.maxSize:
+                break
+            path.unlink(missing_ok=True)
+            total -= size
+            logger.info("[PlanCache] Evicted: %s", path.name)
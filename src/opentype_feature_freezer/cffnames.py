@@ -0,0 +1,240 @@
+from __future__ import annotations
+
+import struct
+from typing import Optional, Tuple
+
+# Strings with SIDs below this are the CFF standard strings.
+STANDARD_STRING_COUNT = 391
+
+FULL_NAME = b"\x02"
+FAMILY_NAME = b"\x03"
+PRIVATE = b"\x12"
+# Top DICT operators whose (last) operand is an offset from the start of the
+# CFF table, and the values below which it's a predefined charset/encoding.
+OFFSET_OPERATORS = {
+    b"\x0f": 3,  # charset
+    b"\x10": 2,  # Encoding
+    b"\x11": 0,  # CharStrings
+    PRIVATE: 0,
+    b"\x0c\x24": 0,  # FDArray
+    b"\x0c\x25": 0,  # FDSelect
+}
+
+# An operand: its value (None for reals) and its encoded bytes.
+Operand = Tuple[Optional[int], bytes]
+
+
+class CFFPatchError(ValueError):
+    pass
+
+
+def _readIndex(data: bytes, pos: int) -> tuple[list[tuple[int, int]], int]:
+    # Returns the (start, end) of every item, and the end of the INDEX.
+    (count,) = struct.unpack_from(">H", data, pos)
+    if count == 0:
+        return [], pos + 2
+    offSize = data[pos + 2]
+    if not 1 <= offSize <= 4:
+        raise CFFPatchError(f"invalid INDEX offset size {offSize}")
+    offsets = []
+    for i in range(count + 1):
+        start = pos + 3 + i * offSize
+        offsets.append(int.from_bytes(data[start : start + offSize], "big"))
+    base = pos + 2 + (count + 1) * offSize
+    items = [(base + a, base + b) for a, b in zip(offsets, offsets[1:])]
+    end = base + offsets[-1]
+    if end > len(data):
+        raise CFFPatchError("INDEX extends beyond the table")
+    return items, end
+
+
+def _buildIndex(items: list[bytes]) -> bytes:
+    if not items:
+        return b"\0\0"
+    offsets = [1]
+    for item in items:
+        offsets.append(offsets[-1] + len(item))
+    offSize = max(1, (offsets[-1].bit_length() + 7) // 8)
+    return b"".join(
+        [
+            struct.pack(">HB", len(items), offSize),
+            *(offset.to_bytes(offSize, "big") for offset in offsets),
+            *items,
+        ]
+    )
+
+
+def _parseDict(data: bytes) -> list[tuple[bytes, list[Operand], int]]:
+    # Returns (operator, operands, offset of the first operand) for each entry.
+    entries = []
+    operands: list[Operand] = []
+    start = pos = 0
+    while pos < len(data):
+        b0 = data[pos]
+        if b0 <= 21:
+            size = 2 if b0 == 12 else 1
+            entries.append((data[pos : pos + size], operands, start))
+            pos += size
+            operands = []
+            start = pos
+            continue
+        if 32 <= b0 <= 246:
+            size, value = 1, b0 - 139
+        elif 247 <= b0 <= 250:
+            size, value = 2, (b0 - 247) * 256 + data[pos + 1] + 108
+        elif 251 <= b0 <= 254:
+            size, value = 2, -(b0 - 251) * 256 - data[pos + 1] - 108
+        elif b0 == 28:
+            size, value = 3, struct.unpack_from(">h", data, pos + 1)[0]
+        elif b0 == 29:
+            size, value = 5, struct.unpack_from(">l", data, pos + 1)[0]
+        elif b0 == 30:
+            size = 1
+            while pos + size < len(data):
+                nibbles = data[pos + size]
+                size += 1
+                if nibbles & 0x0F == 0x0F or nibbles >> 4 == 0x0F:
+                    break
+            value = None
+        else:
+            raise CFFPatchError(f"invalid DICT byte {b0}")
+        operands.append((value, data[pos : pos + size]))
+        pos += size
+    if operands:
+        raise CFFPatchError("DICT ends with operands")
+    return entries
+
+
+def _encodeInt(value: int, size: int | None = None) -> bytes | None:
+    # The shortest encoding of value, or its encoding in size bytes; None if
+    # it doesn't fit.
+    if size in (None, 1) and -107 <= value <= 107:
+        return bytes([value + 139])
+    if size in (None, 2) and 108 <= value <= 1131:
+        value -= 108
+        return bytes([(value >> 8) + 247, value & 0xFF])
+    if size in (None, 2) and -1131 <= value <= -108:
+        value = -value - 108
+        return bytes([(value >> 8) + 251, value & 0xFF])
+    if size in (None, 3) and -32768 <= value <= 32767:
+        return b"\x1c" + struct.pack(">h", value)
+    if size in (None, 5) and -(2**31) <= value < 2**31:
+        return b"\x1d" + struct.pack(">l", value)
+    return None
+
+
+def _buildTopDict(
+    entries: list[tuple[bytes, list[Operand], int]],
+    sids: dict[bytes, int],
+    shift: int,
+) -> bytes:
+    out = []
+    for operator, operands, _ in entries:
+        if operator in sids:
+            continue
+        encoded = [raw for _, raw in operands]
+        if operator in OFFSET_OPERATORS and operands:
+            value = operands[-1][0]
+            if value is None:
+                raise CFFPatchError("offset is not an integer")
+            if value >= OFFSET_OPERATORS[operator]:
+                # Always 5 bytes, so that the size of the DICT doesn't depend
+                # on the offsets.
+                encoded[-1] = b"\x1d" + struct.pack(">l", value + shift)
+        out.append(b"".join(encoded) + operator)
+    for operator, sid in sids.items():
+        out.append(_encodeInt(sid) + operator)  # type: ignore[operator]
+    return b"".join(out)
+
+
+def renameCFF(data: bytes, fontName: str, familyName: str, fullName: str) -> bytes:
+    """Return a CFF table with new font, family and full names.
+
+    Only the header, the Name INDEX, the Top DICT INDEX and the String INDEX
+    are parsed and rebuilt; the new strings are appended to the String
+    INDEX. Everything after the Global Subr INDEX (charset, CharStrings,
+    Private DICTs, FDArray, ...) is copied unchanged, with the offsets that
+    point into it moved in the Top DICT and, for CID-keyed fonts, in the
+    FDArray font DICTs. Raises ``CFFPatchError`` for data that can't be
+    patched this way, e.g. CFF tables with more than one font.
+    """
+    data = bytes(data)
+    if len(data) < 4 or data[0] != 1:
+        raise CFFPatchError("not a CFF table of version 1")
+    hdrSize = data[2]
+    names, pos = _readIndex(data, hdrSize)
+    if len(names) != 1:
+        raise CFFPatchError(f"{len(names)} fonts in the CFF table")
+    topDicts, pos = _readIndex(data, pos)
+    if len(topDicts) != 1:
+        raise CFFPatchError(f"{len(topDicts)} Top DICTs in the CFF table")
+    strings, pos = _readIndex(data, pos)
+    _, tailStart = _readIndex(data, pos)
+    globalSubrs = data[pos:tailStart]
+
+    entries = _parseDict(data[topDicts[0][0] : topDicts[0][1]])
+    for operator, operands, _ in entries:
+        if operator in OFFSET_OPERATORS and operands:
+            value = operands[-1][0]
+            if value is not None and OFFSET_OPERATORS[operator] <= value < tailStart:
+                raise CFFPatchError("Top DICT points before the Global Subr INDEX")
+
+    stringItems = [data[start:end] for start, end in strings]
+    sids = {
+        FAMILY_NAME: STANDARD_STRING_COUNT + len(stringItems),
+        FULL_NAME: STANDARD_STRING_COUNT + len(stringItems) + 1,
+    }
+    stringItems += [familyName.encode("utf-8"), fullName.encode("utf-8")]
+    nameIndex = _buildIndex([fontName.encode("utf-8")])
+    stringIndex = _buildIndex(stringItems)
+
+    topDictSize = len(_buildTopDict(entries, sids, 0))
+    topDictIndexSize = len(_buildIndex([b"\0" * topDictSize]))
+    newTailStart = (
+        hdrSize
+        + len(nameIndex)
+        + topDictIndexSize
+        + len(stringIndex)
+        + len(globalSubrs)
+    )
+    shift = newTailStart - tailStart
+    topDictIndex = _buildIndex([_buildTopDict(entries, sids, shift)])
+
+    tail = bytearray(data[tailStart:])
+    fdArray = next(
+        (operands for operator, operands, _ in entries if operator == b"\x0c\x24"),
+        None,
+    )
+    if fdArray and shift:
+        _moveFDArrayPrivates(data, tail, fdArray[-1][0], tailStart, shift)
+
+    return b"".join(
+        [
+            data[:hdrSize],
+            nameIndex,
+            topDictIndex,
+            stringIndex,
+            globalSubrs,
+            bytes(tail),
+        ]
+    )
+
+
+def _moveFDArrayPrivates(
+    data: bytes, tail: bytearray, offset: int | None, tailStart: int, shift: int
+) -> None:
+    # Patches the Private offsets of the FDArray font DICTs in place, in the
+    # same number of bytes, so that nothing else in the tail moves.
+    if offset is None:
+        raise CFFPatchError("FDArray offset is not an integer")
+    fontDicts, _ = _readIndex(data, offset)
+    for start, end in fontDicts:
+        for operator, operands, operandStart in _parseDict(data[start:end]):
+            if operator != PRIVATE or len(operands) != 2:
+                continue
+            value, raw = operands[1]
+            encoded = None if value is None else _encodeInt(value + shift, len(raw))
+            if encoded is None:
+                raise CFFPatchError("cannot move an FDArray Private DICT offset")
+            pos = start + operandStart + len(operands[0][1]) - tailStart
+            tail[pos : pos + len(raw)] = encoded
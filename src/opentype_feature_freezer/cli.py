@@ -1,11 +1,13 @@
 import logging
 import sys
-from argparse import ArgumentParser, Namespace
+from argparse import ArgumentParser, ArgumentTypeError, Namespace
 from collections.abc import Callable, Sequence
 from pathlib import Path
 from typing import Optional
 
 import opentype_feature_freezer
+from opentype_feature_freezer.incremental import MANIFEST_NAME, FreezeManifests
+from opentype_feature_freezer.stats import STATS_FORMATS
 
 
 def parseOptions(args: Optional[Sequence[str]] = None) -> Namespace:
@@ -24,14 +26,89 @@ def parseOptions(args: Optional[Sequence[str]] = None) -> Namespace:
         ),
     )
 
-    parser.add_argument("inpath", help="input .otf or .ttf font file")
+    parser.add_argument(
+        "inpath", help="input .otf, .ttf, .woff, .woff2, .ttc or .otc font file"
+    )
     parser.add_argument(
         "outpath",
         nargs="?",
         default=None,
-        help="output .otf or .ttf font file (optional)",
+        help="output font file (optional)",
+    )
+    addProcessingArguments(parser)
+    # No short form: -m is --manifest in pyftfeatfreeze-batch.
+    parser.add_argument(
+        "--variant",
+        action="append",
+        dest="variants",
+        type=parseVariantSpec,
+        default=[],
+        metavar="SPEC",
+        help=(
+            "freeze a variant of the input font; can be repeated to produce many "
+            "variants from one parse of the font. SPEC is a ';'-separated list of "
+            "features=, script=, lang=, suffix=, alternate= and outpath= settings, "
+            "e.g. "
+            "'features=smcp,c2sc;suffix=SC;outpath=FontSC.otf'. Settings not "
+            "given are taken from the other options"
+        ),
     )
 
+    return parser.parse_args(args)
+
+
+VARIANT_KEYS = {
+    "features": "features",
+    "f": "features",
+    "script": "script",
+    "s": "script",
+    "lang": "lang",
+    "l": "lang",
+    "suffix": "usesuffix",
+    "outpath": "outpath",
+    "o": "outpath",
+    "replacenames": "replacenames",
+    "alternate": "alternate",
+    "location": "location",
+}
+
+
+def parseVariantSpec(spec: str) -> dict:
+    variant: dict = {}
+    for item in spec.split(";"):
+        if not item.strip():
+            continue
+        key, sep, value = item.partition("=")
+        key = key.strip()
+        if not sep or key not in VARIANT_KEYS:
+            raise ArgumentTypeError(
+                f"invalid variant setting '{item}', expected one of "
+                f"{', '.join(sorted(set(VARIANT_KEYS.values())))} followed by '='"
+            )
+        variant[VARIANT_KEYS[key]] = value
+    if "location" in variant:
+        locationSpec(variant["location"])
+    if "usesuffix" in variant:
+        variant["suffix"] = True
+    return variant
+
+
+def locationSpec(spec: str) -> str:
+    try:
+        opentype_feature_freezer.parseLocation(spec)
+    except ValueError as e:
+        raise ArgumentTypeError(f"invalid location '{spec}': {e}") from e
+    return spec
+
+
+def cacheSize(value: str) -> int:
+    size = int(value)
+    if size < 0:
+        raise ArgumentTypeError(f"invalid cache size {size}, must be 0 or more")
+    return size
+
+
+def addProcessingArguments(parser: ArgumentParser) -> None:
     group_freezing = parser.add_argument_group("options to control feature freezing")
     group_freezing.add_argument(
         "-f",
@@ -67,6 +144,134 @@ def parseOptions(args: Optional[Sequence[str]] = None) -> Namespace:
         dest="zapnames",
         help="zap glyphnames from the font ('post' table version 3, .ttf only)",
     )
+    group_freezing.add_argument(
+        "--members",
+        action="store",
+        dest="members",
+        default=None,
+        help=(
+            "comma-separated indices of the fonts to freeze in a .ttc/.otc "
+            "collection, e.g. '0,2' (default: all)"
+        ),
+    )
+    group_freezing.add_argument(
+        "--flavor",
+        action="store",
+        dest="flavor",
+        choices=("woff", "woff2", "sfnt"),
+        default=None,
+        help=(
+            "compression of the output font: 'woff', 'woff2' or 'sfnt' for "
+            "uncompressed OpenType (default: same as the input font)"
+        ),
+    )
+    group_freezing.add_argument(
+        "--lazy",
+        action="store_true",
+        dest="lazy",
+        help=(
+            "only decompile the tables needed for freezing and copy all other "
+            "tables unchanged (faster and leaner on large fonts)"
+        ),
+    )
+    group_freezing.add_argument(
+        "--mmap",
+        action="store_true",
+        dest="mmap",
+        help=(
+            "read the input font through mmap; implies --lazy. Processes freezing "
+            "the same large font or collection share the pages of its unmodified "
+            "tables"
+        ),
+    )
+    group_freezing.add_argument(
+        "--alternate",
+        action="store",
+        dest="alternate",
+        type=int,
+        default=0,
+        metavar="N",
+        help=(
+            "for alternate substitutions (e.g. 'salt', 'aalt'), use the alternate "
+            "glyph with index N: 0 is the first (default), -1 the last; glyphs "
+            "with fewer alternates get their last one"
+        ),
+    )
+    group_freezing.add_argument(
+        "--location",
+        action="store",
+        dest="location",
+        type=locationSpec,
+        default=None,
+        metavar="AXIS=VALUE,...",
+        help=(
+            "for variable fonts, freeze the lookups that the FeatureVariations "
+            "select at this location in user coordinates, e.g. 'wght=700,wdth=75' "
+            "(default: the default location)"
+        ),
+    )
+    group_freezing.add_argument(
+        "--instance",
+        action="store_true",
+        dest="instance",
+        help=(
+            "save a static instance of the variable font at --location (axes "
+            "not given are at their default) instead of the variable font"
+        ),
+    )
+    group_freezing.add_argument(
+        "--cmap-engine",
+        action="store",
+        dest="cmap_engine",
+        choices=("python", "numpy"),
+        default="python",
+        help=(
+            "remap the cmap subtables with dict lookups, or with glyph ID arrays "
+            "using NumPy (falls back to python if NumPy is not installed) "
+            "(default: %(default)s)"
+        ),
+    )
+    group_freezing.add_argument(
+        "--cache",
+        action="store",
+        dest="cache",
+        default=None,
+        metavar="DIR",
+        help=(
+            "cache the substitutions computed for a font and set of options in "
+            "this folder, and reuse them when freezing the same font again"
+        ),
+    )
+    group_freezing.add_argument(
+        "--cache-size",
+        action="store",
+        dest="cache_size",
+        type=cacheSize,
+        default=256,
+        metavar="MB",
+        help=(
+            "maximum size of the --cache folder in megabytes; with 0, plans are "
+            "only read, not stored (default: %(default)s)"
+        ),
+    )
+
+    group_incremental = parser.add_argument_group("options for incremental rebuilds")
+    group_incremental.add_argument(
+        "--incremental",
+        action="store_true",
+        dest="incremental",
+        help=(
+            "skip output fonts that are up to date: built by this version from "
+            "the same input content with the same options, as recorded in "
+            f"'{MANIFEST_NAME}' next to the output fonts"
+        ),
+    )
+    group_incremental.add_argument(
+        "--force",
+        action="store_true",
+        dest="force",
+        help="with --incremental, rebuild all output fonts and update the records",
+    )
 
     group_renaming = parser.add_argument_group("options to control font renaming")
     group_renaming.add_argument(
@@ -114,6 +319,32 @@ def parseOptions(args: Optional[Sequence[str]] = None) -> Namespace:
         dest="report",
         help="report languages, scripts and features in font",
     )
+    group_reporting.add_argument(
+        "--report-format",
+        action="store",
+        dest="report_format",
+        choices=("text", "json"),
+        default="text",
+        help="format of --report: text, or JSON with one line per font",
+    )
+    group_reporting.add_argument(
+        "--report-gpos",
+        action="store_true",
+        dest="report_gpos",
+        help="also report the scripts, languages and features of the 'GPOS' table",
+    )
+    group_reporting.add_argument(
+        "--stats",
+        action="store",
+        dest="stats",
+        choices=STATS_FORMATS,
+        default=None,
+        help=(
+            "print the time spent in each processing stage and counts of the "
+            "lookups, glyphs, cmap entries and names processed to stderr, as "
+            "text or as one JSON line per font"
+        ),
+    )
     group_reporting.add_argument(
         "-n",
         "--names",
@@ -135,8 +366,6 @@ def parseOptions(args: Optional[Sequence[str]] = None) -> Namespace:
         version=opentype_feature_freezer.__version__,
     )
 
-    return parser.parse_args(args)
-
 
 def main(
     args: list[str] | None = None,
@@ -159,11 +388,50 @@ def main(
     # RemapByOTL expects argparse.Namespace (updated in __init__.py).
     # A more robust solution might involve a Protocol.
     p = opentype_feature_freezer.RemapByOTL(args_parsed)
+    variants = getattr(args_parsed, "variants", None) or []
+    if variants:
+        targets = [
+            (p.variantOutpath(variant, options), options)
+            for variant, options in zip(variants, p.variantOptions(variants))
+        ]
+    else:
+        targets = [(p.outpath, args_parsed)]
+
+    manifests = None
+    if getattr(args_parsed, "incremental", False) and not args_parsed.report:
+        manifests = FreezeManifests(force=args_parsed.force)
+        stale = []
+        for i, (outpath, options) in enumerate(targets):
+            up_to_date, reason = manifests.check(args_parsed.inpath, outpath, options)
+            if up_to_date:
+                print(f"SKIPPED {outpath} ({reason})", file=sys.stderr)
+            else:
+                print(f"REBUILD {outpath} ({reason})", file=sys.stderr)
+                stale.append(i)
+        if not stale:
+            manifests.save()
+            return 0
+        targets = [targets[i] for i in stale]
+        variants = [variants[i] for i in stale] if variants else []
+        # Hash the input before it is frozen: if it changes in the meantime,
+        # the outputs are recorded as built from the old content.
+        fingerprints = [
+            manifests.fingerprint(args_parsed.inpath, outpath) for outpath, _ in targets
+        ]
+
     try:
-        p.run()
+        results = p.runVariants(variants) if variants else [p.run().success]
     except RuntimeError as e:
         logging.error(e)
         return 1
+    if manifests is not None:
+        for (outpath, options), fingerprint, success in zip(
+            targets, fingerprints, results
+        ):
+            manifests.record(args_parsed.inpath, outpath, options, fingerprint, success)
+        manifests.save()
+    if getattr(args_parsed, "stats", None):
+        sys.stderr.write(p.stats.format(args_parsed.stats) + "\n")
     if p.success:
         logging.info("Finished processing.")
         return 0
@@ -0,0 +1,240 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+import tempfile
+from pathlib import Path
+from typing import TYPE_CHECKING, Any
+
+if TYPE_CHECKING:
+    from argparse import Namespace
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_NAME = ".featfreeze-manifest.json"
+MANIFEST_FORMAT = 1
+
+# The options that change the bytes of the output font.
+OUTPUT_OPTIONS = (
+    "features",
+    "script",
+    "lang",
+    "alternate",
+    "location",
+    "instance",
+    "zapnames",
+    "members",
+    "lazy",
+    "suffix",
+    "usesuffix",
+    "replacenames",
+    "info",
+)
+
+
+def normalizeOptions(options: Namespace) -> dict[str, Any]:
+    from opentype_feature_freezer import outputFlavor
+
+    normalized = {name: getattr(options, name, None) for name in OUTPUT_OPTIONS}
+    # --mmap implies --lazy, which is what changes the output.
+    normalized["lazy"] = normalized["lazy"] or getattr(options, "mmap", False)
+    normalized["flavor"] = outputFlavor(
+        options.inpath, getattr(options, "flavor", None)
+    )
+    # Options that are off are equivalent whether they are None, "" or False.
+    return {name: value for name, value in normalized.items() if value}
+
+
+def hashFile(path: str | os.PathLike) -> str:
+    h = hashlib.sha256()
+    with Path(path).open("rb") as f:
+        for chunk in iter(lambda: f.read(2**20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+class FreezeManifest:
+    """Records from which input and options each output font was built.
+
+    The manifest is a JSON file in the output folder. An output is up to date
+    when it exists and was built by the same tool version, with the same
+    options, from an input with the same content. The input is only hashed
+    when its size or modification time differs from the recorded ones.
+    """
+
+    def __init__(self, directory: str | os.PathLike):
+        self.directory = Path(directory)
+        self.path = self.directory / MANIFEST_NAME
+        self.outputs: dict[str, dict[str, Any]] = self._read()
+        self.changed: dict[str, dict[str, Any] | None] = {}
+
+    def _read(self) -> dict[str, dict[str, Any]]:
+        try:
+            data = json.loads(self.path.read_text(encoding="utf-8"))
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as e:
+            logger.warning("[FreezeManifest] Ignoring unreadable %s: %s", self.path, e)
+            return {}
+        if data.get("format") != MANIFEST_FORMAT:
+            return {}
+        return data.get("outputs", {})
+
+    def _entry(self, inpath: str | os.PathLike, options: Namespace) -> dict[str, Any]:
+        from opentype_feature_freezer import __version__
+
+        return {
+            "input": os.fspath(Path(inpath).resolve()),
+            "version": __version__,
+            "options": normalizeOptions(options),
+        }
+
+    def check(
+        self, inpath: str | os.PathLike, outpath: str | os.PathLike, options: Namespace
+    ) -> tuple[bool, str]:
+        """Return whether ``outpath`` is up to date, and why it is not."""
+        name = Path(outpath).name
+        recorded = self.outputs.get(name)
+        if recorded is None:
+            return False, "new output"
+        if not Path(outpath).exists():
+            return False, "output missing"
+        expected = self._entry(inpath, options)
+        if recorded.get("version") != expected["version"]:
+            return False, "tool version changed"
+        if recorded.get("input") != expected["input"]:
+            return False, "input path changed"
+        if recorded.get("options") != expected["options"]:
+            return False, "options changed"
+        try:
+            stat = Path(inpath).stat()
+        except OSError:
+            return False, "input missing"
+        if recorded.get("size") == stat.st_size and (
+            recorded.get("mtime_ns") == stat.st_mtime_ns
+        ):
+            return True, "up to date"
+        if recorded.get("size") != stat.st_size or (
+            hashFile(inpath) != recorded.get("sha256")
+        ):
+            return False, "input changed"
+        # Same content with a new timestamp (e.g. a fresh checkout): remember
+        # the new timestamp so that the input isn't hashed again next time.
+        self.changed[name] = {**recorded, "mtime_ns": stat.st_mtime_ns}
+        self.outputs[name] = self.changed[name]
+        return True, "up to date"
+
+    def fingerprint(self, inpath: str | os.PathLike) -> dict[str, Any]:
+        """Return the size, modification time and hash of the input as it is now.
+
+        Take it before freezing, so that an input changed while it is frozen
+        is not recorded with the content of its new version.
+        """
+        path = os.fspath(Path(inpath).resolve())
+        stat = Path(inpath).stat()
+        fingerprint: dict[str, Any] = {
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+        }
+        # Reuse the hash of the same unchanged input, e.g. for variants.
+        fingerprint["sha256"] = next(
+            (
+                other["sha256"]
+                for other in self.outputs.values()
+                if other.get("input") == path
+                and other.get("size") == fingerprint["size"]
+                and other.get("mtime_ns") == fingerprint["mtime_ns"]
+                and other.get("sha256")
+            ),
+            None,
+        ) or hashFile(inpath)
+        return fingerprint
+
+    def record(
+        self,
+        inpath: str | os.PathLike,
+        outpath: str | os.PathLike,
+        options: Namespace,
+        fingerprint: dict[str, Any],
+    ) -> None:
+        name = Path(outpath).name
+        entry = self._entry(inpath, options)
+        entry.update(fingerprint)
+        self.outputs[name] = self.changed[name] = entry
+
+    def forget(self, outpath: str | os.PathLike) -> None:
+        name = Path(outpath).name
+        if name in self.outputs:
+            del self.outputs[name]
+            self.changed[name] = None
+
+    def save(self) -> None:
+        if not self.changed:
+            return
+        # Merge into the file as it is now, so that concurrent runs writing
+        # other outputs into the same folder don't drop each other's entries.
+        outputs = self._read()
+        for name, entry in self.changed.items():
+            if entry is None:
+                outputs.pop(name, None)
+            else:
+                outputs[name] = entry
+        data = json.dumps(
+            {"format": MANIFEST_FORMAT, "outputs": outputs}, indent=1, sort_keys=True
+        )
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                f.write(data + "\n")
+            Path(tmp).replace(self.path)
+        except OSError as e:
+            logger.warning("[FreezeManifest] Cannot write %s: %s", self.path, e)
+            Path(tmp).unlink(missing_ok=True)
+            return
+        self.outputs = outputs
+        self.changed = {}
+
+
+class FreezeManifests:
+    """The manifests of all output folders of a run."""
+
+    def __init__(self, force: bool = False):
+        self.force = force
+        self._manifests: dict[Path, FreezeManifest] = {}
+
+    def manifest(self, outpath: str | os.PathLike) -> FreezeManifest:
+        directory = Path(outpath).resolve().parent
+        if directory not in self._manifests:
+            self._manifests[directory] = FreezeManifest(directory)
+        return self._manifests[directory]
+
+    def check(
+        self, inpath: str | os.PathLike, outpath: str | os.PathLike, options: Namespace
+    ) -> tuple[bool, str]:
+        if self.force:
+            return False, "forced"
+        return self.manifest(outpath).check(inpath, outpath, options)
+
+    def fingerprint(
+        self, inpath: str | os.PathLike, outpath: str | os.PathLike
+    ) -> dict[str, Any]:
+        return self.manifest(outpath).fingerprint(inpath)
+
+    def record(
+        self,
+        inpath: str | os.PathLike,
+        outpath: str | os.PathLike,
+        options: Namespace,
+        fingerprint: dict[str, Any] | None,
+        success: bool = True,
+    ) -> None:
+        if success and fingerprint is not None:
+            self.manifest(outpath).record(inpath, outpath, options, fingerprint)
+        else:
+            self.manifest(outpath).forget(outpath)
+
+    def save(self) -> None:
+        for manifest in self._manifests.values():
+            manifest.save()
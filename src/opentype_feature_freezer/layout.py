@@ -0,0 +1,286 @@
+from __future__ import annotations
+
+import struct
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Tuple
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable, Sequence
+
+# No required feature (LangSys.ReqFeatureIndex).
+NO_REQUIRED_FEATURE = 0xFFFF
+
+# A script and language system; None stands for every script, or for the
+# DefaultLangSys of the script.
+LangSysKey = Tuple[Optional[str], Optional[str]]
+
+# A FeatureVariationRecord: its conditions as (axis index, min, max) in
+# normalized coordinates, None if it has conditions of another format, and the
+# lookups of the features it substitutes, by feature index.
+Condition = Tuple[int, float, float]
+FeatureVariation = Tuple[Optional[List[Condition]], Dict[int, List[int]]]
+
+
+def _tag(data: bytes, offset: int) -> str:
+    return bytes(data[offset : offset + 4]).decode("latin-1")
+
+
+def _uint16s(data: bytes, offset: int) -> tuple[int, ...]:
+    (count,) = struct.unpack_from(">H", data, offset)
+    return struct.unpack_from(f">{count}H", data, offset + 2)
+
+
+def _f2dot14(value: int) -> float:
+    return (value - 0x10000 if value >= 0x8000 else value) / 16384
+
+
+def _featureVariations(data: bytes, offset: int) -> list[FeatureVariation]:
+    (count,) = struct.unpack_from(">L", data, offset + 4)
+    variations: list[FeatureVariation] = []
+    for i in range(count):
+        conditionSetOffset, substitutionOffset = struct.unpack_from(
+            ">LL", data, offset + 8 + i * 8
+        )
+        conditions: list[Condition] | None = []
+        if conditionSetOffset:
+            conditionSet = offset + conditionSetOffset
+            (conditionCount,) = struct.unpack_from(">H", data, conditionSet)
+            for j in range(conditionCount):
+                (conditionOffset,) = struct.unpack_from(
+                    ">L", data, conditionSet + 2 + j * 4
+                )
+                condition = conditionSet + conditionOffset
+                fmt, axisIndex, minValue, maxValue = struct.unpack_from(
+                    ">HHHH", data, condition
+                )
+                if fmt != 1:
+                    conditions = None
+                    break
+                conditions.append((axisIndex, _f2dot14(minValue), _f2dot14(maxValue)))
+        substitutions: dict[int, list[int]] = {}
+        if substitutionOffset:
+            substitution = offset + substitutionOffset
+            (substitutionCount,) = struct.unpack_from(">H", data, substitution + 4)
+            for j in range(substitutionCount):
+                featureIndex, featureOffset = struct.unpack_from(
+                    ">HL", data, substitution + 6 + j * 6
+                )
+                substitutions[featureIndex] = list(
+                    _uint16s(data, substitution + featureOffset + 2)
+                )
+        variations.append((conditions, substitutions))
+    return variations
+
+
+def _langSysFeatures(data: bytes, offset: int) -> list[int]:
+    # The required feature comes first, then the other features in order.
+    (required,) = struct.unpack_from(">H", data, offset + 2)
+    features = list(_uint16s(data, offset + 4))
+    if required != NO_REQUIRED_FEATURE and required not in features:
+        features.insert(0, required)
+    return features
+
+
+class LayoutIndex:
+    """Which lookups every feature of a GSUB or GPOS table uses, by script.
+
+    ``scripts`` maps each script tag to its language systems, in ScriptList
+    order: ``{lang: [feature index, ...]}``, with the DefaultLangSys under
+    None and the required feature (ReqFeatureIndex) first. ``features`` holds
+    ``(tag, [lookup index, ...])`` in FeatureList order. ``variations`` holds
+    the FeatureVariationRecords of variable fonts, which replace the lookups
+    of features in regions of the design space. Lookup sets for a script,
+    language and feature tag are computed once per FeatureVariationRecord
+    that applies (and once for none), so that variants, instances, collection
+    members and the report look them up instead of walking the table again.
+    ``toDict()`` and ``fromDict()`` convert to and from JSON-compatible data.
+    """
+
+    def __init__(
+        self,
+        scripts: dict[str, dict[str | None, list[int]]],
+        features: list[tuple[str, list[int]]],
+        variations: Sequence[FeatureVariation] = (),
+    ):
+        self.scripts = scripts
+        self.features = features
+        self.variations = list(variations)
+        # {record index or None: {(script, lang): {feature tag: lookup
+        # indices}}}, including the (None, lang) and (None, None) unions over
+        # all scripts.
+        self._lookups: dict[int | None, dict[LangSysKey, dict[str, set[int]]]] = {}
+
+    def _lookupsByTag(
+        self, record: int | None
+    ) -> dict[LangSysKey, dict[str, set[int]]]:
+        by_langsys = self._lookups.get(record)
+        if by_langsys is not None:
+            return by_langsys
+        features = self.features
+        if record is not None:
+            features = list(features)
+            for fi, lookups in self.variations[record][1].items():
+                if fi < len(features):
+                    features[fi] = (features[fi][0], lookups)
+        by_langsys = self._lookups[record] = {}
+        for script, langSys in self.scripts.items():
+            for lang, feature_indices in langSys.items():
+                for key in ((script, lang), (None, lang)):
+                    by_tag = by_langsys.setdefault(key, {})
+                    for fi in feature_indices:
+                        if fi < len(features):
+                            tag, lookups = features[fi]
+                            by_tag.setdefault(tag, set()).update(lookups)
+        return by_langsys
+
+    @classmethod
+    def fromData(cls, data: bytes) -> LayoutIndex:
+        """Read the ScriptList and FeatureList of a raw GSUB or GPOS table.
+
+        Lookups are not read, which makes this fast even for large tables.
+        """
+        major, minor, scriptListOffset, featureListOffset = struct.unpack_from(
+            ">HHHH", data
+        )
+
+        scripts: dict[str, dict[str | None, list[int]]] = {}
+        if scriptListOffset:
+            (scriptCount,) = struct.unpack_from(">H", data, scriptListOffset)
+            for i in range(scriptCount):
+                record = scriptListOffset + 2 + i * 6
+                (scriptOffset,) = struct.unpack_from(">H", data, record + 4)
+                script = scriptListOffset + scriptOffset
+                defaultOffset, langSysCount = struct.unpack_from(">HH", data, script)
+                langSys: dict[str | None, list[int]] = {}
+                if defaultOffset:
+                    langSys[None] = _langSysFeatures(data, script + defaultOffset)
+                for j in range(langSysCount):
+                    langRecord = script + 4 + j * 6
+                    (langOffset,) = struct.unpack_from(">H", data, langRecord + 4)
+                    langSys[_tag(data, langRecord)] = _langSysFeatures(
+                        data, script + langOffset
+                    )
+                scripts[_tag(data, record)] = langSys
+
+        features: list[tuple[str, list[int]]] = []
+        if featureListOffset:
+            (featureCount,) = struct.unpack_from(">H", data, featureListOffset)
+            for i in range(featureCount):
+                record = featureListOffset + 2 + i * 6
+                (featureOffset,) = struct.unpack_from(">H", data, record + 4)
+                lookups = _uint16s(data, featureListOffset + featureOffset + 2)
+                features.append((_tag(data, record), list(lookups)))
+
+        variations: list[FeatureVariation] = []
+        if (major, minor) >= (1, 1):
+            (variationsOffset,) = struct.unpack_from(">L", data, 10)
+            if variationsOffset:
+                variations = _featureVariations(data, variationsOffset)
+
+        return cls(scripts, features, variations)
+
+    def toDict(self) -> dict[str, Any]:
+        return {
+            "scripts": {
+                script: {
+                    "default": langSys.get(None),
+                    "langs": {
+                        lang: fis for lang, fis in langSys.items() if lang is not None
+                    },
+                }
+                for script, langSys in self.scripts.items()
+            },
+            "features": [[tag, lookups] for tag, lookups in self.features],
+            "variations": [
+                {
+                    "conditions": None
+                    if conditions is None
+                    else [list(condition) for condition in conditions],
+                    # JSON object keys are strings.
+                    "substitutions": {str(fi): lookups for fi, lookups in subs.items()},
+                }
+                for conditions, subs in self.variations
+            ],
+        }
+
+    @classmethod
+    def fromDict(cls, data: dict[str, Any]) -> LayoutIndex:
+        scripts: dict[str, dict[str | None, list[int]]] = {}
+        for script, entry in data["scripts"].items():
+            langSys: dict[str | None, list[int]] = {}
+            if entry["default"] is not None:
+                langSys[None] = entry["default"]
+            langSys.update(entry["langs"])
+            scripts[script] = langSys
+        variations: list[FeatureVariation] = [
+            (
+                None
+                if entry["conditions"] is None
+                else [tuple(condition) for condition in entry["conditions"]],
+                {int(fi): lookups for fi, lookups in entry["substitutions"].items()},
+            )
+            for entry in data.get("variations", ())
+        ]
+        return cls(
+            scripts, [(tag, lookups) for tag, lookups in data["features"]], variations
+        )
+
+    def featureIndices(self, script: str | None, lang: str | None) -> list[int]:
+        """Return the features of a script and language system, sorted.
+
+        Without ``lang``, the DefaultLangSys is used; without ``script``, the
+        features of all scripts are combined.
+        """
+        indices: set[int] = set()
+        for script_tag, langSys in self.scripts.items():
+            if script is None or script_tag == script:
+                indices.update(langSys.get(lang, ()))
+        return sorted(indices)
+
+    def matchVariation(self, location: Sequence[float] = ()) -> int | None:
+        """Return the index of the FeatureVariationRecord that applies at a
+        location, or None.
+
+        ``location`` holds the normalized coordinates in fvar axis order; axes
+        without a coordinate are at their default. As in text shaping, the
+        first record whose conditions are all met applies.
+        """
+        for record, (conditions, _) in enumerate(self.variations):
+            if conditions is not None and all(
+                minValue <= (location[axis] if axis < len(location) else 0) <= maxValue
+                for axis, minValue, maxValue in conditions
+            ):
+                return record
+        return None
+
+    def lookups(
+        self,
+        features: Iterable[str],
+        script: str | None,
+        lang: str | None,
+        location: Sequence[float] = (),
+    ) -> list[int]:
+        """Return the lookups of the given feature tags, sorted.
+
+        In variable fonts, the lookups are those at ``location`` (see
+        ``matchVariation()``), by default the default location.
+        """
+        by_langsys = self._lookupsByTag(self.matchVariation(location))
+        by_tag = by_langsys.get((script, lang), {})
+        lookups: set[int] = set()
+        for tag in features:
+            lookups.update(by_tag.get(tag, ()))
+        return sorted(lookups)
+
+    def header(self) -> dict[str, Any]:
+        """Return the script, language and feature tags of the table.
+
+        ``{"scripts": {script: [lang, ...]}, "features": [...]}``, with the
+        feature tags in FeatureList order (including repeated tags).
+        """
+        return {
+            "scripts": {
+                script: [lang for lang in langSys if lang is not None]
+                for script, langSys in self.scripts.items()
+            },
+            "features": [tag for tag, _ in self.features],
+        }
@@ -0,0 +1,104 @@
+from __future__ import annotations
+
+import contextlib
+import io
+import mmap
+import os
+from pathlib import Path
+from typing import TYPE_CHECKING, Any
+
+if TYPE_CHECKING:
+    from collections.abc import Iterator
+
+
+class MemoryReader(io.RawIOBase):
+    """A seekable read-only file over a buffer, without copying the buffer.
+
+    ``io.BytesIO`` copies anything but ``bytes``; here each ``read()`` only
+    copies the bytes it returns, e.g. a table that fontTools parses.
+    """
+
+    def __init__(
+        self, data: Any, name: str | None = None, mapped: mmap.mmap | None = None
+    ):
+        self._view = memoryview(data).cast("B")
+        self._pos = 0
+        # Closed together with the reader.
+        self._mmap = mapped
+        self._views = False
+        self._anyLength = False
+        if name is not None:
+            # TTFont.save() compares the name of a lazily read file with its
+            # output path.
+            self.name = name
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self._pos
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_CUR:
+            offset += self._pos
+        elif whence == io.SEEK_END:
+            offset += len(self._view)
+        if offset < 0:
+            raise ValueError(f"negative seek position {offset}")
+        self._pos = offset
+        return self._pos
+
+    def read(self, size: int | None = -1) -> Any:
+        end = len(self._view) if size is None or size < 0 else self._pos + size
+        view = self._view[self._pos : end]
+        self._pos += len(view)
+        # fontTools pads table data to a multiple of 4 bytes with "+=" when
+        # computing checksums, which a memoryview doesn't support.
+        if self._views and (self._anyLength or len(view) % 4 == 0):
+            return view
+        return view.tobytes()
+
+    @contextlib.contextmanager
+    def views(self, anyLength: bool = False) -> Iterator[None]:
+        """Return data as memoryviews of the buffer instead of copies.
+
+        Only for code that doesn't parse the data, e.g. when ``TTFont.save()``
+        copies tables that were not loaded to the output. Data whose length
+        isn't a multiple of 4 is still copied, unless ``anyLength`` is set
+        because the data is not padded in place, as in ``writer.writeFont()``.
+        """
+        self._views, self._anyLength = True, anyLength
+        try:
+            yield
+        finally:
+            self._views = self._anyLength = False
+
+    def readinto(self, buffer: Any) -> int:
+        target = memoryview(buffer).cast("B")
+        data = self._view[self._pos : self._pos + len(target)]
+        target[: len(data)] = data
+        self._pos += len(data)
+        return len(data)
+
+    def close(self) -> None:
+        if not self.closed:
+            self._view.release()
+            if self._mmap is not None:
+                with contextlib.suppress(BufferError):
+                    # Still exported, e.g. by a table that kept a view.
+                    self._mmap.close()
+        super().close()
+
+
+def openMapped(path: str | os.PathLike) -> MemoryReader:
+    """Open a font file through ``mmap``.
+
+    The file's pages stay in the page cache, shared by every process that maps
+    the file; only the table data that is actually parsed is copied.
+    """
+    with Path(path).open("rb") as f:
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    return MemoryReader(mapped, os.fspath(path), mapped)
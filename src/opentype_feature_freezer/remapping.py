@@ -0,0 +1,255 @@
+from __future__ import annotations
+
+import logging
+import struct
+from operator import itemgetter
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+if TYPE_CHECKING:
+    from collections.abc import Mapping, MutableMapping, Sequence
+
+    import fontTools.ttLib
+    from fontTools.ttLib.tables._c_m_a_p import table__c_m_a_p
+
+logger = logging.getLogger(__name__)
+
+# A format 14 subtable: {variation selector: [(code point, glyph name or None
+# for the default glyph), ...]}.
+UvsDict = Dict[int, List[Tuple[int, Optional[str]]]]
+
+
+def haveNumpy() -> bool:
+    return np is not None
+
+
+def groupCmaps(
+    cmaps: Sequence[MutableMapping[int, str]],
+) -> list[list[MutableMapping[int, str]]]:
+    """Group cmap dicts with identical content, so that each is remapped once.
+
+    The same dict can be shared by several subtables, and different platform
+    subtables (e.g. 0/3 and 3/1, or a format 4 subtable and the BMP part of a
+    format 12 one) usually hold the same mapping in separate dicts.
+    """
+    groups: list[list[MutableMapping[int, str]]] = []
+    seen: set[int] = set()
+    by_size: dict[int, list[list[MutableMapping[int, str]]]] = {}
+    for cmap in cmaps:
+        if id(cmap) in seen:
+            continue
+        seen.add(id(cmap))
+        candidates = by_size.setdefault(len(cmap), [])
+        for group in candidates:
+            if group[0] == cmap:
+                group.append(cmap)
+                break
+        else:
+            group = [cmap]
+            candidates.append(group)
+            groups.append(group)
+    return groups
+
+
+def _cmapChangesPython(
+    cmap: Mapping[int, str], substitutions: Mapping[str, str]
+) -> dict[int, str]:
+    changes: dict[int, str] = {}
+    get = substitutions.get
+    for code, glyph_name in cmap.items():
+        new_glyph_name = get(glyph_name, glyph_name)
+        if new_glyph_name != glyph_name:
+            changes[code] = new_glyph_name
+    return changes
+
+
+def _glyphIds(names: Sequence[str], reverseGlyphMap: Mapping[str, int]) -> tuple:
+    # itemgetter() looks up all names in C, much faster than a Python loop.
+    if len(names) == 1:
+        return (reverseGlyphMap[names[0]],)
+    return itemgetter(*names)(reverseGlyphMap)
+
+
+def _glyphIdArray(names: Sequence[str], reverseGlyphMap: Mapping[str, int]):
+    return np.fromiter(
+        _glyphIds(names, reverseGlyphMap), dtype=np.uint32, count=len(names)
+    )
+
+
+def _cmapChangesNumpy(
+    cmap: Mapping[int, str],
+    gidMap: np.ndarray,
+    glyphOrder: Sequence[str],
+    reverseGlyphMap: Mapping[str, int],
+) -> dict[int, str]:
+    if not cmap:
+        return {}
+    codes = list(cmap)
+    gids = _glyphIdArray(list(cmap.values()), reverseGlyphMap)
+    new_gids = gidMap.take(gids)
+    changed = np.flatnonzero(new_gids != gids)
+    return {
+        codes[i]: glyphOrder[gid]
+        for i, gid in zip(changed.tolist(), new_gids[changed].tolist())
+    }
+
+
+def buildGlyphIdMap(
+    substitutions: Mapping[str, str],
+    glyphOrder: Sequence[str],
+    reverseGlyphMap: Mapping[str, int],
+) -> np.ndarray:
+    """Return the substitutions as an array mapping each glyph ID to its new one."""
+    gid_map = np.arange(len(glyphOrder), dtype=np.uint32)
+    changed = {a: b for a, b in substitutions.items() if a != b}
+    if changed:
+        gid_map[_glyphIdArray(list(changed), reverseGlyphMap)] = _glyphIdArray(
+            list(changed.values()), reverseGlyphMap
+        )
+    return gid_map
+
+
+def remapCmaps(
+    cmaps: Sequence[MutableMapping[int, str]],
+    substitutions: Mapping[str, str],
+    glyphOrder: Sequence[str],
+    reverseGlyphMap: Mapping[str, int],
+    useNumpy: bool | None = None,
+) -> int:
+    """Apply ``substitutions`` (glyph name -> glyph name) to the cmap dicts.
+
+    With NumPy, the substitutions become one glyph ID array that every cmap is
+    remapped with by a single vectorized ``take``; without it, or with
+    ``useNumpy=False``, each code point is looked up in ``substitutions``.
+    Dicts with identical content are remapped once (see ``groupCmaps()``).
+    Returns the number of cmap entries that were changed.
+    """
+    if not any(a != b for a, b in substitutions.items()):
+        return 0
+    if useNumpy is None:
+        useNumpy = haveNumpy()
+    elif useNumpy and not haveNumpy():
+        logger.info("[remapCmaps] NumPy is not installed, using the Python engine")
+        useNumpy = False
+    gid_map = None
+    if useNumpy:
+        try:
+            gid_map = buildGlyphIdMap(substitutions, glyphOrder, reverseGlyphMap)
+        except KeyError as e:
+            logger.info("[remapCmaps] Glyph %s not in glyph order, not using NumPy", e)
+
+    def cmapChanges(cmap: Mapping[int, str]) -> dict[int, str]:
+        if gid_map is not None:
+            try:
+                return _cmapChangesNumpy(cmap, gid_map, glyphOrder, reverseGlyphMap)
+            except KeyError as e:
+                # cmap entries pointing at glyphs missing from the glyph order.
+                logger.info("[remapCmaps] Glyph %s not in glyph order", e)
+        return _cmapChangesPython(cmap, substitutions)
+
+    groups = groupCmaps(cmaps)
+    # The changes are computed from the unmodified dicts and applied after.
+    all_changes = [cmapChanges(group[0]) for group in groups]
+    rewritten = 0
+    for group, changes in zip(groups, all_changes):
+        for cmap in group:
+            cmap.update(changes)
+            rewritten += len(changes)
+    return rewritten
+
+
+def remapUvs(uvsDicts: Sequence[UvsDict], substitutions: Mapping[str, str]) -> int:
+    """Apply ``substitutions`` to the format 14 (Unicode Variation Sequences)
+    subtables.
+
+    Non-default UVS mappings name their glyph, which is substituted like a cmap
+    entry. Default ones (glyph None) map to the glyph of the base character in
+    the other subtables, so they follow the remapped cmap without changes. The
+    entry lists are replaced, not modified. Returns the number of non-default
+    mappings that were changed.
+    """
+    rewritten = 0
+    get = substitutions.get
+    for uvsDict in uvsDicts:
+        for selector, entries in uvsDict.items():
+            new_entries = [
+                (
+                    code,
+                    glyph_name if glyph_name is None else get(glyph_name, glyph_name),
+                )
+                for code, glyph_name in entries
+            ]
+            changed = sum(a != b for a, b in zip(entries, new_entries))
+            if changed:
+                uvsDict[selector] = new_entries
+                rewritten += changed
+    return rewritten
+
+
+def compileCmap(table: table__c_m_a_p, font: fontTools.ttLib.TTFont) -> bytes:
+    """Compile a cmap table to the same data as ``table.compile(font)``.
+
+    fontTools compiles every subtable that doesn't share its dict with an
+    earlier one, only to find that e.g. the 0/4 and 3/10 format 12 subtables
+    compile to the same data. Here, subtables of the same format and language
+    with identical content are compiled once. Tables with duplicate subtable
+    keys, which the OpenType spec does not allow, are left to fontTools.
+    """
+    table.tables.sort()
+    keys = [(t.platformID, t.platEncID, t.language) for t in table.tables]
+    seen: set = set()
+    duplicates = {k for k in keys if k in seen or seen.add(k)}  # type: ignore[func-returns-value]
+    if duplicates:
+        logger.warning(
+            "[compileCmap] cmap subtables have duplicate (platformID, platEncID, "
+            "language) entries, which the OpenType spec does not allow: %s",
+            sorted(duplicates),
+        )
+        return table.compile(font)
+    for subtable in table.tables:
+        subtable.ensureDecompiled()
+
+    # Like fontTools, subtables sharing a dict with an earlier subtable point
+    # at its data.
+    first: dict[int, object] = {}
+    for subtable in table.tables:
+        first.setdefault(id(subtable.cmap), subtable)
+    group_of = {
+        id(cmap): i
+        for i, group in enumerate(
+            groupCmaps([t.cmap for t in first.values() if t.format != 14])
+        )
+        for cmap in group
+    }
+    subtables: dict[tuple, object] = {}
+    subtable_keys: dict[int, tuple] = {}
+    for cmap_id, subtable in first.items():
+        if subtable.format == 14:
+            key: tuple = (14, cmap_id)
+        else:
+            key = (type(subtable), subtable.language, group_of[cmap_id])
+        subtables.setdefault(key, subtable)
+        subtable_keys[cmap_id] = key
+    chunks = {key: subtable.compile(font) for key, subtable in subtables.items()}
+
+    numSubTables = len(table.tables)
+    totalOffset = 4 + 8 * numSubTables
+    data = [struct.pack(">HH", table.tableVersion, numSubTables)]
+    tableData = []
+    tableSize = 0
+    offsets: dict[bytes, int] = {}
+    for subtable in table.tables:
+        chunk = chunks[subtable_keys[id(subtable.cmap)]]
+        offset = offsets.get(chunk)
+        if offset is None:
+            offset = offsets[chunk] = totalOffset + tableSize
+            tableData.append(chunk)
+            tableSize += len(chunk)
+        data.append(
+            struct.pack(">HHL", subtable.platformID, subtable.platEncID, offset)
+        )
+    return b"".join(data + tableData)
@@ -0,0 +1,79 @@
+from __future__ import annotations
+
+import json
+import os
+from pathlib import Path
+from typing import TYPE_CHECKING, Any
+
+from fontTools.ttLib.sfnt import SFNTReader
+
+from opentype_feature_freezer.layout import LayoutIndex
+
+if TYPE_CHECKING:
+    from collections.abc import Sequence
+
+LAYOUT_TABLES = ("GSUB", "GPOS")
+
+
+def parseLayoutHeader(data: bytes) -> dict[str, Any]:
+    """Read the ScriptList and FeatureList of a raw GSUB or GPOS table.
+
+    Returns the ``LayoutIndex.header()`` of the table.
+    """
+    return LayoutIndex.fromData(data).header()
+
+
+def readLayoutReport(
+    path: str | os.PathLike,
+    tables: Sequence[str] = ("GSUB",),
+    fontNumber: int = 0,
+) -> dict[str, Any]:
+    """Read the script, language and feature lists of a font file.
+
+    Only the sfnt table directory and the requested layout tables are read from
+    the file, which makes this suitable for scanning large font libraries.
+    """
+    report: dict[str, Any] = {"path": os.fspath(path), "tables": {}}
+    with Path(path).open("rb") as f:
+        reader = SFNTReader(f, fontNumber=fontNumber)
+        for tag in tables:
+            if tag in reader:
+                report["tables"][tag] = parseLayoutHeader(reader[tag])
+    return report
+
+
+def langSysOptions(scripts: dict[str, list[str]]) -> list[str]:
+    # The -s/-l options that select each script and language system.
+    options: list[str] = []
+    for script, langs in scripts.items():
+        options.append(f"-s '{script}'")
+        options.extend(f"-s '{script}' -l '{lang}'" for lang in langs)
+    return options
+
+
+def formatReportText(report: dict[str, Any]) -> str:
+    lines: list[str] = []
+    for tag in LAYOUT_TABLES:
+        # The GSUB section is always printed, even for fonts without GSUB.
+        if tag != "GSUB" and tag not in report["tables"]:
+            continue
+        layout = report["tables"].get(tag, {"scripts": {}, "features": []})
+        prefix = "" if tag == "GSUB" else f"{tag} "
+        lines.append(f"# {prefix}Scripts and languages:")
+        lines.extend(sorted(langSysOptions(layout["scripts"])))
+        lines.append(f"# {prefix}Features:")
+        lines.append("-f {}".format(",".join(sorted(layout["features"]))))
+    return "\n".join(lines)
+
+
+def formatReportJson(report: dict[str, Any]) -> str:
+    tables = {
+        tag: {
+            "scripts": {
+                script: sorted(langs) for script, langs in layout["scripts"].items()
+            },
+            "features": sorted(set(layout["features"])),
+        }
+        for tag, layout in report["tables"].items()
+    }
+    return json.dumps({"path": report["path"], "tables": tables}, sort_keys=True)
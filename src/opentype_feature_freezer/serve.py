@@ -0,0 +1,449 @@
+from __future__ import annotations
+
+import hashlib
+import io
+import json
+import logging
+import os
+import socketserver
+import sys
+import threading
+import time
+from argparse import ArgumentParser, Namespace
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import TYPE_CHECKING, Any
+from urllib.parse import parse_qsl, urlsplit
+
+import opentype_feature_freezer
+from opentype_feature_freezer.cli import parseOptions
+
+if TYPE_CHECKING:
+    from collections.abc import Sequence
+    from concurrent.futures import Future
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PORT = 8765
+CONTENT_TYPES = {None: "font/sfnt", "woff": "font/woff", "woff2": "font/woff2"}
+
+# Options that requests can set, with how to convert them from query strings.
+REQUEST_OPTIONS = {
+    "features": str,
+    "script": str,
+    "lang": str,
+    "alternate": int,
+    "location": str,
+    "instance": bool,
+    "zapnames": bool,
+    "suffix": bool,
+    "usesuffix": str,
+    "replacenames": str,
+    "info": bool,
+    "flavor": str,
+}
+
+
+class RequestError(ValueError):
+    pass
+
+
+def requestOptions(values: dict[str, Any]) -> dict[str, Any]:
+    options: dict[str, Any] = {}
+    for name, value in values.items():
+        if name == "path":
+            continue
+        convert = REQUEST_OPTIONS.get(name)
+        if convert is None:
+            raise RequestError(f"Unknown option '{name}'.")
+        if convert is bool and isinstance(value, str):
+            value = value.lower() in {"1", "true", "yes", "on"}
+        options[name] = convert(value)
+    if options.get("flavor") not in {None, "woff", "woff2", "sfnt"}:
+        raise RequestError("Option 'flavor' must be woff, woff2 or sfnt.")
+    if options.get("usesuffix"):
+        options["suffix"] = True
+    return options
+
+
+class FontCache:
+    """LRU of opened source fonts, bounded by the size of their font data.
+
+    Each entry is a ``RemapByOTL`` with the font open (lazily, so only the
+    tables needed for freezing are parsed) and the snapshot that
+    ``freezeVariant()`` restores before every request.
+    """
+
+    def __init__(self, maxSize: int):
+        self.maxSize = maxSize
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.entries: OrderedDict[str, tuple[Any, list, Namespace, int]] = OrderedDict()
+
+    def get(self, key: str, source: bytes | str) -> tuple[Any, list, Namespace]:
+        """Return the remapper of a font, its snapshot and its base options.
+
+        ``freezeVariant()`` replaces the remapper's options with those of the
+        variant, so every request merges its options onto the base options
+        rather than onto ``remapper.options``.
+        """
+        entry = self.entries.get(key)
+        if entry is not None:
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry[0], entry[1], entry[2]
+        self.misses += 1
+        if isinstance(source, bytes):
+            inpath: Any = io.BytesIO(source)
+            size = len(source)
+        else:
+            inpath = source
+            size = Path(source).stat().st_size
+        # Every request passes its own output to freezeVariant().
+        options = parseOptions(["-", "-"])
+        options.inpath = inpath
+        options.lazy = True
+        # Workers that cache the same font file share its pages.
+        options.mmap = not isinstance(source, bytes)
+        remapper = opentype_feature_freezer.RemapByOTL(options)
+        if remapper.isCollection():
+            raise RequestError("Font collections are not supported.")
+        try:
+            remapper.openFont()
+            if not remapper.success:
+                raise RequestError("Cannot open the font.")
+            snapshot = remapper.prepareVariants()
+        except BaseException:
+            # Don't leak the open (and possibly memory-mapped) input file.
+            remapper.closeFont()
+            raise
+        self.entries[key] = (remapper, snapshot, options, size)
+        self.size += size
+        while self.size > self.maxSize and len(self.entries) > 1:
+            _, (old, _, _, old_size) = self.entries.popitem(last=False)
+            old.closeFont()
+            self.size -= old_size
+        return remapper, snapshot, options
+
+    def info(self) -> dict[str, int]:
+        return {
+            "fonts": len(self.entries),
+            "bytes": self.size,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+_cache: FontCache | None = None
+
+
+def _initWorker(maxCacheSize: int, verbose: bool) -> None:
+    global _cache
+    _cache = FontCache(maxCacheSize)
+    logging.basicConfig(format="%(levelname)s: %(message)s")
+    if verbose:
+        logging.getLogger().setLevel(logging.INFO)
+
+
+def freezeInWorker(
+    key: str, source: bytes | str, options: dict[str, Any]
+) -> tuple[bytes | None, str, dict[str, Any]]:
+    """Freeze a font in a worker; returns (font data or None, error, cache info)."""
+    assert _cache is not None
+    try:
+        remapper, snapshot, base = _cache.get(key, source)
+        flavor = opentype_feature_freezer.outputFlavor(
+            remapper.inpath, options.get("flavor")
+        )
+        remapper.ttx.flavor = flavor
+        if flavor is None:
+            remapper.ttx.flavorData = None
+        output = io.BytesIO()
+        variant = Namespace(**{**vars(base), **options})
+        if not remapper.freezeVariant(snapshot, variant, output):
+            return None, "Errors during processing.", _cache.info()
+    except RequestError as e:
+        return None, str(e), _cache.info()
+    except Exception as e:
+        logger.exception("[freezeInWorker] Cannot freeze %s", key)
+        return None, f"{type(e).__name__}: {e}", _cache.info()
+    return output.getvalue(), "", _cache.info()
+
+
+class FreezeServer:
+    """Runs freeze requests on a pool of worker processes.
+
+    Every worker keeps its own cache of opened fonts, and each font is always
+    sent to the same worker, so repeated requests for a font find it parsed
+    and requests for one font never run concurrently on the same object.
+    """
+
+    def __init__(self, workers: int, cacheSize: int, verbose: bool = False):
+        self.cacheSize = cacheSize
+        self.verbose = verbose
+        self.executors = [self._makeExecutor() for _ in range(max(1, workers))]
+        self.lock = threading.Lock()
+        self.started = time.time()
+        self.requests = 0
+        self.failures = 0
+        self.inFlight = 0
+        self.busyTime = 0.0
+        self.caches: list[dict[str, Any]] = [{} for _ in self.executors]
+
+    def _makeExecutor(self) -> ProcessPoolExecutor:
+        return ProcessPoolExecutor(
+            max_workers=1,
+            initializer=_initWorker,
+            initargs=(self.cacheSize, self.verbose),
+        )
+
+    @staticmethod
+    def sourceKey(source: bytes | str) -> str:
+        if isinstance(source, bytes):
+            return "sha256:" + hashlib.sha256(source).hexdigest()
+        stat = Path(source).stat()
+        return f"path:{Path(source).resolve()}:{stat.st_size}:{stat.st_mtime_ns}"
+
+    def freeze(self, source: bytes | str, options: dict[str, Any]) -> bytes:
+        key = self.sourceKey(source)
+        index = int(hashlib.sha1(key.encode()).hexdigest(), 16) % len(self.executors)
+        with self.lock:
+            self.requests += 1
+            self.inFlight += 1
+        start = time.perf_counter()
+        try:
+            future: Future = self.executors[index].submit(
+                freezeInWorker, key, source, options
+            )
+            try:
+                data, error, cache = future.result()
+            except BrokenProcessPool:
+                # The worker died (e.g. out of memory); start a fresh one.
+                with self.lock:
+                    self.executors[index] = self._makeExecutor()
+                raise RuntimeError("The worker process died.") from None
+            self.caches[index] = cache
+            if data is None:
+                raise RequestError(error)
+            return data
+        except Exception:
+            with self.lock:
+                self.failures += 1
+            raise
+        finally:
+            with self.lock:
+                self.inFlight -= 1
+                self.busyTime += time.perf_counter() - start
+
+    def metrics(self) -> dict[str, Any]:
+        with self.lock:
+            caches = [cache for cache in self.caches if cache]
+            return {
+                "uptime": time.time() - self.started,
+                "workers": len(self.executors),
+                "requests": self.requests,
+                "failures": self.failures,
+                "in_flight": self.inFlight,
+                "busy_time": self.busyTime,
+                "cached_fonts": sum(cache["fonts"] for cache in caches),
+                "cached_bytes": sum(cache["bytes"] for cache in caches),
+                "cache_hits": sum(cache["hits"] for cache in caches),
+                "cache_misses": sum(cache["misses"] for cache in caches),
+            }
+
+    def close(self) -> None:
+        for executor in self.executors:
+            executor.shutdown(cancel_futures=True)
+
+
+class FreezeRequestHandler(BaseHTTPRequestHandler):
+    """HTTP API of ``pyftfeatfreeze-serve``.
+
+    ``POST /freeze?features=smcp,c2sc&suffix=1`` with the font data as body, or
+    ``POST /freeze`` with a JSON body such as ``{"path": "/fonts/A.otf",
+    "features": "smcp"}``, returns the frozen font. ``GET /health`` and
+    ``GET /metrics`` return JSON.
+    """
+
+    server_version = f"pyftfeatfreeze/{opentype_feature_freezer.__version__}"
+    protocol_version = "HTTP/1.1"
+
+    def _send(self, status: HTTPStatus, body: bytes, contentType: str) -> None:
+        self.send_response(status)
+        self.send_header("Content-Type", contentType)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _sendJson(self, status: HTTPStatus, data: dict[str, Any]) -> None:
+        self._send(status, json.dumps(data).encode() + b"\n", "application/json")
+
+    def do_GET(self) -> None:
+        path = urlsplit(self.path).path
+        if path == "/health":
+            self._sendJson(HTTPStatus.OK, {"status": "ok"})
+        elif path == "/metrics":
+            self._sendJson(HTTPStatus.OK, self.server.freezer.metrics())
+        else:
+            self._sendJson(HTTPStatus.NOT_FOUND, {"error": "Not found."})
+
+    def do_POST(self) -> None:
+        url = urlsplit(self.path)
+        if url.path != "/freeze":
+            self._sendJson(HTTPStatus.NOT_FOUND, {"error": "Not found."})
+            return
+        length = int(self.headers.get("Content-Length") or 0)
+        if length > self.server.maxRequestSize:
+            self.close_connection = True
+            self._sendJson(
+                HTTPStatus.REQUEST_ENTITY_TOO_LARGE, {"error": "Request too large."}
+            )
+            return
+        body = self.rfile.read(length)
+        try:
+            values: dict[str, Any] = dict(parse_qsl(url.query))
+            if self.headers.get_content_type() == "application/json":
+                values.update(json.loads(body))
+                if "path" not in values:
+                    raise RequestError("A JSON request needs a 'path'.")
+                source: bytes | str = os.fspath(values["path"])
+                if not Path(source).is_file():
+                    raise RequestError("Input file does not exist.")
+            else:
+                source = body
+            options = requestOptions(values)
+            data = self.server.freezer.freeze(source, options)
+        except (RequestError, ValueError) as e:
+            self._sendJson(HTTPStatus.BAD_REQUEST, {"error": str(e)})
+            return
+        except Exception as e:
+            self._sendJson(HTTPStatus.INTERNAL_SERVER_ERROR, {"error": str(e)})
+            return
+        flavor = opentype_feature_freezer.FLAVOR_SIGNATURES.get(data[:4])
+        self._send(HTTPStatus.OK, data, CONTENT_TYPES[flavor])
+
+    def log_message(self, format: str, *args: Any) -> None:  # noqa: A002
+        # client_address is empty for Unix sockets.
+        logger.info("[serve] %s", format % args)
+
+
+class ThreadingUnixHTTPServer(socketserver.ThreadingUnixStreamServer):
+    daemon_threads = True
+
+    def server_bind(self) -> None:
+        socketserver.UnixStreamServer.server_bind(self)
+        self.server_name = "localhost"
+        self.server_port = 0
+
+
+def makeServer(
+    freezer: FreezeServer,
+    host: str = "127.0.0.1",
+    port: int = DEFAULT_PORT,
+    unix: str | None = None,
+    maxRequestSize: int = 512 * 2**20,
+) -> socketserver.BaseServer:
+    server: Any
+    if unix:
+        Path(unix).unlink(missing_ok=True)
+        server = ThreadingUnixHTTPServer(unix, FreezeRequestHandler)
+    else:
+        server = ThreadingHTTPServer((host, port), FreezeRequestHandler)
+        server.daemon_threads = True
+    server.freezer = freezer
+    server.maxRequestSize = maxRequestSize
+    return server
+
+
+def parseServeOptions(args: Sequence[str] | None = None) -> Namespace:
+    parser = ArgumentParser(
+        description=(
+            "With %(prog)s you can run a server that freezes OpenType features "
+            "on request. Source fonts stay parsed in memory between requests."
+        ),
+        epilog=(
+            "Example: %(prog)s --port 8765 -j 4 & "
+            "curl --data-binary @Font.otf -o FontSC.otf "
+            "'http://127.0.0.1:8765/freeze?features=smcp,c2sc&usesuffix=SC'"
+        ),
+    )
+    parser.add_argument(
+        "--host",
+        default="127.0.0.1",
+        help="address to listen on (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--port",
+        type=int,
+        default=DEFAULT_PORT,
+        help="TCP port to listen on (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--unix", metavar="PATH", default=None, help="listen on a Unix socket instead"
+    )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=os.cpu_count() or 1,
+        help="number of worker processes (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--cache-size",
+        type=int,
+        default=512,
+        metavar="MB",
+        help=(
+            "size of the source fonts each worker keeps parsed, in megabytes "
+            "(default: %(default)s)"
+        ),
+    )
+    parser.add_argument(
+        "--max-request-size",
+        type=int,
+        default=512,
+        metavar="MB",
+        help="largest accepted request body in megabytes (default: %(default)s)",
+    )
+    parser.add_argument(
+        "-v",
+        "--verbose",
+        action="store_true",
+        help="print additional information during processing",
+    )
+    return parser.parse_args(args)
+
+
+def main(args: list[str] | None = None) -> int:
+    logging.basicConfig(format="%(levelname)s: %(message)s")
+    options = parseServeOptions(args)
+    if options.verbose:
+        logging.getLogger().setLevel(logging.INFO)
+
+    freezer = FreezeServer(options.jobs, options.cache_size * 2**20, options.verbose)
+    server = makeServer(
+        freezer,
+        options.host,
+        options.port,
+        options.unix,
+        options.max_request_size * 2**20,
+    )
+    where = options.unix or "http://{}:{}".format(*server.server_address[:2])
+    logging.warning("Serving on %s", where)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        freezer.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
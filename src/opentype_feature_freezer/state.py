@@ -0,0 +1,55 @@
+from __future__ import annotations
+
+from array import array
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable, Sequence
+
+
+def glyphIdArray(numGlyphs: int, gids: Iterable[int] = ()) -> array:
+    # Fonts have at most 65536 glyphs, but fontTools doesn't enforce that for
+    # fonts built in memory.
+    return array("H" if numGlyphs <= 0x10000 else "I", gids)
+
+
+class FreezeState:
+    """What ``RemapByOTL`` computes while freezing one font or variant.
+
+    Glyphs are referred to by glyph ID. ``changed`` only holds the glyphs that
+    the frozen features substitute, mapped to the glyph they become; glyph
+    names are looked up in ``glyphOrder`` only for logging, ``--names`` and
+    the cmap remapping.
+    """
+
+    __slots__ = (
+        "FeatureIndex",
+        "LookupList",
+        "changed",
+        "filterByFeatures",
+        "filterByLangSys",
+        "filterByLocation",
+        "filterByScript",
+        "glyphOrder",
+        "nameIds",
+    )
+
+    def __init__(self, glyphOrder: Sequence[str] = ()):
+        self.FeatureIndex: list[int] | None = None
+        self.LookupList: list[int] | None = None
+        self.changed: dict[int, int] = {}
+        self.filterByFeatures: list[str] | None = None
+        self.filterByLangSys: str | None = None
+        # Normalized coordinates in fvar axis order; [] for the default location.
+        self.filterByLocation: list[float] | None = None
+        self.filterByScript: str | None = None
+        self.glyphOrder: Sequence[str] = glyphOrder
+        self.nameIds: array = glyphIdArray(len(glyphOrder))
+
+    def substitutionMapping(self) -> dict[str, str]:
+        glyph_order = self.glyphOrder
+        return {glyph_order[a]: glyph_order[b] for a, b in self.changed.items()}
+
+    def names(self) -> list[str]:
+        glyph_order = self.glyphOrder
+        return [glyph_order[gid] for gid in self.nameIds]
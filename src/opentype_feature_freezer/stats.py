@@ -0,0 +1,112 @@
+from __future__ import annotations
+
+import contextlib
+import json
+import time
+from dataclasses import asdict, dataclass, field
+from typing import TYPE_CHECKING, Any, Callable
+
+if TYPE_CHECKING:
+    from collections.abc import Iterator
+
+STATS_FORMATS = ("text", "json")
+
+
+@dataclass
+class StageStats:
+    calls: int = 0
+    wall: float = 0.0
+    cpu: float = 0.0
+
+
+@dataclass
+class FreezeStats:
+    """Timings and counters of one ``RemapByOTL`` run.
+
+    ``stages`` holds the wall-clock and CPU time of every pipeline stage that
+    ran (summed over variants and collection members), the other fields count
+    the work done: GSUB lookups visited (and how many of them were already
+    decoded), subtables skipped per lookup type, glyph mappings applied,
+    substitution cycles, cmap entries rewritten and name records changed.
+    """
+
+    inpath: str = ""
+    outpath: str = ""
+    success: bool = True
+    stages: dict[str, StageStats] = field(default_factory=dict)
+    lookups_visited: int = 0
+    lookup_cache_hits: int = 0
+    subtables_skipped: dict[int, int] = field(default_factory=dict)
+    mappings_applied: int = 0
+    substitution_cycles: int = 0
+    cmap_entries_rewritten: int = 0
+    name_records_touched: int = 0
+    plan_cache_hits: int = 0
+
+    @contextlib.contextmanager
+    def measure(self, stage: str) -> Iterator[StageStats]:
+        stats = self.stages.setdefault(stage, StageStats())
+        wall, cpu = time.perf_counter(), time.process_time()
+        try:
+            yield stats
+        finally:
+            stats.calls += 1
+            stats.wall += time.perf_counter() - wall
+            stats.cpu += time.process_time() - cpu
+
+    def skipSubtable(self, lookupType: int) -> None:
+        self.subtables_skipped[lookupType] = (
+            self.subtables_skipped.get(lookupType, 0) + 1
+        )
+
+    @property
+    def wall(self) -> float:
+        return sum(stage.wall for stage in self.stages.values())
+
+    @property
+    def cpu(self) -> float:
+        return sum(stage.cpu for stage in self.stages.values())
+
+    def asDict(self) -> dict[str, Any]:
+        data = asdict(self)
+        data["wall"] = self.wall
+        data["cpu"] = self.cpu
+        return data
+
+    def toJson(self) -> str:
+        # JSON object keys are strings, so the lookup types become "2", "5", ...
+        return json.dumps(self.asDict(), sort_keys=True)
+
+    def formatText(self) -> str:
+        lines = [f"# Stats: {self.inpath} -> {self.outpath}"]
+        for name, stage in self.stages.items():
+            lines.append(
+                f"{name:<22}{stage.calls:>4}x {stage.wall:9.4f} s wall "
+                f"{stage.cpu:9.4f} s CPU"
+            )
+        lines.append(
+            f"{'total':<22}      {self.wall:9.4f} s wall {self.cpu:9.4f} s CPU"
+        )
+        skipped = ", ".join(
+            f"type {lookupType}: {count}"
+            for lookupType, count in sorted(self.subtables_skipped.items())
+        )
+        lines.extend(
+            [
+                f"lookups visited:        {self.lookups_visited}",
+                f"lookups reused:         {self.lookup_cache_hits}",
+                f"subtables skipped:      {skipped or 0}",
+                f"mappings applied:       {self.mappings_applied}",
+                f"substitution cycles:    {self.substitution_cycles}",
+                f"cmap entries rewritten: {self.cmap_entries_rewritten}",
+                f"name records touched:   {self.name_records_touched}",
+                f"plan cache hits:        {self.plan_cache_hits}",
+            ]
+        )
+        return "\n".join(lines)
+
+    def format(self, fmt: str) -> str:
+        return self.toJson() if fmt == "json" else self.formatText()
+
+
+StatsHook = Callable[[str, FreezeStats], None]
@@ -0,0 +1,387 @@
+from __future__ import annotations
+
+import logging
+from collections.abc import Callable, Sequence
+from functools import lru_cache
+from typing import TYPE_CHECKING, Any, Optional
+
+if TYPE_CHECKING:
+    from collections.abc import Hashable, Iterable, Iterator, Mapping
+
+logger = logging.getLogger(__name__)
+
+LOOKUP_TYPE_NAMES = {
+    1: "single",
+    2: "multiple",
+    3: "alternate",
+    4: "ligature",
+    5: "contextual",
+    6: "chaining contextual",
+    7: "extension",
+    8: "reverse chaining contextual",
+}
+
+# Chooses the glyph that an alternate substitution of ``glyph`` becomes, or
+# None to leave the glyph alone.
+AlternateChooser = Callable[[str, Sequence[str]], Optional[str]]
+
+
+@lru_cache(maxsize=None)
+def alternateByIndex(index: int = 0) -> AlternateChooser:
+    """Return a chooser that picks ``alternates[index]``.
+
+    Glyphs with fewer alternates get the last one; negative indices count from
+    the end. The chooser for an index is always the same object, so that it
+    can be part of cache keys.
+    """
+
+    def chooseAlternate(_glyph: str, alternates: Sequence[str]) -> str | None:
+        if not alternates:
+            return None
+        if index >= len(alternates):
+            return alternates[-1]
+        if index < -len(alternates):
+            return alternates[0]
+        return alternates[index]
+
+    return chooseAlternate
+
+
+# A glyph ID mapping; None marks a glyph whose substitution depends on its
+# context and cannot be frozen.
+Outcome = Optional[int]
+
+
+class LookupDecoder:
+    """Decodes the lookups of one GSUB table into glyph ID mappings.
+
+    Subtables are decoded by the handler for their type in
+    ``SUBTABLE_HANDLERS``, after unwrapping extensions; the others are passed
+    to ``skipSubtable``. Decoded lookups are kept in ``cache`` by lookup index,
+    and the indices of lookups that were decoded only in part (some of their
+    subtables skipped, or glyphs substituted depending on the text) in
+    ``partial``; both may be shared between decoders of the same table and
+    options.
+    """
+
+    def __init__(
+        self,
+        lookups: Sequence[Any],
+        glyphIds: Mapping[str, int],
+        chooseAlternate: AlternateChooser | None = None,
+        skipSubtable: Callable[[int], None] | None = None,
+        cache: dict[int, dict[int, int]] | None = None,
+        partial: set[int] | None = None,
+    ):
+        self.lookups = lookups
+        self.glyphIds = glyphIds
+        self.chooseAlternate = chooseAlternate or alternateByIndex(0)
+        self.skipSubtable = skipSubtable
+        self.cache: dict[int, dict[int, int]] = {} if cache is None else cache
+        self.partial: set[int] = set() if partial is None else partial
+        # Coverage and class definition tables as glyph ID lists and
+        # dicts, by table id; the tables are kept so that ids stay unique.
+        self._coverages: dict[int, tuple[Any, list[int]]] = {}
+        self._classes: dict[int, tuple[Any, dict[int, int]]] = {}
+        self._decoding: set[int] = set()
+        # Whether the contextual subtable being decoded has a rule whose
+        # nested lookups were decoded only in part.
+        self._nestedPartial = False
+        self._loggedPartial: set[int] = set()
+
+    def lookupMapping(self, index: int) -> dict[int, int] | None:
+        """Return the mapping of the lookup at ``index`` in the LookupList.
+
+        Returns None for indices out of range, and for a lookup that is
+        reached again while it's being decoded (nested lookups that recurse).
+        """
+        mapping = self.cache.get(index)
+        if mapping is not None:
+            return mapping
+        if not 0 <= index < len(self.lookups) or index in self._decoding:
+            return None
+        self._decoding.add(index)
+        try:
+            mapping, complete = self._decode(self.lookups[index])
+        finally:
+            self._decoding.discard(index)
+        if not complete:
+            self.partial.add(index)
+        self.cache[index] = mapping
+        return mapping
+
+    def decode(self, lookup: Any) -> dict[int, int]:
+        """Return what ``lookup`` does to each glyph, as a glyph ID mapping.
+
+        As when the lookup is applied to text, the first subtable that covers
+        a glyph substitutes it, and every glyph is substituted once: ``a -> b``
+        and ``b -> c`` in one lookup turn ``a`` into ``b``, not ``c``.
+        Contextual subtables only contribute the glyphs that they substitute
+        whatever surrounds them; a glyph that a contextual subtable covers
+        under some context isn't substituted by later subtables either, since
+        the result depends on the text.
+        """
+        return self._decode(lookup)[0]
+
+    def _decode(self, lookup: Any) -> tuple[dict[int, int], bool]:
+        # Also returns whether the mapping is all that the lookup does.
+        outcomes: dict[int, Outcome] = {}
+        complete = True
+        # This may decode a nested lookup of the subtable the caller decodes.
+        nested_partial = self._nestedPartial
+        for subtable in lookup.SubTable:
+            subtable = unwrapExtension(subtable)
+            handler = SUBTABLE_HANDLERS.get(subtable.LookupType)
+            frozen = False
+            self._nestedPartial = False
+            if handler is not None:
+                for gid_in, gid_out in handler(self, subtable):
+                    if gid_in not in outcomes:
+                        outcomes[gid_in] = gid_out
+                    frozen = frozen or gid_out is not None
+            # Rules with nested lookups that were decoded only in part are not
+            # frozen, so their subtable is counted as skipped too.
+            skipped = (
+                handler is None
+                or self._nestedPartial
+                or (not frozen and subtable.LookupType in CONTEXTUAL_TYPES)
+            )
+            if skipped:
+                complete = False
+                if self.skipSubtable is not None:
+                    self.skipSubtable(subtable.LookupType)
+        self._nestedPartial = nested_partial
+        mapping = {
+            gid_in: gid_out
+            for gid_in, gid_out in outcomes.items()
+            if gid_out is not None
+        }
+        return mapping, complete and len(mapping) == len(outcomes)
+
+    def coverage(self, coverage: Any) -> list[int]:
+        # Glyph IDs in coverage index order.
+        if coverage is None:
+            return []
+        entry = self._coverages.get(id(coverage))
+        if entry is None:
+            glyph_ids = self.glyphIds
+            entry = (coverage, [glyph_ids[glyph] for glyph in coverage.glyphs])
+            self._coverages[id(coverage)] = entry
+        return entry[1]
+
+    def classes(self, classDef: Any) -> dict[int, int]:
+        # Class by glyph ID; glyphs that aren't listed are in class 0.
+        if classDef is None:
+            return {}
+        entry = self._classes.get(id(classDef))
+        if entry is None:
+            glyph_ids = self.glyphIds
+            entry = (
+                classDef,
+                {glyph_ids[glyph]: cls for glyph, cls in classDef.classDefs.items()},
+            )
+            self._classes[id(classDef)] = entry
+        return entry[1]
+
+    def ruleMappings(self, rule: Any) -> list[dict[int, int]] | None:
+        """Return the nested lookup mappings of a rule, in order.
+
+        Returns None unless the rule matches a single glyph whatever surrounds
+        it (no backtrack, lookahead or further input glyphs) and its nested
+        lookups can all be decoded in full.
+        """
+        for name in ("Backtrack", "Input", "Class", "LookAhead"):
+            if getattr(rule, name, None):
+                return None
+        return self.recordMappings(rule.SubstLookupRecord)
+
+    def recordMappings(self, records: Sequence[Any]) -> list[dict[int, int]] | None:
+        mappings = []
+        for record in records or ():
+            if record.SequenceIndex != 0:
+                return None
+            index = record.LookupListIndex
+            mapping = self.lookupMapping(index)
+            if mapping is None:
+                return None
+            if index in self.partial:
+                # Applying only the decoded part would leave the other glyphs
+                # alone as if the nested lookup didn't touch them.
+                if index not in self._loggedPartial:
+                    self._loggedPartial.add(index)
+                    logger.info(
+                        "[LookupDecoder] Skipping contextual rules with nested "
+                        "lookup %d, which cannot be frozen in full",
+                        index,
+                    )
+                self._nestedPartial = True
+                return None
+            mappings.append(mapping)
+        return mappings
+
+
+def unwrapExtension(subtable: Any) -> Any:
+    # Extension subtables (type 7) wrap a subtable of another type.
+    while subtable.LookupType == 7:
+        subtable = subtable.ExtSubTable
+    return subtable
+
+
+def _apply(gid: int, mappings: list[dict[int, int]] | None) -> Outcome:
+    if mappings is None:
+        return None
+    for mapping in mappings:
+        gid = mapping.get(gid, gid)
+    return gid
+
+
+def _singlePairs(
+    decoder: LookupDecoder, subtable: Any
+) -> Iterator[tuple[int, Outcome]]:
+    glyph_ids = decoder.glyphIds
+    for sub_in, sub_out in subtable.mapping.items():
+        yield glyph_ids[sub_in], glyph_ids[sub_out]
+
+
+def _alternatePairs(
+    decoder: LookupDecoder, subtable: Any
+) -> Iterator[tuple[int, Outcome]]:
+    glyph_ids = decoder.glyphIds
+    for sub_in, alternates in subtable.alternates.items():
+        sub_out = decoder.chooseAlternate(sub_in, alternates)
+        if sub_out is not None:
+            yield glyph_ids[sub_in], glyph_ids[sub_out]
+
+
+def _contextualPairs(
+    decoder: LookupDecoder, subtable: Any
+) -> Iterator[tuple[int, Outcome]]:
+    # Types 5 and 6. Only the first rule that a glyph starts is tried before
+    # falling through to the next subtable; when that rule has a context, the
+    # glyph's substitution depends on the text.
+    chained = subtable.LookupType == 6
+    prefix = "Chain" if chained else ""
+    if subtable.Format == 1:
+        rule_sets = getattr(subtable, f"{prefix}SubRuleSet", None) or ()
+        for gid, rule_set in zip(decoder.coverage(subtable.Coverage), rule_sets):
+            rules = getattr(rule_set, f"{prefix}SubRule", None)
+            if rules:
+                yield gid, _apply(gid, decoder.ruleMappings(rules[0]))
+    elif subtable.Format == 2:
+        class_sets = getattr(subtable, f"{prefix}SubClassSet", None) or ()
+        class_def = subtable.InputClassDef if chained else subtable.ClassDef
+        # Decode the first rule of each class once, then look every covered
+        # glyph up by its class.
+        by_class: dict[int, list[dict[int, int]] | None] = {}
+        for cls, class_set in enumerate(class_sets):
+            rules = getattr(class_set, f"{prefix}SubClassRule", None)
+            if rules:
+                by_class[cls] = decoder.ruleMappings(rules[0])
+        classes = decoder.classes(class_def)
+        for gid in decoder.coverage(subtable.Coverage):
+            cls = classes.get(gid, 0)
+            if cls in by_class:
+                yield gid, _apply(gid, by_class[cls])
+    elif subtable.Format == 3:
+        if chained:
+            coverages = subtable.InputCoverage
+            context = subtable.BacktrackCoverage or subtable.LookAheadCoverage
+        else:
+            coverages = subtable.Coverage
+            context = None
+        mappings = None
+        if len(coverages) == 1 and not context:
+            mappings = decoder.recordMappings(subtable.SubstLookupRecord)
+        for gid in decoder.coverage(coverages[0] if coverages else None):
+            yield gid, _apply(gid, mappings)
+
+
+def _reversePairs(
+    decoder: LookupDecoder, subtable: Any
+) -> Iterator[tuple[int, Outcome]]:
+    unconditional = not (subtable.BacktrackCoverage or subtable.LookAheadCoverage)
+    glyph_ids = decoder.glyphIds
+    for gid, sub_out in zip(decoder.coverage(subtable.Coverage), subtable.Substitute):
+        yield gid, glyph_ids[sub_out] if unconditional else None
+
+
+# The subtable types whose substitutions can be frozen, by lookup type. A
+# handler yields ``(glyph ID, outcome)`` pairs for the glyphs it covers.
+SUBTABLE_HANDLERS: dict[
+    int, Callable[[LookupDecoder, Any], Iterable[tuple[int, Outcome]]]
+] = {
+    1: _singlePairs,
+    3: _alternatePairs,
+    5: _contextualPairs,
+    6: _contextualPairs,
+    8: _reversePairs,
+}
+
+# Types whose subtables are counted as skipped when they freeze no glyph.
+CONTEXTUAL_TYPES = frozenset({5, 6, 8})
+
+
+def lookupMapping(
+    lookup: Any,
+    glyphIds: Mapping[str, int],
+    skipSubtable: Callable[[int], None] | None = None,
+    chooseAlternate: AlternateChooser | None = None,
+    lookups: Sequence[Any] = (),
+) -> dict[int, int]:
+    """Return what a lookup does to each glyph, as a glyph ID mapping.
+
+    Alternate substitutions use ``chooseAlternate`` (default: the first
+    alternate). Contextual subtables look their nested lookups up in
+    ``lookups``, the LookupList of the table. See ``LookupDecoder.decode()``.
+    """
+    return LookupDecoder(lookups, glyphIds, chooseAlternate, skipSubtable).decode(
+        lookup
+    )
+
+
+def composeMappings(
+    mappings: Iterable[tuple[Hashable, Mapping[int, int]]],
+) -> tuple[dict[int, int], list[tuple[int, Hashable]]]:
+    """Compose glyph ID mappings in order, as if they were applied one by one.
+
+    ``mappings`` holds ``(key, mapping)`` pairs, e.g. one per lookup. Returns
+    the glyphs that end up changed, mapped to their final glyph, and the
+    cycles found: ``(glyph, key)`` for every glyph that a mapping turns back
+    into itself after earlier ones had changed it (``a -> b -> a``).
+    """
+    # Reverse index from each glyph ID to the glyph IDs that currently become
+    # it. Glyphs that no mapping touched yet map to themselves and are not
+    # stored, so every mapping only touches the glyphs it moves.
+    positions: dict[int, list[int]] = {}
+    cycles: list[tuple[int, Hashable]] = []
+    for key, mapping in mappings:
+        # A lookup substitutes all glyphs at once: collect what every
+        # substitution moves before moving anything.
+        moves = []
+        for gid_in, gid_out in mapping.items():
+            if gid_in == gid_out:
+                continue
+            moved = positions.get(gid_in, [gid_in])
+            if moved:
+                moves.append((moved, gid_out))
+                positions[gid_in] = []
+        for moved, gid_out in moves:
+            if gid_out in moved:
+                cycles.append((gid_out, key))
+            target = positions.get(gid_out, [gid_out])
+            # Merge the shorter list into the longer one.
+            if len(target) < len(moved):
+                moved.extend(target)
+                positions[gid_out] = moved
+            else:
+                target.extend(moved)
+                positions[gid_out] = target
+    changed = dict(
+        sorted(
+            (gid_in, gid_out)
+            for gid_out, gids_in in positions.items()
+            for gid_in in gids_in
+            if gid_in != gid_out
+        )
+    )
+    return changed, cycles
@@ -0,0 +1,161 @@
+from __future__ import annotations
+
+import os
+import struct
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, BinaryIO
+
+from fontTools.misc import sstruct
+from fontTools.ttLib import getSearchRange
+from fontTools.ttLib.sfnt import (
+    calcChecksum,
+    sfntDirectoryEntryFormat,
+    sfntDirectoryEntrySize,
+    sfntDirectoryFormat,
+    sfntDirectorySize,
+)
+from fontTools.ttLib.ttFont import sortedTagList
+
+if TYPE_CHECKING:
+    from collections.abc import Collection
+
+    import fontTools.ttLib
+
+# head.checkSumAdjustment makes the checksum of the whole font this value.
+CHECKSUM_MAGIC = 0xB1B0AFBA
+
+
+def _pad(length: int) -> int:
+    return -length % 4
+
+
+def _sameFile(file: Any, outpath: str | os.PathLike) -> bool:
+    name = getattr(file, "name", None)
+    if not isinstance(name, (str, os.PathLike)):
+        return False
+    try:
+        return Path(name).samefile(outpath)
+    except OSError:
+        return False
+
+
+def canPassThrough(
+    font: fontTools.ttLib.TTFont, outpath: str | os.PathLike | BinaryIO
+) -> bool:
+    """Return whether ``writeFont()`` can save ``font`` to ``outpath``.
+
+    The font must have been read from an uncompressed sfnt file, which it is
+    saved as again, and all its loaded tables must come from that file.
+    """
+    reader = font.reader
+    if reader is None or reader.flavor is not None or font.flavor is not None:
+        return False
+    if any(tag not in reader for tag in font.tables if tag != "GlyphOrder"):
+        return False
+    # Writing over the input would truncate it before its tables are copied.
+    return hasattr(outpath, "write") or not _sameFile(reader.file, outpath)
+
+
+def writeFont(
+    font: fontTools.ttLib.TTFont,
+    outpath: str | os.PathLike | BinaryIO,
+    modifiedTables: Collection[str],
+) -> int:
+    """Save ``font`` as an sfnt file, compiling only ``modifiedTables``.
+
+    Every other table is copied from the input file with the checksum from the
+    input's table directory, so saving takes time in the size of the modified
+    tables rather than of the font. ``head`` is always compiled, so that its
+    modification time is updated, and ``head.checkSumAdjustment`` is computed
+    from the table checksums. The tables are written in the order that
+    ``TTFont.save()`` uses, in one pass. Returns the size of the saved font.
+    """
+    reader = font.reader
+    assert reader is not None
+    if font.recalcTimestamp and "head" in font:
+        # Loaded, so that compiling it updates the modification time.
+        font["head"]
+    tags = font.keys()
+    tags.pop(0)  # GlyphOrder
+    tags = sortedTagList(tags)
+
+    compiled: dict[str, bytes] = {}
+    checksums: dict[str, int] = {}
+    lengths: dict[str, int] = {}
+    for tag in tags:
+        if font.isLoaded(tag) and (tag in modifiedTables or tag == "head"):
+            data = font.getTableData(tag)
+        elif tag == "head":
+            data = bytes(reader[tag])
+        else:
+            entry = reader.tables[tag]
+            checksums[tag] = entry.checkSum
+            lengths[tag] = entry.length
+            continue
+        if tag == "head":
+            data = data[:8] + b"\0\0\0\0" + data[12:]
+        compiled[tag] = data
+        checksums[tag] = calcChecksum(data)
+        lengths[tag] = len(data)
+
+    numTables = len(tags)
+    searchRange, entrySelector, rangeShift = getSearchRange(numTables, 16)
+    header = sstruct.pack(
+        sfntDirectoryFormat,
+        {
+            "sfntVersion": font.sfntVersion,
+            "numTables": numTables,
+            "searchRange": searchRange,
+            "entrySelector": entrySelector,
+            "rangeShift": rangeShift,
+        },
+    )
+    offsets: dict[str, int] = {}
+    offset = sfntDirectorySize + numTables * sfntDirectoryEntrySize
+    for tag in tags:
+        offsets[tag] = offset
+        offset += lengths[tag] + _pad(lengths[tag])
+    directory = header + b"".join(
+        sstruct.pack(
+            sfntDirectoryEntryFormat,
+            {
+                "tag": tag,
+                "checkSum": checksums[tag],
+                "offset": offsets[tag],
+                "length": lengths[tag],
+            },
+        )
+        for tag in sorted(tags)
+    )
+
+    if "head" in compiled:
+        total = calcChecksum(directory) + sum(checksums.values())
+        adjustment = (CHECKSUM_MAGIC - total) & 0xFFFFFFFF
+        head = compiled["head"]
+        compiled["head"] = head[:8] + struct.pack(">L", adjustment) + head[12:]
+
+    if hasattr(outpath, "write"):
+        return _writeTables(outpath, directory, tags, compiled, reader)
+    with Path(outpath).open("wb") as f:
+        return _writeTables(f, directory, tags, compiled, reader)
+
+
+def _writeTables(
+    file: BinaryIO,
+    directory: bytes,
+    tags: list[str],
+    compiled: dict[str, bytes],
+    reader: Any,
+) -> int:
+    file.write(directory)
+    size = len(directory)
+    for tag in tags:
+        data = compiled.get(tag)
+        if data is None:
+            data = reader[tag]
+        file.write(data)
+        padding = _pad(len(data))
+        if padding:
+            file.write(b"\0" * padding)
+        size += len(data) + padding
+    return size
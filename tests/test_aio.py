@@ -0,0 +1,50 @@
+import asyncio
+
+import fontTools.ttLib
+import pytest
+
+from opentype_feature_freezer import FreezeError
+from opentype_feature_freezer.aio import AsyncFreezer
+
+
+def test_async_freezer(tmp_path, shared_datadir):
+    font = fontTools.ttLib.TTFont()
+    font.importXML(shared_datadir / "OpenSans-Bold.subset.ttx")
+    font.save(tmp_path / "Test.ttf")
+    data = (tmp_path / "Test.ttf").read_bytes()
+
+    async def main():
+        async with AsyncFreezer(workers=2) as freezer:
+            frozen = await freezer.freezeBytes(data, features=["onum"])
+            (tmp_path / "Frozen.ttf").write_bytes(frozen)
+            cmap = fontTools.ttLib.TTFont(tmp_path / "Frozen.ttf").getBestCmap()
+            assert cmap[0x30] == "zero.os"
+
+            with pytest.raises(FreezeError):
+                await freezer.freezeBytes(b"not a font", features=["onum"])
+
+            # A job that takes too long stops its worker, which is replaced.
+            with pytest.raises(asyncio.TimeoutError):
+                await freezer.freezeBytes(data, features=["onum"], timeout=1e-6)
+            task = asyncio.ensure_future(freezer.freezeBytes(data, features=["onum"]))
+            await asyncio.sleep(0)
+            task.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await task
+
+            results = await freezer.freezeFiles(
+                [
+                    (tmp_path / "Test.ttf", tmp_path / "out" / "A.ttf"),
+                    (tmp_path / "Missing.ttf", tmp_path / "out" / "B.ttf"),
+                    (tmp_path / "Test.ttf", tmp_path / "out" / "C.ttf"),
+                ],
+                features=["onum"],
+            )
+        assert results[0].success
+        assert isinstance(results[1], FreezeError)
+        assert results[2].success
+        for name in ("A.ttf", "C.ttf"):
+            cmap = fontTools.ttLib.TTFont(tmp_path / "out" / name).getBestCmap()
+            assert cmap[0x30] == "zero.os"
+
+    asyncio.run(main())
@@ -0,0 +1,52 @@
+import io
+
+import fontTools.ttLib
+import pytest
+
+import opentype_feature_freezer
+import opentype_feature_freezer.cli
+from opentype_feature_freezer import FreezeError, FreezeOptions
+
+
+def _tables(data):
+    # The head table's modification time is set when the font is saved.
+    font = fontTools.ttLib.TTFont(io.BytesIO(data), recalcTimestamp=False)
+    font["head"].modified = font["head"].checkSumAdjustment = 0
+    return {tag: font.getTableData(tag) for tag in font.reader.tables}
+
+
+def test_freeze_bytes(tmp_path, shared_datadir):
+    font = fontTools.ttLib.TTFont()
+    font.importXML(shared_datadir / "OpenSans-Bold.subset.ttx")
+    font.save(tmp_path / "Test.ttf")
+    opentype_feature_freezer.cli.main(
+        [
+            "-f",
+            "onum",
+            "-S",
+            "-U",
+            "OSF",
+            str(tmp_path / "Test.ttf"),
+            str(tmp_path / "Out.ttf"),
+        ]
+    )
+    expected = _tables((tmp_path / "Out.ttf").read_bytes())
+    data = (tmp_path / "Test.ttf").read_bytes()
+
+    options = FreezeOptions(features=["onum"], usesuffix="OSF")
+    assert options.suffix
+    assert _tables(opentype_feature_freezer.freeze_bytes(data, options)) == expected
+    frozen = opentype_feature_freezer.freeze_bytes(
+        memoryview(bytearray(data)), features="onum", usesuffix="OSF"
+    )
+    assert _tables(frozen) == expected
+
+    out = bytearray(b"head")
+    written = opentype_feature_freezer.freeze_into(io.BytesIO(data), out, options)
+    assert out[:4] == b"head"
+    assert written == len(out) - 4
+    assert _tables(bytes(out[4:])) == expected
+
+    with pytest.raises(FreezeError) as e:
+        opentype_feature_freezer.freeze_bytes(b"not a font", options)
+    assert e.value.stats.success is False
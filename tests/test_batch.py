@@ -0,0 +1,264 @@
+import io
+import multiprocessing
+import os
+from pathlib import Path
+
+import fontTools.ttLib
+import pytest
+
+import opentype_feature_freezer.batch
+import opentype_feature_freezer.cli
+
+
+def _save_opensans(shared_datadir, path):
+    font = fontTools.ttLib.TTFont()
+    font.importXML(shared_datadir / "OpenSans-Bold.subset.ttx")
+    font.save(path)
+
+
+def test_batch_isolates_failures(tmp_path, shared_datadir, capsys):
+    good1 = tmp_path / "in" / "Good1.ttf"
+    good2 = tmp_path / "in" / "Good2.ttf"
+    bad = tmp_path / "in" / "Bad.ttf"
+    good1.parent.mkdir()
+    _save_opensans(shared_datadir, good1)
+    _save_opensans(shared_datadir, good2)
+    bad.write_bytes(b"not a font")
+    outdir = tmp_path / "out"
+
+    result = opentype_feature_freezer.batch.main(
+        [
+            "-f",
+            "onum",
+            "-j",
+            "2",
+            "-o",
+            str(outdir),
+            "-t",
+            "{stem}-{features}{suffix}",
+            "-g",
+            str(tmp_path / "in" / "*.ttf"),
+        ]
+    )
+    assert result == 1
+
+    for name in ("Good1-onum.ttf", "Good2-onum.ttf"):
+        cmap = fontTools.ttLib.TTFont(outdir / name).getBestCmap()
+        assert cmap[0x30] == "zero.os"
+    assert not (outdir / "Bad-onum.ttf").exists()
+
+    out = capsys.readouterr().out
+    assert f"FAILED  {bad}" in out
+    assert f"OK      {good1} -> {outdir / 'Good1-onum.ttf'}" in out
+    assert "# 2 succeeded, 1 failed" in out
+
+
+def test_batch_manifest(tmp_path, shared_datadir, capsys):
+    _save_opensans(shared_datadir, tmp_path / "Test.ttf")
+    manifest = tmp_path / "fonts.txt"
+    manifest.write_text("# fonts to freeze\nTest.ttf\tfrozen/TestOSF.ttf\n\n")
+
+    result = opentype_feature_freezer.batch.main(
+        ["-f", "onum", "-j", "1", "-m", str(manifest)]
+    )
+    assert result == 0
+    cmap = fontTools.ttLib.TTFont(tmp_path / "frozen" / "TestOSF.ttf").getBestCmap()
+    assert cmap[0x31] == "one.os"
+    assert "# 1 succeeded, 0 failed" in capsys.readouterr().out
+
+
+def test_batch_incremental(tmp_path, shared_datadir, capsys):
+    _save_opensans(shared_datadir, tmp_path / "Test1.ttf")
+    _save_opensans(shared_datadir, tmp_path / "Test2.ttf")
+    args = ["-f", "onum", "-j", "2", "--incremental", "-o", str(tmp_path / "out")]
+    args += [str(tmp_path / "Test1.ttf"), str(tmp_path / "Test2.ttf")]
+
+    assert opentype_feature_freezer.batch.main(args) == 0
+    out = capsys.readouterr().out
+    assert "(new output)" in out
+    assert "# 2 succeeded, 0 failed" in out
+
+    (tmp_path / "Test2.ttf").write_bytes(
+        (tmp_path / "Test2.ttf").read_bytes() + b"\0\0\0\0"
+    )
+    assert opentype_feature_freezer.batch.main(args) == 0
+    out = capsys.readouterr().out
+    assert f"SKIPPED {tmp_path / 'Test1.ttf'}" in out
+    assert f"OK      {tmp_path / 'Test2.ttf'}" in out
+    assert "(input changed)" in out
+    assert "# 1 succeeded, 0 failed, 1 up to date" in out
+
+
+def test_batch_output_collisions(tmp_path, shared_datadir, caplog):
+    for folder in ("dir1", "dir2"):
+        (tmp_path / folder).mkdir()
+        _save_opensans(shared_datadir, tmp_path / folder / "Font.ttf")
+    outdir = tmp_path / "out"
+
+    result = opentype_feature_freezer.batch.main(
+        ["-f", "onum", "-o", str(outdir), "-g", str(tmp_path / "dir*" / "Font.ttf")]
+    )
+    assert result == 1
+    assert "Several input fonts would be saved as" in caplog.text
+    assert not outdir.exists()
+
+    # Next to the inputs, the output names don't collide.
+    result = opentype_feature_freezer.batch.main(
+        ["-f", "onum", "-g", str(tmp_path / "dir*" / "Font.ttf")]
+    )
+    assert result == 0
+    for folder in ("dir1", "dir2"):
+        assert (tmp_path / folder / "Font.ttf.featfreeze.otf").exists()
+
+
+def test_batch_collection_keeps_suffix(tmp_path, shared_datadir, capsys):
+    font_path = tmp_path / "Test.ttf"
+    _save_opensans(shared_datadir, font_path)
+    ttc = fontTools.ttLib.TTCollection()
+    ttc.fonts = [fontTools.ttLib.TTFont(font_path) for _ in range(2)]
+    ttc.save(tmp_path / "Test.ttc")
+
+    result = opentype_feature_freezer.batch.main(
+        [
+            "-f",
+            "onum",
+            "-j",
+            "1",
+            "-o",
+            str(tmp_path / "out"),
+            str(tmp_path / "Test.ttc"),
+        ]
+    )
+    assert result == 0
+    frozen = fontTools.ttLib.TTCollection(tmp_path / "out" / "Test.ttc.featfreeze.ttc")
+    assert [font.getBestCmap()[0x30] for font in frozen.fonts] == ["zero.os"] * 2
+    assert "# 1 succeeded, 0 failed" in capsys.readouterr().out
+
+
+def _big_font(shared_datadir, path, size):
+    font = fontTools.ttLib.TTFont()
+    font.importXML(shared_datadir / "OpenSans-Bold.subset.ttx")
+    # A large table that freezing passes through, like a color bitmap table.
+    table = fontTools.ttLib.newTable("zzzz")
+    table.data = os.urandom(size)
+    font["zzzz"] = table
+    font.save(path)
+    return table.data
+
+
+def test_batch_mmap(tmp_path, shared_datadir):
+    data = _big_font(shared_datadir, tmp_path / "Big.ttf", 2**20)
+    workers = 3
+    inputs = []
+    for n in range(workers):
+        (tmp_path / f"Big{n}.ttf").symlink_to(tmp_path / "Big.ttf")
+        inputs.append(str(tmp_path / f"Big{n}.ttf"))
+    args = ["-f", "onum", "-j", str(workers), *inputs]
+
+    # Pass-through tables are written from the mapped file.
+    result = opentype_feature_freezer.batch.main(
+        [*args, "--mmap", "-o", str(tmp_path / "mmap")]
+    )
+    assert result == 0
+
+    for n in range(workers):
+        name = f"Big{n}.ttf.featfreeze.otf"
+        frozen = fontTools.ttLib.TTFont(tmp_path / "mmap" / name)
+        assert frozen.getBestCmap()[0x30] == "zero.os"
+        assert frozen["zzzz"].data == data
+
+
+def _memory():
+    # Resident, proportional (shared pages split between the processes that
+    # map them) and anonymous (never shared) memory of this process, in KiB.
+    fields = {}
+    with Path("/proc/self/smaps_rollup").open() as f:
+        for line in f:
+            name, _, value = line.partition(":")
+            if name in ("Rss", "Pss", "Anonymous"):
+                fields[name] = int(value.split()[0])
+    return fields
+
+
+class _SamplingFile(io.FileIO):
+    # Samples how much the memory of the worker grew from writing the table
+    # directory (the font is parsed by then) to writing the big table, when
+    # every worker has the table in memory at the same time.
+    def __init__(self, path, barrier, size, samples):
+        super().__init__(path, "wb")
+        self.barrier, self.size, self.samples = barrier, size, samples
+        self.before = None
+
+    def write(self, data):
+        if self.before is None:
+            self.before = _memory()
+        written = super().write(data)
+        if len(data) >= self.size:
+            self.barrier.wait()
+            after = _memory()
+            self.samples.put({name: after[name] - self.before[name] for name in after})
+            self.barrier.wait()
+        return written
+
+
+def _freeze_in_worker(inpath, outpath, mmap, barrier, size, samples):
+    options = opentype_feature_freezer.cli.parseOptions(
+        ["-f", "onum", "--lazy", *(["--mmap"] if mmap else []), inpath]
+    )
+    with _SamplingFile(outpath, barrier, size, samples) as output:
+        remapper = opentype_feature_freezer.RemapByOTL(options)
+        remapper.openFont()
+        snapshot = remapper.prepareVariants()
+        assert remapper.freezeVariant(snapshot, options, output)
+    remapper.closeFont()
+
+
+@pytest.mark.skipif(
+    not Path("/proc/self/smaps_rollup").exists(), reason="measures memory on Linux"
+)
+def test_mmap_workers_share_memory(tmp_path, shared_datadir):
+    workers = 4
+    # Not a multiple of 4 bytes, so the table is padded in the output.
+    size = 32 * 2**20 + 2
+    data = _big_font(shared_datadir, tmp_path / "Big.ttf", size)
+    context = multiprocessing.get_context("fork")
+
+    def peak(mmap):
+        barrier, samples = context.Barrier(workers), context.Queue()
+        processes = [
+            context.Process(
+                target=_freeze_in_worker,
+                args=(
+                    str(tmp_path / "Big.ttf"),
+                    str(tmp_path / f"Out{mmap}{n}.otf"),
+                    mmap,
+                    barrier,
+                    size,
+                    samples,
+                ),
+            )
+            for n in range(workers)
+        ]
+        for process in processes:
+            process.start()
+        memory = [samples.get(timeout=60) for _ in processes]
+        for process in processes:
+            process.join()
+            assert process.exitcode == 0
+        return memory
+
+    table_kib = size // 2**10
+    # Read through file reads, every worker holds a private copy of the table.
+    for grown in peak(False):
+        assert grown["Anonymous"] >= table_kib
+        assert grown["Pss"] >= table_kib
+    # Through mmap, the table is written from the page cache: it is resident
+    # in every worker, but they all map the same physical pages, and each is
+    # charged 1/N of them.
+    for grown in peak(True):
+        assert grown["Anonymous"] < table_kib // 8
+        # (Part of the mapping may already be resident from parsing the font.)
+        assert grown["Rss"] >= table_kib * 3 // 4
+        assert grown["Pss"] < table_kib // workers + table_kib // 8
+    frozen = fontTools.ttLib.TTFont(tmp_path / "OutTrue0.otf")
+    assert frozen["zzzz"].data == data
@@ -1,9 +1,11 @@
+import json
 import logging
 import tempfile
 
 import fontTools.ttLib
 
 import opentype_feature_freezer.cli
+from opentype_feature_freezer import reporting
 
 
 def test_freeze(tmp_path, shared_datadir):
@@ -32,6 +34,31 @@ def test_freeze(tmp_path, shared_datadir):
     assert cmap[0x39] == "nine.os"
 
 
+def test_freeze_variation_sequences(tmp_path, shared_datadir):
+    from fontTools.ttLib.tables._c_m_a_p import CmapSubtable
+
+    font = fontTools.ttLib.TTFont()
+    font.importXML(shared_datadir / "OpenSans-Bold.subset.ttx")
+    uvs = CmapSubtable.newSubtable(14)
+    uvs.platformID, uvs.platEncID, uvs.language = 0, 5, 0xFF
+    uvs.cmap = {}
+    uvs.uvsDict = {0xFE00: [(0x30, None), (0x31, "one")]}
+    font["cmap"].tables.append(uvs)
+    font_path = tmp_path / "Test.ttf"
+    font.save(font_path)
+
+    opentype_feature_freezer.cli.main(["-f", "onum", str(font_path)])
+
+    font_processed = fontTools.ttLib.TTFont(
+        tmp_path / (font_path.name + ".featfreeze.otf")
+    )
+    cmap = font_processed["cmap"]
+    # The default mapping follows the remapped cmap, the explicit one is
+    # substituted.
+    assert cmap.getBestCmap()[0x30] == "zero.os"
+    assert cmap.getcmap(0, 5).uvsDict == {0xFE00: [(0x30, None), (0x31, "one.os")]}
+
+
 def test_report(tmp_path, shared_datadir, capsys):
     font = fontTools.ttLib.TTFont()
     font.importXML(shared_datadir / "OpenSans-Bold.subset.ttx")
@@ -81,3 +108,671 @@ def test_warn_substituting_glyphs_without_unicode(tmp_path, shared_datadir, capl
     )
     cmap = font_processed.getBestCmap()
     assert cmap == {0x61: "a.alt1"}  # Takes the first alternate
+
+
+def _legacy_apply_substitutions(remapper):
+    # The original O(lookups x mappings x glyphs) scan, kept as a reference.
+    subs1 = list(remapper.ttx.getGlyphOrder())
+    gsub = remapper.ttx["GSUB"].table
+    for LookupID in remapper.LookupList:
+        for Subtable in gsub.LookupList.Lookup[LookupID].SubTable:
+            if Subtable.LookupType == 7:
+                Subtable = Subtable.ExtSubTable
+            if Subtable.LookupType == 1:
+                pairs = list(Subtable.mapping.items())
+            elif Subtable.LookupType == 3:
+                pairs = [(k, v[0]) for k, v in Subtable.alternates.items() if v]
+            else:
+                continue
+            for sub_in, sub_out in pairs:
+                for i, current_glyph in enumerate(subs1):
+                    if current_glyph == sub_in:
+                        subs1[i] = sub_out
+    return dict(zip(remapper.ttx.getGlyphOrder(), subs1))
+
+
+def _shaped_substitutions(remapper):
+    # Reference: apply every lookup to every glyph, as a shaping engine would.
+    gsub = remapper.ttx["GSUB"].table
+    result = {}
+    for glyph in remapper.ttx.getGlyphOrder():
+        current = glyph
+        for LookupID in remapper.LookupList:
+            for Subtable in gsub.LookupList.Lookup[LookupID].SubTable:
+                if Subtable.LookupType == 7:
+                    Subtable = Subtable.ExtSubTable
+                if Subtable.LookupType == 1 and current in Subtable.mapping:
+                    current = Subtable.mapping[current]
+                    break
+                if Subtable.LookupType == 3 and Subtable.alternates.get(current):
+                    current = Subtable.alternates[current][0]
+                    break
+        result[glyph] = current
+    return result
+
+
+def _build_chained_font(path, extra_features=""):
+    from fontTools.feaLib.builder import addOpenTypeFeaturesFromString
+    from fontTools.fontBuilder import FontBuilder
+    from fontTools.pens.ttGlyphPen import TTGlyphPen
+
+    glyphs = [".notdef", "a", "b", "c", "d", "e", "a.sc", "b.sc", "d.alt1", "d.alt2"]
+    fb = FontBuilder(1000, isTTF=True)
+    fb.setupGlyphOrder(glyphs)
+    fb.setupCharacterMap({0x61: "a", 0x62: "b", 0x63: "c", 0x64: "d", 0x65: "e"})
+    fb.setupGlyf({g: TTGlyphPen(None).glyph() for g in glyphs})
+    fb.setupHorizontalMetrics(dict.fromkeys(glyphs, (500, 0)))
+    fb.setupHorizontalHeader()
+    fb.setupNameTable({"familyName": "Chain", "styleName": "Regular"})
+    fb.setupOS2()
+    fb.setupPost()
+    addOpenTypeFeaturesFromString(
+        fb.font,
+        """
+        feature smcp { sub a by a.sc; sub b by b.sc; } smcp;
+        feature ss01 { sub a.sc by c; sub c by e; sub d from [d.alt1 d.alt2]; } ss01;
+        feature ss02 { sub e by b; sub d.alt1 by a; } ss02;
+        """
+        + extra_features,
+    )
+    fb.save(path)
+
+
+def _check_substitution_engine(cases, reference):
+    for font_path, features in cases:
+        options = opentype_feature_freezer.cli.parseOptions(
+            ["-f", features, str(font_path)]
+        )
+        remapper = opentype_feature_freezer.RemapByOTL(options)
+        remapper.openFont()
+        remapper.initSubs()
+        remapper.filterFeatureIndex()
+        remapper.filterLookupList()
+        expected = reference(remapper)
+        remapper.composeSubstitutions()
+        remapper.applySubstitutions()
+        # Only the glyphs that change are kept.
+        assert remapper.substitution_mapping == {
+            sub_in: sub_out for sub_in, sub_out in expected.items() if sub_in != sub_out
+        }
+
+        expected_cmaps = [
+            {u: expected.get(g, g) for u, g in table.cmap.items()}
+            for table in remapper.ttx["cmap"].tables
+        ]
+        remapper.remapCmaps()
+        assert [table.cmap for table in remapper.ttx["cmap"].tables] == expected_cmaps
+        remapper.closeFont()
+
+
+def test_substitution_engine_matches_legacy_scan(tmp_path, shared_datadir):
+    font = fontTools.ttLib.TTFont()
+    font.importXML(shared_datadir / "OpenSans-Bold.subset.ttx")
+    opensans_path = tmp_path / "OpenSans.ttf"
+    font.save(opensans_path)
+    chained_path = tmp_path / "Chain.ttf"
+    # b -> b.sc (smcp) -> d (ss03) -> d.alt1 (ss04) chains across lookups.
+    _build_chained_font(
+        chained_path,
+        "feature ss03 { sub b.sc by d; } ss03;feature ss04 { sub d by d.alt1; } ss04;",
+    )
+
+    # Where no lookup substitutes a glyph that it also produces, the old scan
+    # and the composed mappings agree.
+    _check_substitution_engine(
+        [
+            (opensans_path, "c2sc,onum,smcp,pnum"),
+            (chained_path, "smcp,ss02"),
+            (chained_path, "smcp,ss03,ss04"),
+            (chained_path, "smcp,ss02,ss03,ss04"),
+        ],
+        _legacy_apply_substitutions,
+    )
+
+
+def test_substitution_engine_matches_shaping(tmp_path, shared_datadir):
+    font = fontTools.ttLib.TTFont()
+    font.importXML(shared_datadir / "OpenSans-Bold.subset.ttx")
+    opensans_path = tmp_path / "OpenSans.ttf"
+    font.save(opensans_path)
+    chained_path = tmp_path / "Chain.ttf"
+    _build_chained_font(chained_path, "feature ss05 { sub a by b; sub b by c; } ss05;")
+
+    # Within one lookup, a glyph is substituted once: ss05 turns 'a' into 'b',
+    # where the old scan chained it into 'c'.
+    _check_substitution_engine(
+        [
+            (opensans_path, "c2sc,onum,smcp,pnum"),
+            (chained_path, "smcp,ss01,ss02"),
+            (chained_path, "ss02,ss01"),
+            (chained_path, "ss05"),
+        ],
+        _shaped_substitutions,
+    )
+
+
+def test_contextual_lookups(tmp_path, caplog):
+    font_path = tmp_path / "Chain.ttf"
+    _build_chained_font(
+        font_path,
+        """
+        lookup ALT { sub d by d.alt1; sub e by d.alt2; } ALT;
+        feature ss03 { sub e' lookup ALT a; sub [d e]' lookup ALT; } ss03;
+        feature ss04 { rsub b' by a; rsub c' d by a; } ss04;
+        feature ss05 { sub a' lookup ALT b; } ss05;
+        """,
+    )
+    out_path = tmp_path / "Out.ttf"
+    result = opentype_feature_freezer.cli.main(
+        ["-f", "ss03,ss04,ss05", str(font_path), str(out_path)]
+    )
+    assert result == 0
+    cmap = fontTools.ttLib.TTFont(out_path).getBestCmap()
+    # 'e' and 'c' are only substituted before 'a' and 'd'; ss05 never applies.
+    assert [cmap[ord(c)] for c in "abcde"] == ["a", "a", "c", "d.alt1", "e"]
+    assert "lookup type 6 (chaining contextual)" in caplog.text
+
+
+def test_lazy_passes_through_untouched_tables(tmp_path, shared_datadir):
+    font = fontTools.ttLib.TTFont()
+    font.importXML(shared_datadir / "OpenSans-Bold.subset.ttx")
+    font_path = tmp_path / "Test.ttf"
+    font.save(font_path)
+    eager_path = tmp_path / "Eager.ttf"
+    lazy_path = tmp_path / "Lazy.ttf"
+
+    for args in (
+        ["-f", "c2sc,onum,smcp", "-S", str(font_path), str(eager_path)],
+        ["-f", "c2sc,onum,smcp", "-S", "--lazy", str(font_path), str(lazy_path)],
+    ):
+        assert opentype_feature_freezer.cli.main(args) == 0
+
+    font_in = fontTools.ttLib.TTFont(font_path)
+    font_eager = fontTools.ttLib.TTFont(eager_path)
+    font_lazy = fontTools.ttLib.TTFont(lazy_path)
+    assert font_lazy.getBestCmap() == font_eager.getBestCmap()
+    assert font_lazy["name"].compile(font_lazy) == font_eager["name"].compile(
+        font_eager
+    )
+    for tag in ("GSUB", "glyf", "loca", "post", "maxp", "hmtx"):
+        assert font_lazy.reader[tag] == font_in.reader[tag]
+
+
+def test_pass_through_writer(tmp_path, shared_datadir, monkeypatch):
+    from fontTools.ttLib.sfnt import calcChecksum
+
+    from opentype_feature_freezer import writer
+
+    font = fontTools.ttLib.TTFont()
+    font.importXML(shared_datadir / "OpenSans-Bold.subset.ttx")
+    font_path = tmp_path / "Test.ttf"
+    font.save(font_path)
+    args = ["-f", "c2sc,onum,smcp", "-S", "-U", "SC", "-z", str(font_path)]
+    assert opentype_feature_freezer.cli.main([*args, str(tmp_path / "Out.ttf")]) == 0
+    monkeypatch.setattr(writer, "canPassThrough", lambda *_args: False)
+    assert opentype_feature_freezer.cli.main([*args, str(tmp_path / "Ref.ttf")]) == 0
+
+    data = (tmp_path / "Out.ttf").read_bytes()
+    # checkSumAdjustment makes the checksum of the whole font a constant.
+    assert calcChecksum(data) == writer.CHECKSUM_MAGIC
+    out = fontTools.ttLib.TTFont(tmp_path / "Out.ttf", checkChecksums=2)
+    ref = fontTools.ttLib.TTFont(tmp_path / "Ref.ttf")
+    assert list(out.reader.keys()) == list(ref.reader.keys())
+    for tag in out.reader.tables:
+        if tag != "head":
+            assert out.reader[tag] == ref.reader[tag], tag
+            assert out.reader.tables[tag].offset == ref.reader.tables[tag].offset
+
+
+def test_report_json(tmp_path, shared_datadir, capsys):
+    font = fontTools.ttLib.TTFont()
+    font.importXML(shared_datadir / "OpenSans-Bold.subset.ttx")
+    font_path = tmp_path / "Test.ttf"
+    font.save(font_path)
+
+    opentype_feature_freezer.cli.main(
+        ["--report", "--report-format", "json", "--report-gpos", str(font_path)]
+    )
+
+    report = json.loads(capsys.readouterr().out)
+    assert report == {
+        "path": str(font_path),
+        "tables": {
+            "GSUB": {
+                "scripts": {"latn": []},
+                "features": ["lnum", "onum", "pnum", "tnum"],
+            },
+            "GPOS": {"scripts": {}, "features": []},
+        },
+    }
+
+
+def test_report_matches_full_build(tmp_path, capsys):
+    font_path = tmp_path / "Chain.ttf"
+    _build_chained_font(font_path)
+
+    # The report from the fully decompiled GSUB table.
+    gsub = fontTools.ttLib.TTFont(font_path)["GSUB"].table
+    scripts = {
+        record.ScriptTag: [lang.LangSysTag for lang in record.Script.LangSysRecord]
+        for record in gsub.ScriptList.ScriptRecord
+    }
+    features = [record.FeatureTag for record in gsub.FeatureList.FeatureRecord]
+    expected = (
+        reporting.formatReportText(
+            {
+                "path": str(font_path),
+                "tables": {"GSUB": {"scripts": scripts, "features": features}},
+            }
+        )
+        + "\n"
+    )
+
+    opentype_feature_freezer.cli.main(["--report", str(font_path)])
+    assert capsys.readouterr().out == expected
+
+
+def test_plan_cache(tmp_path, shared_datadir, caplog):
+    font = fontTools.ttLib.TTFont()
+    font.importXML(shared_datadir / "OpenSans-Bold.subset.ttx")
+    font_path = tmp_path / "Test.ttf"
+    font.save(font_path)
+    cache_dir = tmp_path / "cache"
+
+    outputs = []
+    for i in range(2):
+        out_path = tmp_path / f"Out{i}.ttf"
+        result = opentype_feature_freezer.cli.main(
+            ["-v", "-f", "onum,smcp", "-S", "--cache", str(cache_dir)]
+            + [str(font_path), str(out_path)]
+        )
+        assert result == 0
+        outputs.append(fontTools.ttLib.TTFont(out_path))
+
+    assert len(list(cache_dir.glob("*.plan"))) == 1
+    assert "Plan cache: 1 hits, 1 misses" in caplog.text
+    assert outputs[0].getBestCmap() == outputs[1].getBestCmap()
+    assert outputs[1].getBestCmap()[0x30] == "zero.os"
+    assert outputs[1]["name"].getDebugName(1) == "Open Sans onum smcp"
+
+
+def test_plan_cache_eviction(tmp_path):
+    from opentype_feature_freezer.cache import PlanCache
+
+    cache = PlanCache(tmp_path, maxSize=1)
+    cache.put("a" * 64, {"changed": [[1, 2]]})
+    assert cache.get("a" * 64) is None
+    assert list(tmp_path.glob("*.plan")) == []
+    assert (cache.hits, cache.misses) == (0, 1)
+
+    # --cache-size 0 stores nothing, rather than falling back to the default.
+    cache = PlanCache.forDirectory(tmp_path, maxSize=0)
+    cache.put("b" * 64, {"changed": []})
+    assert list(tmp_path.glob("*")) == []
+    options = opentype_feature_freezer.cli.parseOptions(["--cache-size", "0", "x"])
+    assert options.cache_size == 0
+
+
+def test_variants_from_one_parse(tmp_path, monkeypatch):
+    font_path = tmp_path / "Chain.ttf"
+    _build_chained_font(font_path)
+
+    for features in ("smcp", "smcp,ss01"):
+        opentype_feature_freezer.cli.main(
+            ["-f", features, str(font_path), str(tmp_path / f"{features}.ttf")]
+        )
+
+    opened = []
+    TTFont = fontTools.ttLib.TTFont
+
+    def counting_ttfont(*args, **kwargs):
+        opened.append(args)
+        return TTFont(*args, **kwargs)
+
+    monkeypatch.setattr(fontTools.ttLib, "TTFont", counting_ttfont)
+    result = opentype_feature_freezer.cli.main(
+        [
+            "--lazy",
+            "--variant",
+            f"features=smcp;suffix=SC;outpath={tmp_path / 'SC.ttf'}",
+            "--variant",
+            f"features=smcp,ss01;suffix=Alt;outpath={tmp_path / 'Alt.ttf'}",
+            str(font_path),
+        ]
+    )
+    monkeypatch.undo()
+    assert result == 0
+    assert len(opened) == 1
+
+    for variant, features, family in (
+        ("SC", "smcp", "Chain SC"),
+        ("Alt", "smcp,ss01", "Chain Alt"),
+    ):
+        font = fontTools.ttLib.TTFont(tmp_path / f"{variant}.ttf")
+        expected = fontTools.ttLib.TTFont(tmp_path / f"{features}.ttf")
+        assert font.getBestCmap() == expected.getBestCmap()
+        assert font["name"].getDebugName(1) == family
+
+
+def _build_variable_font(path):
+    from fontTools.feaLib.builder import addOpenTypeFeaturesFromString
+    from fontTools.fontBuilder import FontBuilder
+    from fontTools.pens.ttGlyphPen import TTGlyphPen
+    from fontTools.varLib.featureVars import addFeatureVariations
+
+    glyphs = [".notdef", "a", "a.sc", "a.sc.heavy"]
+    pen = TTGlyphPen(None)
+    pen.moveTo((0, 0))
+    pen.lineTo((0, 500))
+    pen.lineTo((500, 0))
+    pen.closePath()
+    fb = FontBuilder(1000, isTTF=True)
+    fb.setupGlyphOrder(glyphs)
+    fb.setupCharacterMap({0x61: "a"})
+    fb.setupGlyf({name: pen.glyph() for name in glyphs})
+    fb.setupHorizontalMetrics(dict.fromkeys(glyphs, (600, 0)))
+    fb.setupHorizontalHeader()
+    fb.setupNameTable({"familyName": "Var", "styleName": "Regular"})
+    fb.setupOS2()
+    fb.setupPost()
+    fb.setupFvar([("wght", 100, 400, 900, "Weight")], [])
+    fb.setupGvar({name: [] for name in glyphs})
+    addOpenTypeFeaturesFromString(fb.font, "feature smcp { sub a by a.sc; } smcp;")
+    # From wght 650 up, smcp also substitutes the heavy small cap.
+    addFeatureVariations(
+        fb.font, [([{"wght": (0.5, 1.0)}], {"a.sc": "a.sc.heavy"})], featureTag="smcp"
+    )
+    fb.save(path)
+
+
+def test_feature_variations(tmp_path):
+    font_path = tmp_path / "Var.ttf"
+    _build_variable_font(font_path)
+
+    def frozen(name, *args):
+        out_path = tmp_path / name
+        assert (
+            opentype_feature_freezer.cli.main(
+                ["-f", "smcp", *args, str(font_path), str(out_path)]
+            )
+            == 0
+        )
+        return fontTools.ttLib.TTFont(out_path)
+
+    assert frozen("Default.ttf").getBestCmap()[0x61] == "a.sc"
+    assert frozen("Light.ttf", "--location", "wght=600").getBestCmap()[0x61] == "a.sc"
+    bold = frozen("Bold.ttf", "--location", "wght=700")
+    assert bold.getBestCmap()[0x61] == "a.sc.heavy"
+    assert "fvar" in bold
+
+    instance = frozen("Instance.ttf", "--lazy", "--instance", "--location", "wght=700")
+    assert instance.getBestCmap()[0x61] == "a.sc.heavy"
+    assert "fvar" not in instance
+    assert "FeatureVariations" not in vars(instance["GSUB"].table)
+
+    # Variants at different locations share the lookups resolved per
+    # FeatureVariationRecord.
+    result = opentype_feature_freezer.cli.main(
+        [
+            "-f",
+            "smcp",
+            "--instance",
+            "--variant",
+            f"location=wght=800;outpath={tmp_path / 'V800.ttf'}",
+            "--variant",
+            f"location=wght=900;outpath={tmp_path / 'V900.ttf'}",
+            "--variant",
+            f"location=wght=400;outpath={tmp_path / 'V400.ttf'}",
+            str(font_path),
+        ]
+    )
+    assert result == 0
+    for name, glyph in (
+        ("V800", "a.sc.heavy"),
+        ("V900", "a.sc.heavy"),
+        ("V400", "a.sc"),
+    ):
+        font = fontTools.ttLib.TTFont(tmp_path / f"{name}.ttf")
+        assert font.getBestCmap()[0x61] == glyph
+        assert "fvar" not in font
+
+
+def test_alternate_and_lookup_cache(tmp_path):
+    font_path = tmp_path / "Chain.ttf"
+    _build_chained_font(font_path)
+    options = opentype_feature_freezer.cli.parseOptions(
+        ["-f", "ss01", "--alternate", "1", str(font_path)]
+    )
+    remapper = opentype_feature_freezer.RemapByOTL(options)
+    results = remapper.runVariants(
+        [
+            {"features": "ss01", "outpath": str(tmp_path / "Alt2.ttf")},
+            {"features": "ss01,ss02", "outpath": str(tmp_path / "Both.ttf")},
+            {
+                "features": "ss01",
+                "alternate": "0",
+                "outpath": str(tmp_path / "Alt1.ttf"),
+            },
+        ]
+    )
+    assert results == [True, True, True]
+    # The two lookups of ss01 are decoded once for the first two variants.
+    assert remapper.stats.lookup_cache_hits == 2
+    assert fontTools.ttLib.TTFont(tmp_path / "Alt2.ttf").getBestCmap()[0x64] == "d.alt2"
+    assert fontTools.ttLib.TTFont(tmp_path / "Alt1.ttf").getBestCmap()[0x64] == "d.alt1"
+
+    def chooseLast(_glyph, alternates):
+        return alternates[-1]
+
+    remapper = opentype_feature_freezer.RemapByOTL(options)
+    remapper.chooseAlternate = chooseLast
+    remapper.openFont()
+    remapper.computeSubstitutions()
+    assert remapper.substitution_mapping["d"] == "d.alt2"
+    remapper.closeFont()
+
+    # Plans made with a custom chooser are neither cached nor taken from the cache.
+    cache_dir = tmp_path / "cache"
+    options = opentype_feature_freezer.cli.parseOptions(
+        ["-f", "ss01", "--cache", str(cache_dir), str(font_path)]
+    )
+    options.outpath = str(tmp_path / "Cached.ttf")
+    assert opentype_feature_freezer.RemapByOTL(options).run().success
+    options.outpath = str(tmp_path / "Last.ttf")
+    remapper = opentype_feature_freezer.RemapByOTL(options)
+    remapper.chooseAlternate = chooseLast
+    assert remapper.run().success
+    assert fontTools.ttLib.TTFont(tmp_path / "Last.ttf").getBestCmap()[0x64] == "d.alt2"
+    assert len(list(cache_dir.glob("*.plan"))) == 1
+
+
+def test_collection_variants(tmp_path):
+    font_path = tmp_path / "Chain.ttf"
+    _build_chained_font(font_path)
+    ttc = fontTools.ttLib.TTCollection()
+    ttc.fonts = [fontTools.ttLib.TTFont(font_path) for _ in range(2)]
+    ttc_path = tmp_path / "Chain.ttc"
+    ttc.save(ttc_path)
+
+    result = opentype_feature_freezer.cli.main(
+        [
+            "-f",
+            "smcp",
+            "--variant",
+            "features=smcp;suffix=SC",
+            "--variant",
+            "features=ss01",
+            str(ttc_path),
+        ]
+    )
+    assert result == 0
+    for name, glyph in (("SC", "a.sc"), ("ss01", "a")):
+        frozen = fontTools.ttLib.TTCollection(
+            tmp_path / f"Chain.ttc.{name}.featfreeze.ttc"
+        )
+        assert [font.getBestCmap()[0x61] for font in frozen.fonts] == [glyph] * 2
+    assert sorted(path.name for path in tmp_path.iterdir()) == [
+        "Chain.ttc",
+        "Chain.ttc.SC.featfreeze.ttc",
+        "Chain.ttc.ss01.featfreeze.ttc",
+        "Chain.ttf",
+    ]
+
+
+def test_collection_shares_tables(tmp_path, caplog):
+    font_path = tmp_path / "Chain.ttf"
+    _build_chained_font(font_path)
+    ttc = fontTools.ttLib.TTCollection()
+    ttc.fonts = [fontTools.ttLib.TTFont(font_path) for _ in range(3)]
+    ttc.fonts[1]["name"].setName("Chain Two", 1, 3, 1, 0x409)
+    ttc_path = tmp_path / "Chain.ttc"
+    ttc.save(ttc_path)
+
+    result = opentype_feature_freezer.cli.main(
+        ["-v", "-f", "smcp,ss01", "-S", "-U", "X", "--members", "0,1", str(ttc_path)]
+    )
+    assert result == 0
+    assert caplog.text.count("Reusing substitutions of shared GSUB") == 1
+
+    out_path = tmp_path / "Chain.ttc.featfreeze.ttc"
+    frozen = fontTools.ttLib.TTCollection(out_path)
+    # a -> a.sc (smcp) -> c (ss01); applying it twice would give 'e'
+    assert [font.getBestCmap()[0x61] for font in frozen.fonts] == ["c", "c", "a"]
+    assert [font["name"].getDebugName(1) for font in frozen.fonts] == [
+        "Chain X",
+        "Chain Two X",
+        "Chain",
+    ]
+    gsub_offsets = {font.reader.tables["GSUB"].offset for font in frozen.fonts}
+    cmap_offsets = {font.reader.tables["cmap"].offset for font in frozen.fonts}
+    assert len(gsub_offsets) == 1
+    assert len(cmap_offsets) == 2
+
+
+def test_woff_keeps_flavor(tmp_path, shared_datadir):
+    font = fontTools.ttLib.TTFont()
+    font.importXML(shared_datadir / "OpenSans-Bold.subset.ttx")
+    font.flavor = "woff"
+    font_path = tmp_path / "Test.woff"
+    font.save(font_path)
+
+    assert opentype_feature_freezer.cli.main(["-f", "onum", str(font_path)]) == 0
+    woff = fontTools.ttLib.TTFont(tmp_path / "Test.woff.featfreeze.woff")
+    assert woff.flavor == "woff"
+    assert woff.getBestCmap()[0x30] == "zero.os"
+
+    result = opentype_feature_freezer.cli.main(
+        ["--lazy", "--flavor", "sfnt", "-f", "onum", str(font_path)]
+    )
+    assert result == 0
+    sfnt = fontTools.ttLib.TTFont(tmp_path / "Test.woff.featfreeze.otf")
+    assert sfnt.flavor is None
+    assert sfnt.getBestCmap() == woff.getBestCmap()
+    assert sfnt.reader["GSUB"] == woff.reader["GSUB"]
+
+
+def test_stats(tmp_path, capsys):
+    font_path = tmp_path / "Chain.ttf"
+    _build_chained_font(font_path, "feature liga { sub a b by c; } liga;")
+    out_path = tmp_path / "Out.ttf"
+
+    result = opentype_feature_freezer.cli.main(
+        ["-f", "smcp,liga", "-S", "--stats", "json", str(font_path), str(out_path)]
+    )
+    assert result == 0
+    stats = json.loads(capsys.readouterr().err)
+    assert stats["success"]
+    assert set(stats["stages"]) == {
+        "openFont",
+        "initSubs",
+        "filterFeatureIndex",
+        "filterLookupList",
+        "composeSubstitutions",
+        "applySubstitutions",
+        "remapCmaps",
+        "renameFont",
+        "saveFont",
+        "closeFont",
+    }
+    assert stats["lookups_visited"] == 2
+    assert stats["subtables_skipped"] == {"4": 1}
+    assert stats["mappings_applied"] == 2
+    # Both cmap subtables share one mapping, which is rewritten once.
+    assert stats["cmap_entries_rewritten"] == 2
+    assert stats["name_records_touched"] > 0
+
+    events = []
+    options = opentype_feature_freezer.cli.parseOptions(
+        ["-f", "smcp", str(font_path), str(out_path)]
+    )
+    remapper = opentype_feature_freezer.RemapByOTL(
+        options, statsHooks=[lambda stage, _stats: events.append(stage)]
+    )
+    stats = remapper.run()
+    assert stats is remapper.stats
+    assert events == [*stats.stages, "run"]
+    assert stats.name_records_touched == 0
+
+
+def test_incremental(tmp_path, shared_datadir, capsys):
+    import os
+
+    font = fontTools.ttLib.TTFont()
+    font.importXML(shared_datadir / "OpenSans-Bold.subset.ttx")
+    font_path = tmp_path / "Test.ttf"
+    font.save(font_path)
+    out_path = tmp_path / "out" / "TestOSF.ttf"
+    out_path.parent.mkdir()
+
+    def freeze(*args):
+        result = opentype_feature_freezer.cli.main(
+            ["--incremental", *args, str(font_path), str(out_path)]
+        )
+        assert result == 0
+        return capsys.readouterr().err
+
+    assert f"REBUILD {out_path} (new output)" in freeze("-f", "onum")
+    assert (out_path.parent / ".featfreeze-manifest.json").exists()
+    built = out_path.stat().st_mtime_ns
+
+    assert f"SKIPPED {out_path} (up to date)" in freeze("-f", "onum")
+    # A new timestamp alone doesn't trigger a rebuild.
+    stat = font_path.stat()
+    os.utime(font_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**10))
+    assert f"SKIPPED {out_path} (up to date)" in freeze("-f", "onum")
+    assert out_path.stat().st_mtime_ns == built
+
+    assert "(options changed)" in freeze("-f", "onum,smcp")
+    assert "(forced)" in freeze("-f", "onum,smcp", "--force")
+    font_path.write_bytes(font_path.read_bytes() + b"\0\0\0\0")
+    assert "(input changed)" in freeze("-f", "onum,smcp")
+    assert "(up to date)" in freeze("-f", "onum,smcp")
+    out_path.unlink()
+    assert "(output missing)" in freeze("-f", "onum,smcp")
+    assert fontTools.ttLib.TTFont(out_path).getBestCmap()[0x30] == "zero.os"
+
+
+def test_incremental_input_changed_while_freezing(
+    tmp_path, shared_datadir, capsys, monkeypatch
+):
+    font = fontTools.ttLib.TTFont()
+    font.importXML(shared_datadir / "OpenSans-Bold.subset.ttx")
+    font_path = tmp_path / "Test.ttf"
+    font.save(font_path)
+    out_path = tmp_path / "TestOSF.ttf"
+    args = ["--incremental", "-f", "onum", str(font_path), str(out_path)]
+
+    run = opentype_feature_freezer.RemapByOTL.run
+
+    def runAndTouchInput(self):
+        result = run(self)
+        font_path.write_bytes(font_path.read_bytes() + b"\0\0\0\0")
+        return result
+
+    monkeypatch.setattr(opentype_feature_freezer.RemapByOTL, "run", runAndTouchInput)
+    assert opentype_feature_freezer.cli.main(args) == 0
+    monkeypatch.undo()
+    capsys.readouterr()
+    # The output was built from the old content of the input.
+    assert opentype_feature_freezer.cli.main(args) == 0
+    assert f"REBUILD {out_path} (input changed)" in capsys.readouterr().err
@@ -0,0 +1,101 @@
+import json
+
+from fontTools.feaLib.builder import addOpenTypeFeaturesFromString
+from fontTools.fontBuilder import FontBuilder
+
+from opentype_feature_freezer.layout import LayoutIndex
+
+
+def _gsub_data():
+    glyphs = [".notdef", "a", "b", "c", "d"]
+    fb = FontBuilder(1000, isTTF=True)
+    fb.setupGlyphOrder(glyphs)
+    addOpenTypeFeaturesFromString(
+        fb.font,
+        """
+        languagesystem DFLT dflt;
+        languagesystem latn dflt;
+        languagesystem latn TRK;
+        languagesystem cyrl SRB;
+        feature smcp { sub a by b; } smcp;
+        feature locl {
+            script latn; language TRK required; sub b by c;
+        } locl;
+        feature ss01 { script cyrl; language SRB exclude_dflt; sub c by d; } ss01;
+        """,
+    )
+    return fb.font["GSUB"].compile(fb.font)
+
+
+def test_layout_index():
+    index = LayoutIndex.fromData(_gsub_data())
+    assert index.header() == {
+        "scripts": {"DFLT": [], "cyrl": ["SRB "], "latn": ["TRK "]},
+        "features": ["locl", "smcp", "ss01"],
+    }
+    smcp, locl, ss01 = [0], [1], [2]
+
+    # latn/TRK requires locl, which is also reachable by its tag.
+    locl_index = index.header()["features"].index("locl")
+    assert index.scripts["latn"]["TRK "][0] == locl_index
+    assert index.featureIndices("latn", "TRK ") == [0, 1]
+    assert index.lookups(["locl"], "latn", "TRK ") == locl
+    assert index.lookups(["locl", "smcp"], "latn", None) == smcp
+    # cyrl has no DefaultLangSys.
+    assert index.lookups(["smcp", "ss01"], "cyrl", None) == []
+    assert index.lookups(["smcp", "ss01"], "cyrl", "SRB ") == smcp + ss01
+    assert index.lookups(["smcp", "locl", "ss01"], None, None) == smcp
+    assert index.lookups(["smcp", "locl", "ss01"], None, "TRK ") == smcp + locl
+    assert index.lookups(["kern"], "grek", None) == []
+
+    restored = LayoutIndex.fromDict(json.loads(json.dumps(index.toDict())))
+    assert restored.scripts == index.scripts
+    assert restored.features == index.features
+    assert restored.lookups(["ss01"], None, "SRB ") == ss01
+
+
+def test_feature_variations():
+    from fontTools.varLib.featureVars import addFeatureVariations
+
+    fb = FontBuilder(1000, isTTF=True)
+    fb.setupGlyphOrder([".notdef", "a", "a.sc", "a.sc.heavy", "a.sc.wide"])
+    fb.setupNameTable({"familyName": "Var", "styleName": "Regular"})
+    fb.setupFvar(
+        [("wght", 100, 400, 900, "Weight"), ("wdth", 75, 100, 100, "Width")], []
+    )
+    addOpenTypeFeaturesFromString(fb.font, "feature smcp { sub a by a.sc; } smcp;")
+    addFeatureVariations(
+        fb.font,
+        [
+            ([{"wght": (0.5, 1.0)}], {"a.sc": "a.sc.heavy"}),
+            ([{"wdth": (-1.0, -0.5)}], {"a.sc": "a.sc.wide"}),
+        ],
+        featureTag="smcp",
+    )
+    index = LayoutIndex.fromData(fb.font["GSUB"].compile(fb.font))
+    assert index.matchVariation() is None
+    assert index.matchVariation([1.0]) is not None
+    assert index.matchVariation([0.0, -1.0]) is not None
+
+    default = index.lookups(["smcp"], None, None)
+    heavy = index.lookups(["smcp"], None, None, [1.0, 0.0])
+    wide = index.lookups(["smcp"], None, None, [0.0, -1.0])
+    assert len(default) == 1
+    assert set(default) < set(heavy)
+    assert set(default) < set(wide)
+    assert heavy != wide
+
+    restored = LayoutIndex.fromDict(json.loads(json.dumps(index.toDict())))
+    assert restored.variations == index.variations
+    assert restored.lookups(["smcp"], None, None, [1.0, 0.0]) == heavy
+
+
+def test_first_feature_variation_applies():
+    index = LayoutIndex(
+        {"latn": {None: [0]}},
+        [("smcp", [0])],
+        [([(0, 0.5, 1.0)], {0: [1]}), ([(0, 0.0, 1.0)], {0: [2]}), (None, {0: [3]})],
+    )
+    assert index.lookups(["smcp"], "latn", None) == [2]
+    assert index.lookups(["smcp"], "latn", None, [0.75]) == [1]
+    assert index.lookups(["smcp"], "latn", None, [-0.5]) == [0]
@@ -0,0 +1,126 @@
+import logging
+
+import pytest
+
+from opentype_feature_freezer import remapping
+
+
+def _make_cmaps(num_glyphs=5000):
+    glyph_order = [".notdef"] + [f"g{i}" for i in range(1, num_glyphs)]
+    glyph_order += [f"g{i}.alt" for i in range(1, num_glyphs)]
+    bmp = {0x4E00 + i: f"g{i}" for i in range(1, num_glyphs)}
+    full = dict(bmp)
+    full.update({0x20000 + i: f"g{i}" for i in range(1, num_glyphs, 7)})
+    substitutions = {name: name for name in glyph_order}
+    substitutions.update({f"g{i}": f"g{i}.alt" for i in range(1, num_glyphs, 3)})
+    # Two subtables sharing one dict, an equal copy of it, and a larger cmap.
+    cmaps = [bmp, bmp, dict(bmp), full]
+    return cmaps, substitutions, glyph_order
+
+
+def test_group_cmaps():
+    cmaps, _, _ = _make_cmaps(100)
+    groups = remapping.groupCmaps(cmaps)
+    assert [len(group) for group in groups] == [2, 1]
+    assert groups[0][0] is cmaps[0]
+    assert groups[0][1] is cmaps[2]
+
+
+@pytest.mark.parametrize("use_numpy", [False, True])
+def test_remap_cmaps(use_numpy):
+    if use_numpy:
+        pytest.importorskip("numpy")
+    cmaps, substitutions, glyph_order = _make_cmaps()
+    expected = [
+        {code: substitutions[name] for code, name in cmap.items()} for cmap in cmaps
+    ]
+    # The shared dict only counts once.
+    expected_rewritten = sum(
+        sum(substitutions[name] != name for name in cmap.values())
+        for cmap in (cmaps[0], cmaps[2], cmaps[3])
+    )
+    reverse_glyph_map = {name: gid for gid, name in enumerate(glyph_order)}
+
+    rewritten = remapping.remapCmaps(
+        cmaps, substitutions, glyph_order, reverse_glyph_map, useNumpy=use_numpy
+    )
+
+    assert cmaps == expected
+    assert rewritten == expected_rewritten
+
+
+def test_cmap_engines_agree(tmp_path, shared_datadir):
+    pytest.importorskip("numpy")
+    import fontTools.ttLib
+
+    import opentype_feature_freezer.cli
+
+    font = fontTools.ttLib.TTFont()
+    font.importXML(shared_datadir / "OpenSans-Bold.subset.ttx")
+    font_path = tmp_path / "Test.ttf"
+    font.save(font_path)
+
+    cmaps = {}
+    for engine in ("python", "numpy"):
+        out_path = tmp_path / f"{engine}.ttf"
+        result = opentype_feature_freezer.cli.main(
+            ["-f", "onum,smcp", "--cmap-engine", engine, str(font_path), str(out_path)]
+        )
+        assert result == 0
+        cmaps[engine] = [
+            t.cmap for t in fontTools.ttLib.TTFont(out_path)["cmap"].tables
+        ]
+
+    assert cmaps["python"] == cmaps["numpy"]
+    assert cmaps["numpy"][0][0x30] == "zero.os"
+
+
+def test_remap_uvs():
+    uvs_dict = {0xFE00: [(0x30, None), (0x31, "one.ss01"), (0x32, "two")]}
+    entries = uvs_dict[0xFE00]
+    substitutions = {"one.ss01": "one.ss01.sc", "two": "two.sc"}
+
+    rewritten = remapping.remapUvs([uvs_dict], substitutions)
+
+    assert rewritten == 2
+    assert uvs_dict == {0xFE00: [(0x30, None), (0x31, "one.ss01.sc"), (0x32, "two.sc")]}
+    # The original list is left alone, for snapshots of variant tables.
+    assert entries[1] == (0x31, "one.ss01")
+
+
+def test_compile_cmap(monkeypatch, caplog):
+    from fontTools.ttLib import TTFont, newTable
+    from fontTools.ttLib.tables._c_m_a_p import CmapSubtable
+
+    cmaps, _, glyph_order = _make_cmaps()
+    font = TTFont()
+    font.setGlyphOrder(glyph_order)
+    table = font["cmap"] = newTable("cmap")
+    table.tableVersion = 0
+    table.tables = []
+    for (platformID, platEncID, fmt), cmap in zip(
+        [(0, 3, 4), (3, 1, 4), (0, 4, 12), (3, 10, 12)],
+        [cmaps[0], cmaps[2], cmaps[3], dict(cmaps[3])],
+    ):
+        subtable = CmapSubtable.newSubtable(fmt)
+        subtable.platformID, subtable.platEncID = platformID, platEncID
+        subtable.language = 0
+        subtable.cmap = cmap
+        table.tables.append(subtable)
+    uvs = CmapSubtable.newSubtable(14)
+    uvs.platformID, uvs.platEncID, uvs.language = 0, 5, 0xFF
+    uvs.cmap = {}
+    uvs.uvsDict = {0xFE00: [(0x4E01, None), (0x4E02, "g2.alt")]}
+    table.tables.append(uvs)
+
+    assert remapping.compileCmap(table, font) == table.compile(font)
+
+    # Duplicate subtable keys are left to fontTools.
+    duplicate = CmapSubtable.newSubtable(4)
+    duplicate.platformID, duplicate.platEncID, duplicate.language = 3, 1, 0
+    duplicate.cmap = cmaps[1]
+    table.tables.append(duplicate)
+    monkeypatch.setattr(type(table), "compile", lambda *_: b"fontTools")
+    with caplog.at_level(logging.WARNING):
+        assert remapping.compileCmap(table, font) == b"fontTools"
+    assert "duplicate (platformID, platEncID, language)" in caplog.text
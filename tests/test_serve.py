@@ -0,0 +1,123 @@
+import io
+import json
+import threading
+import urllib.request
+
+import fontTools.ttLib
+import pytest
+
+import opentype_feature_freezer.cli
+import opentype_feature_freezer.serve
+
+
+def _tables(data):
+    # The head table's modification time is set when the font is saved.
+    font = fontTools.ttLib.TTFont(io.BytesIO(data), recalcTimestamp=False)
+    font["head"].modified = font["head"].checkSumAdjustment = 0
+    return {tag: font.getTableData(tag) for tag in font.reader.tables}
+
+
+@pytest.fixture
+def server():
+    freezer = opentype_feature_freezer.serve.FreezeServer(1, 2**24)
+    httpd = opentype_feature_freezer.serve.makeServer(freezer, port=0)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{httpd.server_address[1]}"
+    httpd.shutdown()
+    httpd.server_close()
+    freezer.close()
+
+
+def _post(url, data, content_type="application/octet-stream"):
+    request = urllib.request.Request(
+        url, data=data, headers={"Content-Type": content_type}
+    )
+    with urllib.request.urlopen(request) as response:
+        return response.read()
+
+
+def test_serve(server, tmp_path, shared_datadir):
+    font = fontTools.ttLib.TTFont()
+    font.importXML(shared_datadir / "OpenSans-Bold.subset.ttx")
+    font.save(tmp_path / "Test.ttf")
+    opentype_feature_freezer.cli.main(
+        [
+            "-f",
+            "onum",
+            "-S",
+            "-U",
+            "OSF",
+            str(tmp_path / "Test.ttf"),
+            str(tmp_path / "Out.ttf"),
+        ]
+    )
+    expected = _tables((tmp_path / "Out.ttf").read_bytes())
+
+    data = (tmp_path / "Test.ttf").read_bytes()
+    url = server + "/freeze?features=onum&usesuffix=OSF"
+    assert _tables(_post(url, data)) == expected
+    assert _tables(_post(url, data)) == expected
+    body = json.dumps({"path": str(tmp_path / "Test.ttf"), "features": "onum"})
+    frozen = fontTools.ttLib.TTFont(
+        io.BytesIO(_post(server + "/freeze", body.encode(), "application/json"))
+    )
+    assert frozen.getBestCmap()[0x30] == "zero.os"
+
+    with pytest.raises(urllib.error.HTTPError) as e:
+        _post(server + "/freeze", b"not a font")
+    assert e.value.code == 400
+
+    with urllib.request.urlopen(server + "/metrics") as response:
+        metrics = json.load(response)
+    assert metrics["requests"] == 4
+    assert metrics["failures"] == 1
+    assert metrics["cache_hits"] == 1
+    assert metrics["cache_misses"] == 3
+
+
+def test_font_cache_closes_failed_fonts(tmp_path, shared_datadir, monkeypatch):
+    font = fontTools.ttLib.TTFont()
+    font.importXML(shared_datadir / "OpenSans-Bold.subset.ttx")
+    font.save(tmp_path / "Test.ttf")
+    ttc = fontTools.ttLib.TTCollection()
+    ttc.fonts = [fontTools.ttLib.TTFont(tmp_path / "Test.ttf")]
+    ttc.save(tmp_path / "Test.ttc")
+
+    closed = []
+    remapper = opentype_feature_freezer.RemapByOTL
+    monkeypatch.setattr(
+        remapper, "openFont", lambda _: pytest.fail("collection was opened")
+    )
+    cache = opentype_feature_freezer.serve.FontCache(2**24)
+    with pytest.raises(opentype_feature_freezer.serve.RequestError):
+        cache.get("ttc", str(tmp_path / "Test.ttc"))
+    monkeypatch.undo()
+
+    def failingPrepare(_):
+        raise RuntimeError("broken font")
+
+    closeFont = remapper.closeFont
+    monkeypatch.setattr(remapper, "prepareVariants", failingPrepare)
+    monkeypatch.setattr(
+        remapper, "closeFont", lambda self: closed.append(self) or closeFont(self)
+    )
+    with pytest.raises(RuntimeError):
+        cache.get("ttf", str(tmp_path / "Test.ttf"))
+    assert len(closed) == 1
+    assert not cache.entries
+
+
+def test_serve_requests_dont_share_options(server, tmp_path, shared_datadir):
+    font = fontTools.ttLib.TTFont()
+    font.importXML(shared_datadir / "OpenSans-Bold.subset.ttx")
+    font.save(tmp_path / "Test.ttf")
+    data = (tmp_path / "Test.ttf").read_bytes()
+
+    plain = _post(server + "/freeze?features=onum", data)
+    renamed = _post(server + "/freeze?features=onum&usesuffix=SC&zapnames=1", data)
+    assert "SC" in fontTools.ttLib.TTFont(io.BytesIO(renamed))["name"].getDebugName(1)
+    # The cached font is reused, without the options of the previous request.
+    again = _post(server + "/freeze?features=onum", data)
+    assert _tables(again) == _tables(plain)
+    assert "SC" not in fontTools.ttLib.TTFont(io.BytesIO(again))["name"].getDebugName(1)
@@ -0,0 +1,175 @@
+import logging
+from types import SimpleNamespace
+
+from opentype_feature_freezer.substitutions import (
+    LookupDecoder,
+    alternateByIndex,
+    composeMappings,
+    lookupMapping,
+)
+
+
+def _lookup(*subtables):
+    return SimpleNamespace(SubTable=list(subtables))
+
+
+def test_lookup_mapping():
+    glyph_ids = {"a": 1, "b": 2, "c": 3, "d": 4}
+    skipped = []
+    lookup = _lookup(
+        SimpleNamespace(LookupType=1, mapping={"a": "b", "b": "c"}),
+        SimpleNamespace(LookupType=4),
+        SimpleNamespace(
+            LookupType=7,
+            ExtSubTable=SimpleNamespace(
+                LookupType=3, alternates={"a": ["d"], "c": ["d", "a"], "d": []}
+            ),
+        ),
+    )
+    # Each glyph is substituted once, by the first subtable that covers it.
+    assert lookupMapping(lookup, glyph_ids, skipped.append) == {1: 2, 2: 3, 3: 4}
+    assert skipped == [4]
+
+    nested = _lookup(
+        SimpleNamespace(
+            LookupType=7,
+            ExtSubTable=SimpleNamespace(
+                LookupType=7,
+                ExtSubTable=SimpleNamespace(
+                    LookupType=3, alternates={"a": ["b", "c"], "b": ["d"]}
+                ),
+            ),
+        ),
+    )
+    assert lookupMapping(nested, glyph_ids, None, alternateByIndex(1)) == {1: 3, 2: 4}
+    assert alternateByIndex(-1) is alternateByIndex(-1)
+    assert alternateByIndex(-5)("a", ["b", "c"]) == "b"
+
+
+def _record(lookup_index, sequence_index=0):
+    return SimpleNamespace(SequenceIndex=sequence_index, LookupListIndex=lookup_index)
+
+
+def test_contextual_lookups(caplog):
+    glyph_ids = {"a": 1, "b": 2, "c": 3, "d": 4, "e": 5}
+    nested = _lookup(SimpleNamespace(LookupType=1, mapping={"a": "d", "b": "e"}))
+
+    def rule(**context):
+        return SimpleNamespace(SubstLookupRecord=[_record(0)], **context)
+
+    contextual = _lookup(
+        # Format 3 with a lookahead: 'a' depends on what follows it.
+        SimpleNamespace(
+            LookupType=6,
+            Format=3,
+            BacktrackCoverage=[],
+            InputCoverage=[SimpleNamespace(glyphs=["a"])],
+            LookAheadCoverage=[SimpleNamespace(glyphs=["c"])],
+            SubstLookupRecord=[_record(0)],
+        ),
+        # Format 2: class 1 (a, b) always, class 2 (c) only before 'a'.
+        SimpleNamespace(
+            LookupType=7,
+            ExtSubTable=SimpleNamespace(
+                LookupType=6,
+                Format=2,
+                Coverage=SimpleNamespace(glyphs=["a", "b", "c"]),
+                InputClassDef=SimpleNamespace(classDefs={"a": 1, "b": 1, "c": 2}),
+                ChainSubClassSet=[
+                    None,
+                    SimpleNamespace(ChainSubClassRule=[rule()]),
+                    SimpleNamespace(ChainSubClassRule=[rule(LookAhead=[1])]),
+                ],
+            ),
+        ),
+        # Format 1: 'd' starts a two glyph rule before the single glyph one.
+        SimpleNamespace(
+            LookupType=5,
+            Format=1,
+            Coverage=SimpleNamespace(glyphs=["d", "e"]),
+            SubRuleSet=[
+                SimpleNamespace(SubRule=[rule(Input=["a"]), rule()]),
+                SimpleNamespace(SubRule=[rule()]),
+            ],
+        ),
+    )
+    skipped = []
+    decoder = LookupDecoder([nested, contextual], glyph_ids, None, skipped.append)
+    # 'e' is matched, but the nested lookup leaves it alone.
+    assert decoder.lookupMapping(1) == {2: 5, 5: 5}
+    assert skipped == [6]
+    assert set(decoder.cache) == {0, 1}
+
+    # Nested lookups that are frozen only in part don't freeze the rules that
+    # use them: a nested multiple substitution, and a nested lookup that
+    # substitutes 'c' depending on what follows it.
+    unsupported = _lookup(
+        SimpleNamespace(LookupType=1, mapping={"a": "d"}),
+        SimpleNamespace(LookupType=2),
+    )
+    conditional = _lookup(
+        SimpleNamespace(
+            LookupType=6,
+            Format=3,
+            BacktrackCoverage=[],
+            InputCoverage=[SimpleNamespace(glyphs=["c"])],
+            LookAheadCoverage=[SimpleNamespace(glyphs=["a"])],
+            SubstLookupRecord=[_record(0)],
+        ),
+    )
+
+    def single(glyph, lookup_index):
+        return SimpleNamespace(
+            LookupType=5,
+            Format=3,
+            Coverage=[SimpleNamespace(glyphs=[glyph])],
+            SubstLookupRecord=[_record(lookup_index)],
+        )
+
+    outer = _lookup(single("a", 1), single("c", 2), single("b", 0))
+    skipped = []
+    decoder = LookupDecoder(
+        [nested, unsupported, conditional, outer], glyph_ids, None, skipped.append
+    )
+    with caplog.at_level(logging.INFO):
+        assert decoder.lookupMapping(3) == {2: 5}
+    assert skipped == [2, 5, 6, 5]
+    assert decoder.partial == {1, 2, 3}
+    assert "nested lookup 1, which cannot be frozen in full" in caplog.text
+    assert "nested lookup 2, which cannot be frozen in full" in caplog.text
+
+    reverse = _lookup(
+        SimpleNamespace(
+            LookupType=8,
+            Coverage=SimpleNamespace(glyphs=["a", "b"]),
+            BacktrackCoverage=[SimpleNamespace(glyphs=["c"])],
+            LookAheadCoverage=[],
+            Substitute=["c", "c"],
+        ),
+        SimpleNamespace(
+            LookupType=8,
+            Coverage=SimpleNamespace(glyphs=["b", "c"]),
+            BacktrackCoverage=[],
+            LookAheadCoverage=[],
+            Substitute=["d", "e"],
+        ),
+    )
+    assert lookupMapping(reverse, glyph_ids) == {3: 5}
+
+
+def test_compose_mappings():
+    changed, cycles = composeMappings(
+        [
+            (0, {1: 2, 2: 3}),
+            (1, {3: 4}),
+            (2, {2: 5, 5: 2}),
+        ]
+    )
+    # 1 -> 2 -> 2 -> 5, 2 -> 3 -> 4 and 3 -> 3 -> 4; the last lookup swaps.
+    assert changed == {1: 5, 2: 4, 3: 4, 5: 2}
+    assert cycles == []
+
+    changed, cycles = composeMappings([(3, {1: 2}), (7, {2: 1}), (9, {1: 3})])
+    # 1 -> 2 -> 1 -> 3 and 2 -> 2 -> 1 -> 3
+    assert changed == {1: 3, 2: 3}
+    assert cycles == [(1, 7)]